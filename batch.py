@@ -0,0 +1,231 @@
+"""Batch module
+
+This script contains the batch optimization runner, which solves a grid of
+(strategy, objective, lookback, universe) configurations. Expected returns
+and covariance of every (lookback, universe) pair are estimated once and
+shared by all strategies and objectives, solves run in a process pool.
+
+It contains following classes
+    * BatchOptimizer: Runs grid of optimizer configurations
+
+It contains following functions
+    * expand_grid: Returns every combination of configuration values
+    * solve: Solves a configuration given its estimates
+"""
+
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from pypfopt.efficient_frontier import EfficientFrontier
+from pypfopt.hierarchical_portfolio import HRPOpt
+from pypfopt.cla import CLA
+
+from riskcache import get_cache
+
+
+# Estimates used by every (strategy, objective), as used by optimizer module
+STRATEGIES = {
+    ('eff', 'max_sharpe'): {'mu': 'capm_return', 'cov': 'sample_cov'},
+    ('eff', 'min_volatility'): {'cov': 'ledoit_wolf'},
+    ('cla', 'max_sharpe'): {'mu': 'capm_return', 'cov': 'ledoit_wolf'},
+    ('cla', 'min_volatility'): {'mu': 'capm_return', 'cov': 'ledoit_wolf'},
+    ('hrp', None): {'returns': 'returns_from_prices'},
+}
+
+RESULT_COLUMNS = ['strategy', 'objective', 'lookback', 'universe', 'ticker', 'weight',
+                  'expected_return', 'volatility', 'sharpe', 'error']
+
+
+def expand_grid(strategy=('eff',), objective=('max_sharpe',), lookback=(250,),
+                universe=(None,)):
+    """Returns every combination of configuration values
+    Combinations not in STRATEGIES are left out, strategies without an
+    objective ('hrp') are combined with objective None only
+
+    Parameters
+    ----------
+    strategy: list[str] (('eff',))
+        Strategies: 'eff', 'cla' or 'hrp'
+    objective: list[str] (('max_sharpe',))
+        Objectives: 'max_sharpe' or 'min_volatility'
+    lookback: list[int] ((250,))
+        Number of trading days in close price window
+    universe: list[str] ((None,))
+        Names of universes, None is every ticker
+
+    Returns
+    -------
+    grid: list[dict]
+        Configurations
+    """
+
+    pairs = []
+    for s in strategy:
+        if((s, None) in STRATEGIES):
+            pairs.append((s, None))
+        pairs.extend((s, o) for o in objective if (s, o) in STRATEGIES)
+
+    return [{'strategy': s, 'objective': o, 'lookback': l, 'universe': u}
+            for (s, o), l, u in itertools.product(pairs, lookback, universe)]
+
+
+def solve(config, inputs):
+    """Solves a configuration given its estimates, run in a worker process
+    Returns (config, weights, performance, error)
+    """
+
+    try:
+        strategy, objective = config['strategy'], config['objective']
+        if(strategy == 'eff'):
+            optimizer = EfficientFrontier(inputs.get('mu'), inputs['cov'])
+            getattr(optimizer, objective)()
+            weights = optimizer.clean_weights()
+        elif(strategy == 'cla'):
+            optimizer = CLA(inputs['mu'], inputs['cov'])
+            weights = getattr(optimizer, objective)()
+        else:
+            optimizer = HRPOpt(inputs['returns'])
+            optimizer.optimize()
+            weights = optimizer.clean_weights()
+        return config, dict(weights), optimizer.portfolio_performance(), None
+    except Exception as e:
+        return config, {}, (None, None, None), repr(e)
+
+
+class BatchOptimizer:
+    """
+    Class to represent a runner of a grid of optimizer configurations
+
+    ...
+
+    Attributes
+    ----------
+    processor : IndexProcessor()
+        IndexProcessor object to collect close prices
+    universes : dict[str] = list[str]
+        Named lists of tickers configurations can be restricted to
+    cache : RiskModelCache()
+        Cache of expected returns and covariance estimates
+
+    Methods
+    -------
+    load(lookback=int): pd.DataFrame
+        Returns close prices of at least last lookback days
+    window(lookback=int, universe=str): pd.DataFrame
+        Returns close prices of last lookback days of universe
+    inputs(lookback=int, universe=str, estimates=dict): dict
+        Returns estimates of close price window of lookback and universe
+    run(grid=list[dict], workers=int): pd.DataFrame
+        Solves every configuration, returns weights and performance
+    """
+
+    def __init__(self, processor=None, universes=None, cache=None):
+        self.processor = processor
+        self.universes = universes if universes is not None else {}
+        self.cache = cache if cache is not None else get_cache()
+        self._windows = {}
+        self._close = None
+        self._lookback = 0
+
+    def load(self, lookback):
+        """Returns close prices of at least last lookback days
+        Close prices are read from processor's panel once for the longest
+        lookback asked for, shorter windows are sliced from them
+        """
+
+        if(self._close is None or lookback > self._lookback):
+            self.processor.process_close(lookback, dropna=False)
+            self._close = self.processor.close_matrix
+            self._lookback = lookback
+        return self._close
+
+    def window(self, lookback, universe=None):
+        """Returns close prices of last lookback days of universe
+        Tickers with a missing close price in the window are dropped, as in
+        simulation.Backtest and dash_app's portfolio
+        """
+
+        key = (lookback, universe)
+        if(key not in self._windows):
+            close = self.load(lookback).iloc[-lookback:]
+            if(universe is not None):
+                close = close[[t for t in self.universes[universe] if t in close.columns]]
+            self._windows[key] = close.dropna(axis=1, how='any')
+        return self._windows[key]
+
+    def inputs(self, lookback, universe, estimates):
+        """Returns estimates of close price window of lookback and universe
+
+        Parameters
+        ----------
+        lookback: int
+            Number of trading days in close price window
+        universe: str
+            Name of universe, None is every ticker
+        estimates: dict[str] = str
+            Estimator of every input, as in STRATEGIES
+
+        Returns
+        -------
+        inputs: dict[str] = pd.Series or pd.DataFrame
+            Estimates keyed by input
+        """
+
+        close = self.window(lookback, universe)
+        return {name: self.cache.get(close, estimator) for name, estimator in estimates.items()}
+
+    def run(self, grid, workers=4):
+        """Solves every configuration, returns weights and performance
+        Estimates are calculated once per (lookback, universe) and estimator,
+        a failed configuration does not stop others
+
+        Parameters
+        ----------
+        grid: list[dict]
+            Configurations with strategy, objective, lookback and universe,
+            see expand_grid()
+        workers: int (4)
+            Number of worker processes, 1 solves in this process
+
+        Returns
+        -------
+        results: pd.DataFrame
+            One row per configuration and ticker with non-zero weight, with
+            performance of configuration's portfolio. Failed configurations
+            have a single row with error
+        """
+
+        if(len(grid)):
+            self.load(max(config['lookback'] for config in grid))
+
+        tasks = []
+        for config in grid:
+            config = dict({'objective': None, 'universe': None}, **config)
+            estimates = STRATEGIES.get((config['strategy'], config['objective']))
+            if(estimates is None):
+                raise ValueError("Unknown strategy and objective: {}, expected one of {}".format(
+                    (config['strategy'], config['objective']), list(STRATEGIES.keys())))
+            tasks.append((config, self.inputs(config['lookback'], config['universe'],
+                                              estimates)))
+
+        if(workers <= 1):
+            solved = [solve(config, inputs) for config, inputs in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                solved = list(executor.map(solve, *zip(*tasks))) if tasks else []
+
+        rows = []
+        for config, weights, performance, error in solved:
+            stats = dict(config, expected_return=performance[0], volatility=performance[1],
+                         sharpe=performance[2], error=error)
+            held = [(t, w) for t, w in weights.items() if w != 0]
+            if(error is not None or len(held) == 0):
+                rows.append(dict(stats, ticker=None, weight=None))
+            for ticker, weight in held:
+                rows.append(dict(stats, ticker=ticker, weight=weight))
+            print("Solved {} {} lookback: {} universe: {} {}".format(
+                config['strategy'], config['objective'], config['lookback'],
+                config['universe'], error if error is not None else 'ok'))
+
+        return pd.DataFrame(rows, columns=RESULT_COLUMNS)
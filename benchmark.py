@@ -0,0 +1,518 @@
+"""Benchmark module
+
+This script contains benchmarks for the data pipeline, run against local
+fake providers and synthetic data so no network access is needed.
+
+    python benchmark.py [name ...]
+
+It contains following functions
+    * fake_ohlc: Builds fake OHLC DataFrame shaped like nsepy.get_history output
+    * fake_history_provider: Builds fake get_history with simulated latency
+    * bench_fetch_engine: Compares serial fetching with FetchEngine
+    * bench_update_append: Compares rewriting OHLC CSVs with appending new rows
+    * bench_storage: Compares read/write time of storage backends
+    * bench_indicator_engine: Compares per-stock and panel indicator engines
+    * bench_process_pool: Compares IndexProcessor metrics across worker counts
+    * bench_online_cov: Compares daily covariance recalculation with
+                        OnlineCovariance updates
+    * bench_backtest: Times walk-forward backtests with cold and warm-started
+                      covariance
+    * bench_frontier: Compares rebuilding EfficientFrontier per frontier point
+                      with EffOptimizer.frontier()
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from engine import FetchEngine
+from utils import append_csv
+from storage import STORAGES, get_storage
+from indicators import compute_indicators, compute_indicators_panel
+
+
+def fake_history_provider(latency=0.2, rows=250):
+    """Builds fake get_history with simulated latency
+
+    Parameters
+    ----------
+    latency: float (0.2)
+        Seconds every call sleeps for, simulating network latency
+    rows: int (250)
+        Number of OHLC rows returned by every call
+
+    Returns
+    -------
+    provider: callable
+        Function with nsepy.get_history's signature
+    """
+
+    def provider(symbol=None, start=date(1980, 1, 1), end=date.today()):
+        time.sleep(latency)
+        return fake_ohlc(rows, end, symbol)
+
+    return provider
+
+
+def bench_fetch_engine(num_tickers=40, latency=0.2, rate=10, workers=(1, 4, 8)):
+    """Compares serial fetching with FetchEngine
+
+    Parameters
+    ----------
+    num_tickers: int (40)
+        Number of fake tickers fetched
+    latency: float (0.2)
+        Simulated latency of every request
+    rate: float (10)
+        Requests per second ceiling of the fake provider
+    workers: tuple[int] ((1, 4, 8))
+        Worker pool sizes to benchmark
+
+    Returns
+    -------
+    results: dict[int] = dict
+        FetchEngine statistics per worker pool size
+    """
+
+    provider = fake_history_provider(latency)
+    jobs = [('T{}'.format(i), {'symbol': 'T{}'.format(i)}) for i in range(num_tickers)]
+
+    start = time.monotonic()
+    for _, kwargs in jobs:
+        provider(**kwargs)
+        time.sleep(1/rate)
+    serial = time.monotonic() - start
+
+    results = {}
+    for w in workers:
+        results[w] = FetchEngine(provider, workers=w, rate=rate).run(jobs)
+
+    print("\nSerial loop: {}s ({} jobs/s)".format(round(serial, 3),
+                                                 round(num_tickers/serial, 3)))
+    for w, stats in results.items():
+        print("FetchEngine workers={}: {}s ({} jobs/s)".format(
+            w, stats['elapsed'], stats['throughput']))
+
+    return results
+
+
+def fake_ohlc(rows=250, end=date.today(), symbol='FAKE'):
+    """Builds fake OHLC DataFrame shaped like nsepy.get_history output
+
+    Parameters
+    ----------
+    rows: int (250)
+        Number of business days
+    end: datetime.date (Today)
+        Last date of OHLC data
+    symbol: str ('FAKE')
+        Ticker of OHLC data
+
+    Returns
+    -------
+    df: pd.DataFrame
+        OHLC data indexed by 'Date'
+    """
+
+    index = pd.bdate_range(end=end, periods=rows, name='Date').date
+    close = np.abs(100 + np.random.randn(rows).cumsum()) + 1
+    return pd.DataFrame({'Symbol': symbol, 'Series': 'EQ', 'Prev Close': close,
+                         'Open': close, 'High': close*1.01, 'Low': close*0.99,
+                         'Last': close, 'Close': close, 'VWAP': close,
+                         'Volume': 1000, 'Turnover': close*1000},
+                        index=pd.Index(index, name='Date'))
+
+
+def bench_update_append(history=(1000, 5000, 20000), new_rows=5, repeat=3):
+    """Compares rewriting OHLC CSVs with appending new rows
+
+    Parameters
+    ----------
+    history: tuple[int] ((1000, 5000, 20000))
+        Rows of stored history to benchmark
+    new_rows: int (5)
+        Rows added by the update
+    repeat: int (3)
+        Runs averaged per measurement
+
+    Returns
+    -------
+    results: dict[int] = dict
+        Seconds taken by rewrite and append per history size
+    """
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_loc = os.path.join(tmp_dir, 'FAKE.csv')
+        for rows in history:
+            df = fake_ohlc(rows + new_rows)
+            old, new = df.iloc[:rows], df.iloc[rows - 1:]
+            timings = {'rewrite': 0.0, 'append': 0.0}
+
+            for _ in range(repeat):
+                old.to_csv(csv_loc)
+                start = time.perf_counter()
+                old_data = pd.read_csv(csv_loc).set_index('Date')
+                pd.concat([old_data, new]).drop_duplicates().to_csv(csv_loc)
+                timings['rewrite'] += (time.perf_counter() - start)/repeat
+
+                old.to_csv(csv_loc)
+                start = time.perf_counter()
+                append_csv(new[pd.to_datetime(new.index) > pd.Timestamp(old.index[-1])],
+                           csv_loc)
+                timings['append'] += (time.perf_counter() - start)/repeat
+
+            results[rows] = timings
+            print("History rows: {} rewrite: {}ms append: {}ms".format(
+                rows, round(timings['rewrite']*1000, 2), round(timings['append']*1000, 2)))
+
+    return results
+
+
+def bench_storage(num_tickers=50, rows=5000, formats=tuple(STORAGES.keys())):
+    """Compares read/write time of storage backends
+
+    Parameters
+    ----------
+    num_tickers: int (50)
+        Number of fake tickers stored
+    rows: int (5000)
+        OHLC rows per ticker
+    formats: tuple[str] (all formats)
+        Storage formats to benchmark, formats with missing dependencies
+        are skipped
+
+    Returns
+    -------
+    results: dict[str] = dict
+        Seconds taken by write, full read and Close-only read per format
+    """
+
+    frames = {'T{}'.format(i): fake_ohlc(rows) for i in range(num_tickers)}
+    results = {}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for fmt in formats:
+            try:
+                storage = get_storage(fmt, tmp_dir)
+            except ImportError as e:
+                print("Skipping {}: {}".format(fmt, e))
+                continue
+
+            timings = {}
+            start = time.perf_counter()
+            for name, df in frames.items():
+                storage.write(df, name)
+            timings['write'] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for name in storage.names():
+                storage.read(name)
+            timings['read'] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for name in storage.names():
+                storage.read(name, columns=['Close'])
+            timings['read_close'] = time.perf_counter() - start
+
+            results[fmt] = timings
+            print("{}: write {}s read {}s read Close {}s".format(
+                fmt, round(timings['write'], 3), round(timings['read'], 3),
+                round(timings['read_close'], 3)))
+
+    return results
+
+
+def bench_indicator_engine(num_tickers=(500, 5000), rows=2500, chunk_size=500):
+    """Compares per-stock and panel indicator engines
+    Both engines are run in memory on fake close prices of varying lengths
+    and checked to produce identical indicators
+
+    Parameters
+    ----------
+    num_tickers: tuple[int] ((500, 5000))
+        Universe sizes to benchmark
+    rows: int (2500)
+        Maximum close prices per ticker
+    chunk_size: int (500)
+        Tickers per panel pass
+
+    Returns
+    -------
+    results: dict[int] = dict
+        Seconds taken by each engine per universe size
+    """
+
+    results = {}
+    for n in num_tickers:
+        closes = {'T{}'.format(i): np.abs(100 + np.random.randn(
+            np.random.randint(rows//2, rows + 1)).cumsum()) + 1 for i in range(n)}
+
+        start = time.perf_counter()
+        stock = {t: compute_indicators(pd.Series(c)) for t, c in closes.items()}
+        stock_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        panel = {}
+        names = list(closes.keys())
+        for i in range(0, n, chunk_size):
+            panel.update(compute_indicators_panel({t: closes[t] for t in names[i:i + chunk_size]}))
+        panel_time = time.perf_counter() - start
+
+        identical = all(np.array_equal(stock[t][k].values, panel[t][k], equal_nan=True)
+                        for t in names for k in stock[t])
+        results[n] = {'stock': stock_time, 'panel': panel_time, 'identical': identical}
+        print("Tickers: {} per-stock: {}s panel: {}s identical: {}".format(
+            n, round(stock_time, 3), round(panel_time, 3), identical))
+
+    return results
+
+
+def bench_process_pool(num_tickers=200, rows=2500, workers=None):
+    """Compares IndexProcessor metrics across worker counts
+    Fake OHLC data is processed from scratch with every worker count and
+    processed metadata is checked to be identical to the serial run
+
+    Parameters
+    ----------
+    num_tickers: int (200)
+        Number of tickers
+    rows: int (2500)
+        Rows per ticker
+    workers: tuple[int] (None)
+        Worker counts to benchmark, None doubles from 1 up to CPU count
+
+    Returns
+    -------
+    results: dict[int] = dict
+        Seconds taken and speedup over serial run per worker count
+    """
+
+    from processor import IndexProcessor
+
+    if(workers is None):
+        workers = [1]
+        while(workers[-1]*2 <= (os.cpu_count() or 1)):
+            workers.append(workers[-1]*2)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        ohlc_dir = os.path.join(tmp_dir, 'cleaned', 'OHLC', 'Nifty500')
+        metadata_loc = os.path.join(tmp_dir, 'cleaned', 'Metadata', 'nifty500.json')
+        os.makedirs(ohlc_dir)
+        os.makedirs(os.path.dirname(metadata_loc))
+        os.makedirs(os.path.dirname(metadata_loc).replace('cleaned', 'processed'))
+
+        storage = get_storage('csv', ohlc_dir)
+        metadata_json = []
+        for i in range(num_tickers):
+            ticker = 'T{}'.format(i)
+            storage.write(fake_ohlc(rows, date(2023, 1, 2), ticker), ticker)
+            metadata_json.append({'Ticker': ticker, 'Price': 100.0,
+                                  'OHLC Data Location': storage.path(ticker)})
+        with open(metadata_loc, 'w') as outfile:
+            json.dump(metadata_json, outfile)
+
+        serial, serial_time = None, None
+        for w in workers:
+            shutil.rmtree(ohlc_dir.replace('cleaned', 'processed'), ignore_errors=True)
+            ip = IndexProcessor(ohlc_dir, metadata_loc)
+
+            start = time.perf_counter()
+            ip.process_metrics(workers=w)
+            elapsed = time.perf_counter() - start
+
+            with open(ip.proc_metadata_loc, 'r') as infile:
+                output = infile.read()
+            if(serial is None):
+                serial, serial_time = output, elapsed
+            results[w] = {'time': elapsed, 'speedup': serial_time/elapsed,
+                          'identical': output == serial}
+
+        for w, r in results.items():
+            print("Workers: {} time: {}s speedup: {}x identical: {}".format(
+                w, round(r['time'], 3), round(r['speedup'], 2), r['identical']))
+
+    return results
+
+
+def bench_online_cov(num_tickers=(100, 500), window=250, days=20):
+    """Compares daily covariance recalculation with OnlineCovariance updates
+    Every day Ledoit-Wolf covariance of the last window returns is
+    calculated from scratch and by updating the engine, estimates of last
+    day are checked against pypfopt
+
+    Parameters
+    ----------
+    num_tickers: tuple[int] ((100, 500))
+        Universe sizes to benchmark
+    window: int (250)
+        Returns in lookback window
+    days: int (20)
+        Trading days appended
+
+    Returns
+    -------
+    results: dict[int] = dict
+        Seconds per day taken by each approach per universe size
+    """
+
+    from pypfopt import risk_models
+    from onlinecov import OnlineCovariance
+
+    results = {}
+    for n in num_tickers:
+        rows = window + days + 1
+        close = pd.DataFrame(100*np.exp((0.0005 + 0.015*np.random.randn(rows, n)).cumsum(axis=0)),
+                             index=pd.bdate_range(end=date(2023, 1, 2), periods=rows, name='Date'),
+                             columns=['T{}'.format(i) for i in range(n)])
+        engine = OnlineCovariance.from_prices(close.iloc[:-days], window)
+
+        start = time.perf_counter()
+        for i in range(rows - days, rows):
+            risk_models.CovarianceShrinkage(close.iloc[i - window:i + 1]).ledoit_wolf()
+        full_time = (time.perf_counter() - start)/days
+
+        start = time.perf_counter()
+        for i in range(rows - days, rows):
+            engine.update(close.iloc[i], close.index[i])
+            engine.ledoit_wolf()
+        online_time = (time.perf_counter() - start)/days
+
+        diff = max(engine.check(close).values())
+        results[n] = {'full': full_time, 'online': online_time, 'difference': diff}
+        print("Tickers: {} full: {}s/day online: {}s/day largest difference: {}".format(
+            n, round(full_time, 4), round(online_time, 4), diff))
+
+    return results
+
+
+def bench_backtest(num_tickers=500, years=10, rebalance='M', strategy='eff',
+                   objective='min_volatility'):
+    """Times walk-forward backtests with cold and warm-started covariance
+    Equity curves of both runs are compared
+
+    Parameters
+    ----------
+    num_tickers: int (500)
+        Number of tickers in close price panel
+    years: int (10)
+        Years of trading days in close price panel
+    rebalance: str or int ('M')
+        Rebalance schedule of Backtest
+    strategy: str ('eff')
+        Strategy of Backtest
+    objective: str ('min_volatility')
+        Objective of Backtest
+
+    Returns
+    -------
+    results: dict[str] = dict
+        Seconds taken by estimates, solves and profit and loss per run
+    """
+
+    from simulation import Backtest
+
+    rows = 252*years
+    close = pd.DataFrame(100*np.exp((0.0004 + 0.012*np.random.randn(rows, num_tickers)).cumsum(axis=0)),
+                         index=pd.bdate_range(end=date(2023, 1, 2), periods=rows, name='Date'),
+                         columns=['T{}'.format(i) for i in range(num_tickers)])
+
+    results, equity = {}, {}
+    for name, warm_start in [('cold', False), ('warm', True)]:
+        backtest = Backtest(close, strategy, objective, rebalance=rebalance, warm_start=warm_start)
+        start = time.perf_counter()
+        backtest.run()
+        results[name] = dict(backtest.timings, total=time.perf_counter() - start)
+        equity[name] = backtest.equity
+        print("{}: {}s estimates: {}s solves: {}s profit and loss: {}s".format(
+            name, round(results[name]['total'], 2), round(backtest.timings['estimate'], 2),
+            round(backtest.timings['solve'], 2), round(backtest.timings['pnl'], 4)))
+
+    print("Largest equity difference: {}".format((equity['cold'] - equity['warm']).abs().max()))
+    return results
+
+
+def bench_frontier(num_tickers=(100, 300), points=20, workers=(1, 4)):
+    """Compares rebuilding EfficientFrontier per frontier point with
+    EffOptimizer.frontier()
+
+    Parameters
+    ----------
+    num_tickers: tuple[int] ((100, 300))
+        Universe sizes to benchmark
+    points: int (20)
+        Number of frontier points
+    workers: tuple[int] ((1, 4))
+        Worker counts of EffOptimizer.frontier()
+
+    Returns
+    -------
+    results: dict[int] = dict
+        Seconds taken by each approach per universe size
+    """
+
+    from types import SimpleNamespace
+    from pypfopt.efficient_frontier import EfficientFrontier
+    from optimizer import EffOptimizer
+    from riskcache import RiskModelCache
+
+    results = {}
+    for n in num_tickers:
+        close = pd.DataFrame(100*np.exp((0.0005 + 0.01*np.random.randn(500, n)
+                                         + 0.005*np.random.randn(500, 1)).cumsum(axis=0)),
+                             index=pd.bdate_range(end=date(2023, 1, 2), periods=500, name='Date'),
+                             columns=['T{}'.format(i) for i in range(n)])
+        optimizer = EffOptimizer(SimpleNamespace(close_matrix=close), RiskModelCache())
+
+        start = time.perf_counter()
+        frontier, _ = optimizer.frontier(points, workers=1)
+        results[n] = {'frontier_1': time.perf_counter() - start}
+
+        start = time.perf_counter()
+        naive = []
+        for target in frontier['target_return']:
+            try:
+                ef = EfficientFrontier(optimizer.mu, optimizer.s)
+                ef.efficient_return(float(target))
+                naive.append(ef.portfolio_performance()[1])
+            except Exception:
+                naive.append(np.nan)
+        results[n]['naive'] = time.perf_counter() - start
+
+        for w in workers:
+            if(w > 1):
+                start = time.perf_counter()
+                optimizer.frontier(points, workers=w)
+                results[n]['frontier_{}'.format(w)] = time.perf_counter() - start
+
+        diff = np.nanmax(np.abs(frontier['volatility'].astype('float64').values - np.array(naive)))
+        print("Tickers: {} {} largest volatility difference: {}".format(
+            n, ' '.join('{}: {}s'.format(k, round(v, 2)) for k, v in results[n].items()), diff))
+
+    return results
+
+
+BENCHMARKS = {
+    'fetch_engine': bench_fetch_engine,
+    'update_append': bench_update_append,
+    'storage': bench_storage,
+    'indicator_engine': bench_indicator_engine,
+    'process_pool': bench_process_pool,
+    'online_cov': bench_online_cov,
+    'backtest': bench_backtest,
+    'frontier': bench_frontier,
+}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS.keys())
+    for name in names:
+        print("\nBenchmark: {}".format(name))
+        BENCHMARKS[name]()
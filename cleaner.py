@@ -9,10 +9,14 @@ It contains following classes
 
 import os
 import json
+from concurrent.futures import ThreadPoolExecutor
 
 import pandas as pd
 
-from utils import find_in_json, write_json
+from utils import write_json
+from metastore import MetadataStore
+from manifest import Manifest, fingerprint, content_hash
+from storage import get_storage
 
 
 class Cleaner:
@@ -75,31 +79,121 @@ class Nifty500Cleaner(Cleaner):
         Location of Raw Metadata, collected from fetcher
     metadata_clean : str
         Location of Clean Metadata, to be processed by cleaner
+    raw_storage : Storage()
+        Storage backend of OHLC Raw data
+    clean_storage : Storage()
+        Storage backend of OHLC Cleaned data
     
     Methods
     -------
-    clean_ohlc_data(): void
-        Cleanes OHLC data and stores as static CSVs in ohlc_clean_data directory
+    clean_ohlc_data(workers=int, force=bool): dict
+        Cleanes changed OHLC data and stores it in ohlc_clean_data directory
     clean_metadata(): void
         Cleans metadata and stores as static CSVs in metadata_clean directory
     """
 
-    def __init__(self):
+    def __init__(self, raw_storage='csv', clean_storage='csv'):
         super().__init__()
         self.ohlc_raw_data = 'data/raw/Nifty500'
         self.ohlc_clean_data = 'data/cleaned/OHLC/Nifty500'
+        self.raw_storage = get_storage(raw_storage, self.ohlc_raw_data)
+        self.clean_storage = get_storage(clean_storage, self.ohlc_clean_data)
+
+        if not os.path.exists(self.ohlc_clean_data):
+            os.makedirs(self.ohlc_clean_data)
+        if not os.path.exists(self.metadata_clean):
+            os.makedirs(self.metadata_clean)
     
-    def clean_ohlc_data(self):
-        """Cleanes OHLC data and stores as static CSVs in ohlc_clean_data directory
+    def clean_ohlc_data(self, workers=4, force=False):
+        """Cleanes changed OHLC data and stores it in ohlc_clean_data directory
+        Fingerprint (size, mtime, content hash) of every raw file is kept in
+        the cleaned data's manifest, raw files whose fingerprint is unchanged
+        since they were cleaned are skipped. Changed files are cleaned in
+        parallel. Cleaned files whose raw file is gone are removed, unless raw
+        directory is empty
+
+        Parameters
+        ----------
+        workers: int (4)
+            Number of files cleaned at once
+        force: bool (False)
+            Toggle to clean every file, even if unchanged
+
+        Returns
+        -------
+        counts: dict
+            Number of files skipped, cleaned, failed and removed
         """
         
-        for file in os.listdir(self.ohlc_raw_data):
+        manifest = Manifest(self.ohlc_clean_data, self.clean_storage.ext,
+                            self.clean_storage)
+        counts = {'skipped': 0, 'cleaned': 0, 'failed': 0, 'removed': 0}
+
+        def clean(name):
             try:
-                temp_df = pd.read_csv("{}/{}".format(self.ohlc_raw_data,file))
-                if(temp_df.shape[0] != 0):
-                    temp_df.set_index('Date').dropna().to_csv('{}/{}'.format(self.ohlc_clean_data, file))
+                source, changed = self._source_fingerprint(name, None if force else manifest.get(name))
+                if not changed:
+                    if(source is not None):
+                        manifest.set_source(name, source)
+                    return 'skipped'
+
+                temp_df = self.raw_storage.read(name)
+                if(temp_df.shape[0] == 0):
+                    return 'skipped'
+
+                clean_df = temp_df.dropna()
+                self.clean_storage.write(clean_df, name)
+                manifest.record(name, clean_df, source)
+                return 'cleaned'
             except Exception as e:
-                print("Exception {} occured for file: {}".format(e, file))
+                print("Exception {} occured for file: {}".format(e, self.raw_storage.path(name)))
+                return 'failed'
+
+        names = self.raw_storage.names()
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            for status in executor.map(clean, names):
+                counts[status] += 1
+
+        # Cleaned files whose raw file was deleted, an empty raw directory is
+        # more likely unmounted or not fetched yet than every ticker deleted
+        orphans = (set(self.clean_storage.names()) | set(manifest.entries)) - set(names)
+        if(len(names) == 0 and len(orphans)):
+            print("No raw OHLC data in {}, {} cleaned files kept".format(
+                self.ohlc_raw_data, len(orphans)))
+            orphans = set()
+        for name in sorted(orphans):
+            try:
+                if self.clean_storage.exists(name):
+                    os.remove(self.clean_storage.path(name))
+                manifest.remove(name)
+                counts['removed'] += 1
+            except Exception as e:
+                print("Exception {} occured for file: {}".format(e, self.clean_storage.path(name)))
+
+        manifest.save()
+        print("OHLC data skipped: {} cleaned: {} failed: {} removed: {}".format(
+            counts['skipped'], counts['cleaned'], counts['failed'], counts['removed']))
+        return counts
+
+    def _source_fingerprint(self, name, entry):
+        """Returns fingerprint of ticker's raw file and if it changed since
+        cleaned entry was recorded. Contents are compared by hash only if size
+        matches but modification time does not, fingerprint is None if the
+        recorded one is current
+        """
+
+        raw_loc = self.raw_storage.path(name)
+        source = fingerprint(raw_loc)
+        recorded = entry.get('source') if entry is not None else None
+
+        if(recorded is not None and recorded['size'] == source['size']):
+            if(recorded['mtime_ns'] == source['mtime_ns']):
+                return None, False
+            source['hash'] = content_hash(raw_loc)
+            return source, recorded['hash'] != source['hash']
+
+        source['hash'] = content_hash(raw_loc)
+        return source, True
     
     def clean_metadata(self):
         """Cleans metadata and stores as static CSVs in metadata_clean directory
@@ -107,10 +201,11 @@ class Nifty500Cleaner(Cleaner):
 
         metadata_json = []
         metadata1 = pd.read_csv('{}/nifty_500_list.csv'.format(self.metadata_raw)).to_dict(orient='records')
-        metadata2 = pd.read_csv('{}/nifty_500_metadata.csv'.format(self.metadata_raw)).to_dict(orient='records')
+        metadata2 = MetadataStore(pd.read_csv('{}/nifty_500_metadata.csv'.format(self.metadata_raw)).to_dict(orient='records'),
+                                  keys=('symbol',))
 
         for entry in metadata1: 
-            entry2 = find_in_json(metadata2, 'symbol', entry['Symbol'].replace('&', '&amp;'))
+            entry2 = metadata2.get(entry['Symbol'], 'symbol')
 
             if(entry2 is not None):
                 metadata_json.append({
@@ -123,7 +218,7 @@ class Nifty500Cleaner(Cleaner):
                     'Ex Date':entry2['exDate'],
                     'Purpose of Last Meeting':entry2['purpose'],
                     'Record Date':entry2['recordDate'],
-                    'OHLC Data Location':'{}/{}.csv'.format(self.ohlc_clean_data, entry['Symbol'])
+                    'OHLC Data Location':self.clean_storage.path(entry['Symbol'])
                 })
         
         write_json(metadata_json, '{}/nifty500.json'.format(self.metadata_clean))
\ No newline at end of file
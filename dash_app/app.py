@@ -6,36 +6,47 @@ import dash_bootstrap_components as dbc
 import dash_html_components as html
 import dash_core_components as dcc
 
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State, ClientsideFunction
+from dash.exceptions import PreventUpdate
 import plotly.express as px
 import pandas as pd
 import numpy as np
 import math
 
+from datastore import get_store
+from downsample import downsample, relayout_range
+from jobs import get_queue
+from portfolio import optimize
+
 external_stylesheets = ['https://stackpath.bootstrapcdn.com/bootswatch/4.5.2/litera/bootstrap.min.css',
                         'https://codepen.io/chriddyp/pen/bWLwgP.css']
 
-app = dash.Dash(__name__, external_stylesheets=external_stylesheets)
+app = dash.Dash(__name__, external_stylesheets=external_stylesheets,
+                suppress_callback_exceptions=True)
+# WSGI entry point, served by gunicorn -c gunicorn.conf.py app:server
+server = app.server
 
-metadata_df = pd.read_csv('static_files/nifty_500_metadata.csv')
-metadict = metadata_df[['symbol', 'companyName']].to_dict(orient='records')
-val_dict = [{'label':item['companyName'], 'value':item['symbol']} for item in metadict]
+store = get_store('static_files', 'NSE')
+val_dict = store.options()
 
-app.layout = html.Div([
-    dcc.Dropdown(
-        id='demo-dropdown',
-        options=val_dict,
-        value='3MINDIA'
-    ),
-    dcc.Tabs(id='tabs-example', value='tab-1', children=[
-        dcc.Tab(label='Stock', value='tab-1'),
-        dcc.Tab(label='OHLC', value='tab-2'),
-        dcc.Tab(label='Technical Analysis', value='tab-3'),
-        dcc.Tab(label='Fundamental Analysis', value='tab-4'),
-        dcc.Tab(label='Portfolio', value='tab-5'),
-    ]),
-    html.Div(id='tabs-example-content')
-])
+# Points sent per price chart, zoomed ranges are re-fetched at this resolution
+GRAPH_POINTS = 1000
+TABS = [
+    {'label': 'Stock', 'value': 'tab-1'},
+    {'label': 'OHLC', 'value': 'tab-2'},
+    {'label': 'Technical Analysis', 'value': 'tab-3'},
+    {'label': 'Fundamental Analysis', 'value': 'tab-4'},
+    {'label': 'Portfolio', 'value': 'tab-5'},
+]
+
+queue = get_queue()
+PORTFOLIO_STRATEGIES = [
+    {'label': 'Efficient Frontier (Max Sharpe)', 'value': 'eff/max_sharpe'},
+    {'label': 'Efficient Frontier (Min Volatility)', 'value': 'eff/min_volatility'},
+    {'label': 'Critical Line Algorithm (Max Sharpe)', 'value': 'cla/max_sharpe'},
+    {'label': 'Critical Line Algorithm (Min Volatility)', 'value': 'cla/min_volatility'},
+    {'label': 'Hierarchical Risk Parity', 'value': 'hrp'},
+]
 
 def row_wrap(func):
     return html.Div(style={'padding':'2rem'}, className='row', children=func)
@@ -67,35 +78,143 @@ def data_mapper(dump):
             print(e)
     return row_wrap(cards)
 
-df3 = pd.read_csv("static_files/nifty_500_metadata.csv")
-@app.callback(Output('tabs-example-content', 'children'),
-              Input('tabs-example', 'value'),
-              Input('demo-dropdown', 'value'))
-def render_content(tab, stock):
-    if tab == 'tab-1':
-        return html.Div(className='jumbotron', children=[
-            #row_wrap(html.H1('3MINDIA')),
-            dcc.Graph(figure=px.scatter(pd.read_csv('static_files/NSE/{}.csv'.format(stock)), x='Date', y='Close')),
-            #html.Div(style={'padding':'2rem'}, className='row', children=[cards, cards, cards, cards, cards, cards]),
-            #row_wrap(card())
-            data_mapper(df3[df3['symbol'] == stock].to_dict(orient='records')[0])
-        ])
-    elif tab == 'tab-2':
-        return html.Div([
+def price_figure(stock, start=None, end=None):
+    fig = px.scatter(downsample(store.ohlc(stock), GRAPH_POINTS, start, end), x='Date', y='Close')
+    fig.update_layout(uirevision=stock)
+    return fig
+
+def portfolio_content(result):
+    weights = pd.Series(result['weights']).sort_values(ascending=False)
+    stats = {key: round(result[key], 3) for key in ['Expected Annual Return', 'Annual Volatility', 'Sharpe Ratio']
+             if result[key] is not None}
+    children = [row_wrap([card(key, value) for key, value in stats.items()]),
+                dcc.Graph(figure=px.bar(x=weights.index, y=weights.values, labels={'x': 'Stock', 'y': 'Weight'}))]
+    if result['dropped']:
+        children.append(html.P('Left out for missing prices: {}'.format(', '.join(result['dropped']))))
+    return html.Div(children)
+
+def tab_panel(tab, children):
+    return html.Div(id='panel-{}'.format(tab), style={} if tab == 'tab-1' else {'display': 'none'},
+                    children=children)
+
+# Every tab stays in the layout and is shown by a clientside callback, so tab
+# switches make no server request. Figure and cards of tickers are kept in
+# ticker-cache in the browser with their etag, the server only sends a
+# ticker again when its data changed.
+app.layout = html.Div([
+    dcc.Dropdown(
+        id='demo-dropdown',
+        options=val_dict,
+        value='3MINDIA'
+    ),
+    dcc.Tabs(id='tabs-example', value='tab-1', children=[
+        dcc.Tab(label=tab['label'], value=tab['value']) for tab in TABS
+    ]),
+    html.Div(id='tabs-example-content', children=[
+        tab_panel('tab-1', html.Div(className='jumbotron', children=[
+            dcc.Graph(id='price-graph'),
+            html.Div(id='stock-cards')
+        ])),
+        tab_panel('tab-2', html.Div([
             html.H3('Tab content 2')
-        ])
-    elif tab == 'tab-3':
-        return html.Div([
+        ])),
+        tab_panel('tab-3', html.Div([
             html.H3('Tab content 3')
-        ])
-    elif tab == 'tab-4':
-        return html.Div([
+        ])),
+        tab_panel('tab-4', html.Div([
             html.H3('Tab content 4')
-        ])
-    elif tab == 'tab-5':
-        return html.Div([
-            html.H3('Tab content 5')
-        ])
+        ])),
+        tab_panel('tab-5', html.Div(style={'padding': '2rem'}, children=[
+            dcc.Dropdown(id='portfolio-symbols', options=val_dict, multi=True,
+                         value=[item['value'] for item in val_dict[:10]]),
+            dcc.Dropdown(id='portfolio-strategy', options=PORTFOLIO_STRATEGIES, value='eff/max_sharpe',
+                         clearable=False),
+            dcc.Input(id='portfolio-lookback', type='number', value=250, min=30, step=1),
+            html.Button('Optimize', id='portfolio-run'),
+            dcc.Store(id='portfolio-job'),
+            dcc.Interval(id='portfolio-interval', interval=1000, disabled=True),
+            html.Div(id='portfolio-result')
+        ])),
+    ]),
+    dcc.Store(id='ticker-delivery'),
+    dcc.Store(id='ticker-cache'),
+    dcc.Store(id='ticker-etags'),
+    dcc.Store(id='price-zoom')
+])
+
+app.clientside_callback(ClientsideFunction('dashboard', 'show_tab'),
+                        [Output('panel-{}'.format(tab['value']), 'style') for tab in TABS],
+                        Input('tabs-example', 'value'))
+
+app.clientside_callback(ClientsideFunction('dashboard', 'cache_ticker'),
+                        Output('ticker-cache', 'data'),
+                        Output('ticker-etags', 'data'),
+                        Input('ticker-delivery', 'data'),
+                        State('ticker-cache', 'data'))
+
+app.clientside_callback(ClientsideFunction('dashboard', 'render_ticker'),
+                        Output('price-graph', 'figure'),
+                        Output('stock-cards', 'children'),
+                        Input('demo-dropdown', 'value'),
+                        Input('ticker-cache', 'data'),
+                        Input('price-zoom', 'data'))
+
+@app.callback(Output('ticker-delivery', 'data'),
+              Input('demo-dropdown', 'value'),
+              State('ticker-etags', 'data'))
+def sync_ticker(stock, etags):
+    if not stock:
+        raise PreventUpdate
+    etag = store.etag(stock)
+    if etags and etags.get(stock) == etag:
+        # Browser holds current data of stock
+        raise PreventUpdate
+    return {'ticker': stock, 'etag': etag, 'figure': price_figure(stock),
+            'cards': data_mapper(store.record(stock))}
+
+@app.callback(Output('price-zoom', 'data'),
+              Input('price-graph', 'relayoutData'),
+              State('demo-dropdown', 'value'))
+def zoom_graph(relayout_data, stock):
+    x_range = relayout_range(relayout_data)
+    if x_range is None or not stock:
+        raise PreventUpdate
+    if x_range == (None, None):
+        # Zoomed out, full figure is in ticker-cache
+        return {'ticker': stock, 'figure': None}
+    return {'ticker': stock, 'figure': price_figure(stock, *x_range)}
+
+@app.callback(Output('portfolio-job', 'data'),
+              Input('portfolio-run', 'n_clicks'),
+              State('portfolio-symbols', 'value'),
+              State('portfolio-strategy', 'value'),
+              State('portfolio-lookback', 'value'))
+def submit_portfolio(n_clicks, symbols, strategy, lookback):
+    if not n_clicks or not symbols:
+        raise PreventUpdate
+    strategy, _, objective = strategy.partition('/')
+    params = {'symbols': sorted(symbols), 'strategy': strategy, 'objective': objective or None,
+              'lookback': int(lookback or 250)}
+    # Identical requests of concurrent users share one job and its result
+    return {'id': queue.submit(optimize, **params), 'params': params}
+
+@app.callback(Output('portfolio-result', 'children'),
+              Output('portfolio-interval', 'disabled'),
+              Input('portfolio-job', 'data'),
+              Input('portfolio-interval', 'n_intervals'))
+def poll_portfolio(job, n_intervals):
+    if job is None:
+        raise PreventUpdate
+    status = queue.status(job['id'])
+    if status['state'] == 'unknown':
+        # Result expired or is not shared, submit() does not start a second
+        # job while another server worker holds the job's running marker
+        status = queue.status(queue.submit(optimize, **job['params']))
+    if status['state'] in ('pending', 'running'):
+        return html.P('Optimizing ({})...'.format(status['state'])), False
+    elif status['state'] == 'done':
+        return portfolio_content(status['result']), True
+    return html.P('Optimization failed: {}'.format(status['error'] or 'job not found')), True
 
 if __name__ == "__main__":
     import os
@@ -0,0 +1,59 @@
+// Clientside callbacks of the dashboard, see app.py
+// Tab switches and tickers already held by the browser make no server request
+
+// Number of tickers kept in ticker-cache, oldest delivered are removed first
+var MAX_CACHED_TICKERS = 32;
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    dashboard: {
+        // Shows panel of selected tab, every panel stays in the layout
+        show_tab: function(tab) {
+            return window.dash_clientside.callback_context.outputs_list.map(function(output) {
+                return output.id === 'panel-' + tab ? {} : {'display': 'none'};
+            });
+        },
+
+        // Adds delivered ticker to ticker-cache, returns cache and etags
+        cache_ticker: function(delivery, cache) {
+            var no_update = window.dash_clientside.no_update;
+            if(!delivery) {
+                return [no_update, no_update];
+            }
+
+            var entries = Object.assign({}, cache || {});
+            delete entries[delivery.ticker];
+            entries[delivery.ticker] = delivery;
+            var tickers = Object.keys(entries);
+            while(tickers.length > MAX_CACHED_TICKERS) {
+                delete entries[tickers.shift()];
+            }
+
+            var etags = {};
+            Object.keys(entries).forEach(function(ticker) {
+                etags[ticker] = entries[ticker].etag;
+            });
+            return [entries, etags];
+        },
+
+        // Returns figure and cards of stock from ticker-cache, a zoomed figure
+        // only replaces the figure
+        render_ticker: function(stock, cache, zoom) {
+            var no_update = window.dash_clientside.no_update;
+            var entry = cache && cache[stock];
+            if(!entry) {
+                return [no_update, no_update];
+            }
+
+            var triggered = window.dash_clientside.callback_context.triggered.map(function(t) {
+                return t.prop_id;
+            });
+            if(triggered.length === 1 && triggered[0] === 'price-zoom.data') {
+                if(!zoom || zoom.ticker !== stock) {
+                    return [no_update, no_update];
+                }
+                return [zoom.figure || entry.figure, no_update];
+            }
+            return [entry.figure, entry.cards];
+        }
+    }
+});
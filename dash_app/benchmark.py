@@ -0,0 +1,140 @@
+"""Benchmark module
+
+This script contains benchmarks of the dashboard data path, run against
+synthetic static files so no fetched data is needed.
+
+    python benchmark.py [name ...]
+
+It contains following functions
+    * fake_static_files: Writes synthetic metadata and OHLC CSVs
+    * measure: Returns median seconds and result of repeated calls
+    * bench_payload: Compares payload size and latency of price charts with
+                     and without downsampling
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+from datastore import DataStore
+from downsample import downsample
+
+
+def fake_static_files(static_dir, num_tickers=20, rows=11000, exchange='NSE'):
+    """Writes synthetic metadata and OHLC CSVs shaped like static_files
+
+    Parameters
+    ----------
+    static_dir: str
+        Location of directory to write files to
+    num_tickers: int (20)
+        Number of tickers
+    rows: int (11000)
+        Trading days of every ticker, 11000 is about 1980 to date
+    exchange: str ('NSE')
+        Name of OHLC directory
+
+    Returns
+    -------
+    symbols: list[str]
+        Symbols written
+    """
+
+    symbols = ['FAKE{}'.format(i) for i in range(num_tickers)]
+    os.makedirs(os.path.join(static_dir, exchange), exist_ok=True)
+    pd.DataFrame({'symbol': symbols, 'companyName': ['{} Ltd'.format(s) for s in symbols],
+                  'pChange': np.random.randn(num_tickers)}).to_csv(
+        os.path.join(static_dir, 'nifty_500_metadata.csv'))
+
+    dates = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=rows, name='Date')
+    for symbol in symbols:
+        close = 100*np.exp((0.0003 + 0.015*np.random.randn(rows)).cumsum())
+        pd.DataFrame({'Open': close, 'High': close*1.01, 'Low': close*0.99, 'Close': close,
+                      'Volume': np.random.randint(1e4, 1e6, rows)}, index=dates).to_csv(
+            os.path.join(static_dir, exchange, '{}.csv'.format(symbol)))
+    return symbols
+
+
+def measure(func, repeat=5):
+    """Returns median seconds and result of repeated calls of func
+    """
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)), result
+
+
+def bench_payload(num_tickers=20, rows=11000, points=1000, repeat=5):
+    """Compares payload size and latency of price charts with and without
+    downsampling
+    Latency covers loading OHLC data, building the figure and serializing it
+    as JSON, like a Dash callback returning the figure
+
+    Parameters
+    ----------
+    num_tickers: int (20)
+        Number of tickers, charts are rendered for every ticker
+    rows: int (11000)
+        Trading days of every ticker
+    points: int (1000)
+        Points kept by downsampling
+    repeat: int (5)
+        Calls per ticker, median is reported
+
+    Returns
+    -------
+    results: dict[str] = dict
+        Median latency (s) and payload size (bytes) of every approach
+    """
+
+    static_dir = tempfile.mkdtemp()
+    try:
+        symbols = fake_static_files(static_dir, num_tickers, rows)
+        store = DataStore(static_dir, 'NSE')
+        last_year = (str(pd.Timestamp.today() - pd.Timedelta(days=365))[:10], None)
+
+        approaches = {
+            'full': lambda s: px.scatter(pd.read_csv(os.path.join(static_dir, 'NSE', '{}.csv'.format(s))),
+                                         x='Date', y='Close').to_json(),
+            'cached': lambda s: px.scatter(store.ohlc(s), x='Date', y='Close').to_json(),
+            'lttb': lambda s: px.scatter(downsample(store.ohlc(s), points), x='Date', y='Close').to_json(),
+            'minmax': lambda s: px.scatter(downsample(store.ohlc(s), points, method='minmax'),
+                                           x='Date', y='Close').to_json(),
+            'zoom_1y': lambda s: px.scatter(downsample(store.ohlc(s), points, *last_year),
+                                            x='Date', y='Close').to_json(),
+        }
+
+        results = {}
+        for name, render in approaches.items():
+            latency, payload = [], []
+            for symbol in symbols:
+                seconds, figure = measure(lambda: render(symbol), repeat)
+                latency.append(seconds)
+                payload.append(len(figure.encode()))
+            results[name] = {'latency': float(np.median(latency)), 'payload': int(np.median(payload))}
+            print("{}: {}ms {}KB".format(name, round(results[name]['latency']*1000, 2),
+                                         round(results[name]['payload']/1024, 1)))
+    finally:
+        shutil.rmtree(static_dir)
+
+    return results
+
+
+BENCHMARKS = {
+    'payload': bench_payload,
+}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS.keys())
+    for name in names:
+        print("\nBenchmark: {}".format(name))
+        BENCHMARKS[name]()
@@ -0,0 +1,572 @@
+"""Datastore module
+
+This script contains the data access layer of the dashboard. Metadata is
+loaded once into a frame indexed by symbol and OHLC data is served from a
+size-bounded LRU cache, so callbacks do not read CSVs from disk. Entries
+are reloaded when their file's size or modification time changes.
+
+For multi-worker serving OHLC data is packed into memory-mapped arrays
+before workers are forked, every worker reads the same pages instead of
+holding its own copy.
+
+It contains following classes
+    * MetadataTable: Metadata CSVs joined and indexed by a column, reloaded
+                     on change
+    * OHLCCache: LRU cache of OHLC CSVs bounded by memory used
+    * SharedOHLC: Memory-mapped pack of OHLC CSVs, shared by processes
+    * DataStore: Metadata table and OHLC cache of an exchange
+
+It contains following functions
+    * file_version: Returns (size, modification time) of a file
+    * get_store: Returns process-wide DataStore of an exchange
+"""
+
+import os
+import json
+import glob
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def file_version(file_loc):
+    """Returns (size, modification time) of a file, None if missing
+    """
+
+    try:
+        st = os.stat(file_loc)
+    except FileNotFoundError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+
+class MetadataTable:
+    """
+    Class to represent a metadata CSV, inner joined with other CSVs and
+    indexed by a column, reloaded when any of the files changes
+
+    ...
+
+    Attributes
+    ----------
+    csv_loc : str
+        Location of metadata CSV
+    key : str
+        Column rows are indexed by
+    joins : list[tuple]
+        (location, column) of CSVs joined where column = key
+    version : tuple
+        (size, modification time) of loaded files
+
+    Methods
+    -------
+    frame(): pd.DataFrame
+        Returns metadata indexed by key, reloading it if file changed
+    get(value=str): dict
+        Returns row where key = value, None if missing
+    options(label=str): list[dict]
+        Returns dropdown options of every row
+    """
+
+    def __init__(self, csv_loc, key='symbol', joins=()):
+        self.csv_loc = csv_loc
+        self.key = key
+        self.joins = list(joins)
+        self.version = None
+        self._frame = None
+        self._records = {}
+        self._options = {}
+        self._lock = threading.Lock()
+
+    def frame(self):
+        """Returns metadata indexed by key, reloading it if file changed
+        Returned frame is shared and must not be modified
+        """
+
+        version = tuple(file_version(loc) for loc in [self.csv_loc] + [j[0] for j in self.joins])
+        if(version != self.version or self._frame is None):
+            with self._lock:
+                if(version != self.version or self._frame is None):
+                    frame = pd.read_csv(self.csv_loc)
+                    for join_loc, column in self.joins:
+                        frame = pd.merge(frame, pd.read_csv(join_loc), how='inner',
+                                         left_on=self.key, right_on=column)
+                    frame = frame.drop_duplicates(self.key).set_index(self.key, drop=False)
+                    self._frame, self._records, self._options = frame, {}, {}
+                    self.version = version
+        return self._frame
+
+    def get(self, value):
+        """Returns row where key = value, None if missing
+        Rows are converted to dicts (of Python types, like
+        DataFrame.to_dict(orient='records')) once per file version
+
+        Parameters
+        ----------
+        value: str
+            Expected value of key column
+
+        Returns
+        -------
+        record: dict
+            Copy of row
+        """
+
+        frame = self.frame()
+        record = self._records.get(value)
+        if(record is None):
+            if(value not in frame.index):
+                return None
+            record = frame.loc[[value]].to_dict(orient='records')[0]
+            self._records[value] = record
+        return dict(record)
+
+    def options(self, label='companyName'):
+        """Returns dropdown options of every row
+
+        Parameters
+        ----------
+        label: str ('companyName')
+            Column shown as option's label, key is option's value
+        """
+
+        frame = self.frame()
+        options = self._options.get(label)
+        if(options is None):
+            options = [{'label': l, 'value': v} for l, v in zip(frame[label], frame[self.key])]
+            self._options[label] = options
+        return options
+
+
+class OHLCCache:
+    """
+    Class to represent an LRU cache of OHLC CSVs bounded by memory used
+
+    Memory of every frame is measured with DataFrame.memory_usage(deep=True),
+    least recently used frames are evicted once total exceeds max_bytes. A
+    cached frame is reloaded if its file's size or modification time changed.
+
+    ...
+
+    Attributes
+    ----------
+    ohlc_dir : str
+        Location of directory containing {symbol}.csv files
+    max_bytes : int
+        Memory cached frames may use
+    parse_dates : tuple[str]
+        Columns parsed as dates
+    nbytes : int
+        Memory used by cached frames
+    hits : int
+        Number of frames served from memory
+    misses : int
+        Number of frames read from disk
+
+    Methods
+    -------
+    get(symbol=str): pd.DataFrame
+        Returns OHLC data of symbol
+    stats(): dict
+        Returns entries, memory used, hits and misses
+    clear(): void
+        Removes every cached frame
+    """
+
+    def __init__(self, ohlc_dir, max_bytes=256*1024*1024, parse_dates=('Date',)):
+        self.ohlc_dir = ohlc_dir
+        self.max_bytes = max_bytes
+        self.parse_dates = tuple(parse_dates)
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, symbol):
+        """Returns OHLC data of symbol
+        Returned frame is shared and must not be modified
+
+        Parameters
+        ----------
+        symbol: str
+            Symbol of stock
+
+        Returns
+        -------
+        ohlc: pd.DataFrame
+            OHLC data as read from {symbol}.csv, with dates parsed
+        """
+
+        csv_loc = os.path.join(self.ohlc_dir, '{}.csv'.format(symbol))
+        version = file_version(csv_loc)
+
+        with self._lock:
+            entry = self._entries.get(symbol)
+            if(entry is not None and entry[0] == version):
+                self._entries.move_to_end(symbol)
+                self.hits += 1
+                return entry[1]
+
+        ohlc = pd.read_csv(csv_loc, parse_dates=list(self.parse_dates))
+        nbytes = int(ohlc.memory_usage(index=True, deep=True).sum())
+
+        with self._lock:
+            self.misses += 1
+            previous = self._entries.pop(symbol, None)
+            if(previous is not None):
+                self.nbytes -= previous[2]
+            if(nbytes <= self.max_bytes):
+                self._entries[symbol] = (version, ohlc, nbytes)
+                self.nbytes += nbytes
+                while(self.nbytes > self.max_bytes):
+                    _, (_, _, evicted) = self._entries.popitem(last=False)
+                    self.nbytes -= evicted
+        return ohlc
+
+    def stats(self):
+        """Returns entries, memory used, hits and misses
+        """
+
+        return {'entries': len(self._entries), 'nbytes': self.nbytes,
+                'max_bytes': self.max_bytes, 'hits': self.hits, 'misses': self.misses}
+
+    def clear(self):
+        """Removes every cached frame
+        """
+
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+
+class SharedOHLC:
+    """
+    Class to represent a memory-mapped pack of OHLC CSVs, shared by processes
+
+    Numeric columns of every CSV are stacked into one float64 array and
+    dates into one datetime64 array, both opened read-only with mmap so
+    processes forked after prepare() share the page cache. Non-numeric
+    columns are pickled alongside and loaded before workers are forked.
+    Column order and dtypes of every CSV are kept, so a symbol served from
+    the pack has the same columns as OHLCCache.get(). A symbol whose CSV
+    changed after packing is not served until the pack is rebuilt.
+
+    ...
+
+    Attributes
+    ----------
+    ohlc_dir : str
+        Location of directory containing {symbol}.csv files
+    pack_dir : str
+        Location of directory containing pack files
+    columns : list[str]
+        Numeric columns of pack
+    symbols : dict[str] = list
+        Start row, end row, file version and [column, dtype] of every column
+        of every symbol
+    objects : dict[str] = pd.DataFrame
+        Non-numeric columns of every symbol
+    nbytes : int
+        Size of packed arrays
+
+    Methods
+    -------
+    prepare(): void
+        Opens pack, rebuilding it if any CSV changed
+    stale(): bool
+        Checks if CSVs were added, removed or changed since packing
+    build(): void
+        Packs every CSV
+    load(): bool
+        Opens pack files, returns False if missing
+    get(symbol=str): pd.DataFrame
+        Returns OHLC data of symbol backed by pack, None if not packed
+    """
+
+    def __init__(self, ohlc_dir, pack_dir=None):
+        self.ohlc_dir = ohlc_dir
+        self.pack_dir = pack_dir if pack_dir is not None else '{}.pack'.format(ohlc_dir.rstrip('/'))
+        self.index_loc = os.path.join(self.pack_dir, 'index.json')
+        self.columns = []
+        self.symbols = {}
+        self.objects = {}
+        self.nbytes = 0
+        self.dates = None
+        self.values = None
+
+    def prepare(self):
+        """Opens pack, rebuilding it if any CSV changed
+        Called once before workers are forked
+        """
+
+        if not self.load() or self.stale():
+            self.build()
+            self.load()
+        print("Shared OHLC pack: {} symbols, {}MB".format(len(self.symbols),
+                                                         round(self.nbytes/1024/1024, 1)))
+
+    def _csvs(self):
+        """Returns {symbol: location} of every CSV
+        """
+
+        return {os.path.basename(f)[:-4]: f for f in glob.glob(os.path.join(self.ohlc_dir, '*.csv'))}
+
+    def stale(self):
+        """Checks if CSVs were added, removed or changed since packing
+        """
+
+        csvs = self._csvs()
+        if(set(csvs.keys()) != set(self.symbols.keys())):
+            return True
+        if any(len(entry) != 4 for entry in self.symbols.values()):
+            return True
+        return any(list(file_version(loc)) != self.symbols[s][2] for s, loc in csvs.items())
+
+    def build(self):
+        """Packs every CSV
+        Files are written under temporary names and replaced, index last, so
+        processes holding the previous pack keep reading it
+        """
+
+        frames, symbols, objects = [], {}, {}
+        for symbol, csv_loc in sorted(self._csvs().items()):
+            version = file_version(csv_loc)
+            try:
+                ohlc = pd.read_csv(csv_loc, parse_dates=['Date'])
+            except Exception as e:
+                print("Exception {} occured packing: {}".format(e, csv_loc))
+                continue
+            frames.append((symbol, version, ohlc))
+
+        columns = []
+        for _, _, ohlc in frames:
+            columns.extend(c for c in ohlc.select_dtypes('number').columns if c not in columns)
+
+        rows = sum(len(ohlc) for _, _, ohlc in frames)
+        os.makedirs(self.pack_dir, exist_ok=True)
+        dates_tmp = os.path.join(self.pack_dir, 'dates.npy.tmp')
+        values_tmp = os.path.join(self.pack_dir, 'values.npy.tmp')
+        dates = np.lib.format.open_memmap(dates_tmp, 'w+', 'datetime64[ns]', (rows,))
+        values = np.lib.format.open_memmap(values_tmp, 'w+', 'float64', (rows, len(columns)))
+
+        start = 0
+        for symbol, version, ohlc in frames:
+            end = start + len(ohlc)
+            dates[start:end] = ohlc['Date'].values
+            numeric = ohlc.select_dtypes('number')
+            values[start:end] = numeric.reindex(columns=columns).values.astype('float64')
+            symbols[symbol] = [start, end, list(version),
+                               [[c, str(ohlc[c].dtype)] for c in ohlc.columns]]
+            objects[symbol] = ohlc[[c for c in ohlc.columns
+                                    if c != 'Date' and c not in numeric.columns]]
+            start = end
+        dates.flush()
+        values.flush()
+        del dates, values
+
+        objects_tmp = os.path.join(self.pack_dir, 'objects.pkl.tmp')
+        pd.to_pickle(objects, objects_tmp)
+
+        os.replace(dates_tmp, os.path.join(self.pack_dir, 'dates.npy'))
+        os.replace(values_tmp, os.path.join(self.pack_dir, 'values.npy'))
+        os.replace(objects_tmp, os.path.join(self.pack_dir, 'objects.pkl'))
+        tmp_loc = '{}.tmp'.format(self.index_loc)
+        with open(tmp_loc, 'w') as outfile:
+            json.dump({'columns': columns, 'symbols': symbols}, outfile)
+        os.replace(tmp_loc, self.index_loc)
+
+    def load(self):
+        """Opens pack files, returns False if missing
+        """
+
+        if not os.path.exists(self.index_loc):
+            return False
+
+        with open(self.index_loc, 'r') as infile:
+            index = json.load(infile)
+        self.dates = np.load(os.path.join(self.pack_dir, 'dates.npy'), mmap_mode='r')
+        self.values = np.load(os.path.join(self.pack_dir, 'values.npy'), mmap_mode='r')
+        objects_loc = os.path.join(self.pack_dir, 'objects.pkl')
+        self.objects = pd.read_pickle(objects_loc) if os.path.exists(objects_loc) else {}
+        self.columns = index['columns']
+        self.symbols = index['symbols']
+        self.nbytes = self.dates.nbytes + self.values.nbytes
+        return True
+
+    def get(self, symbol):
+        """Returns OHLC data of symbol built from pack, None if not packed
+        Columns and dtypes are those of {symbol}.csv as read by OHLCCache
+
+        Parameters
+        ----------
+        symbol: str
+            Symbol of stock
+
+        Returns
+        -------
+        ohlc: pd.DataFrame
+            OHLC data of {symbol}.csv, with dates parsed
+        """
+
+        entry = self.symbols.get(symbol)
+        if(entry is None or self.values is None or len(entry) != 4):
+            return None
+        start, end, version, columns = entry
+        if(list(file_version(os.path.join(self.ohlc_dir, '{}.csv'.format(symbol))) or []) != version):
+            return None
+
+        objects = self.objects.get(symbol, pd.DataFrame())
+        positions = {c: i for i, c in enumerate(self.columns)}
+        data = {}
+        for column, dtype in columns:
+            if(column == 'Date'):
+                data[column] = self.dates[start:end]
+            elif(column in objects.columns):
+                data[column] = objects[column].values
+            else:
+                data[column] = self.values[start:end, positions[column]].astype(dtype)
+        return pd.DataFrame(data, columns=[c for c, _ in columns])
+
+
+class DataStore:
+    """
+    Class to represent the metadata table and OHLC cache of an exchange
+
+    ...
+
+    Attributes
+    ----------
+    static_dir : str
+        Location of static files
+    exchange : str
+        Exchange, name of directory containing OHLC CSVs
+    metadata : MetadataTable()
+        Metadata indexed by symbol
+    listing : MetadataTable()
+        Metadata joined with index constituents list, indexed by symbol
+    ohlc_cache : OHLCCache()
+        LRU cache of OHLC data
+    shared_ohlc : SharedOHLC()
+        Memory-mapped OHLC data, None until share() is called
+
+    Methods
+    -------
+    share(): void
+        Packs OHLC data into memory-mapped arrays shared by forked workers
+    ohlc(symbol=str): pd.DataFrame
+        Returns OHLC data of symbol
+    record(symbol=str): dict
+        Returns metadata of symbol
+    listing_record(symbol=str): dict
+        Returns metadata and constituents list entry of symbol
+    etag(symbol=str): str
+        Returns version tag of symbol's OHLC data and metadata
+    options(): list[dict]
+        Returns dropdown options of every symbol
+    """
+
+    def __init__(self, static_dir='static_files', exchange='NSE', max_bytes=256*1024*1024):
+        self.static_dir = static_dir
+        self.exchange = exchange
+        self.metadata = MetadataTable(os.path.join(static_dir, 'nifty_500_metadata.csv'), 'symbol')
+        self.listing = MetadataTable(os.path.join(static_dir, 'nifty_500_metadata.csv'), 'symbol',
+                                     joins=[(os.path.join(static_dir, 'nifty_500_list.csv'), 'Symbol')])
+        self.ohlc_cache = OHLCCache(os.path.join(static_dir, exchange), max_bytes)
+        self.shared_ohlc = None
+
+    def share(self):
+        """Packs OHLC data into memory-mapped arrays shared by forked workers
+        Metadata is loaded too, so workers inherit it
+        """
+
+        self.shared_ohlc = SharedOHLC(os.path.join(self.static_dir, self.exchange))
+        self.shared_ohlc.prepare()
+        self.metadata.frame()
+
+    def ohlc(self, symbol):
+        """Returns OHLC data of symbol, from shared pack if it is up to date,
+        otherwise from OHLCCache.get()
+        """
+
+        if(self.shared_ohlc is not None):
+            ohlc = self.shared_ohlc.get(symbol)
+            if(ohlc is not None):
+                return ohlc
+        return self.ohlc_cache.get(symbol)
+
+    def record(self, symbol):
+        """Returns metadata of symbol, see MetadataTable.get()
+        """
+
+        return self.metadata.get(symbol)
+
+    def listing_record(self, symbol):
+        """Returns metadata and constituents list entry of symbol, None if
+        symbol is missing from either, see MetadataTable.get()
+        """
+
+        return self.listing.get(symbol)
+
+    def etag(self, symbol):
+        """Returns version tag of symbol's OHLC data and metadata
+        Tag changes when OHLC CSV of symbol or metadata CSV changes, clients
+        holding data of the same tag do not need it sent again
+
+        Parameters
+        ----------
+        symbol: str
+            Symbol of stock
+
+        Returns
+        -------
+        etag: str
+            Hex digest of symbol and file versions
+        """
+
+        csv_loc = os.path.join(self.static_dir, self.exchange, '{}.csv'.format(symbol))
+        h = hashlib.blake2b(digest_size=8)
+        h.update(json.dumps([symbol, file_version(csv_loc),
+                             file_version(self.metadata.csv_loc)]).encode())
+        return h.hexdigest()
+
+    def options(self):
+        """Returns dropdown options of every symbol, labelled by company name
+        """
+
+        return self.metadata.options('companyName')
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(static_dir='static_files', exchange='NSE', max_bytes=None):
+    """Returns process-wide DataStore of an exchange, created on first call
+
+    Parameters
+    ----------
+    static_dir: str ('static_files')
+        Location of static files
+    exchange: str ('NSE')
+        Exchange, name of directory containing OHLC CSVs
+    max_bytes: int (None)
+        Memory OHLC cache may use, None reads DASH_CACHE_MB (default 256)
+
+    Returns
+    -------
+    store: DataStore()
+        Shared store
+    """
+
+    with _stores_lock:
+        store = _stores.get((static_dir, exchange))
+        if(store is None):
+            if(max_bytes is None):
+                max_bytes = int(float(os.environ.get('DASH_CACHE_MB', 256))*1024*1024)
+            store = DataStore(static_dir, exchange, max_bytes)
+            _stores[(static_dir, exchange)] = store
+    return store
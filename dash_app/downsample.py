@@ -0,0 +1,211 @@
+"""Downsample module
+
+This script contains the downsampling stage of the dashboard data path.
+Price histories are cut to the visible date range and reduced to about as
+many points as a chart can show before they are serialized, zooming in
+re-fetches the visible range at higher resolution.
+
+It contains following functions
+    * lttb: Largest-Triangle-Three-Buckets downsampling
+    * minmax: Minimum/maximum bucketing
+    * visible: Returns row positions inside a date range
+    * downsample: Returns rows of OHLC data to be plotted
+    * relayout_range: Returns x-axis range of a Graph's relayoutData
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def lttb(x, y, points):
+    """Largest-Triangle-Three-Buckets downsampling
+    First and last points are kept, every bucket in between keeps the point
+    forming the largest triangle with the previously kept point and the
+    average of the next bucket, which preserves peaks and the series' shape
+
+    Parameters
+    ----------
+    x: np.ndarray
+        Increasing x values
+    y: np.ndarray
+        y values without NaN
+    points: int
+        Number of points kept
+
+    Returns
+    -------
+    positions: np.ndarray
+        Increasing positions of kept points
+    """
+
+    n = len(x)
+    if(points >= n or points < 3):
+        return np.arange(n)
+
+    x = np.asarray(x, dtype='float64')
+    x = x - x[0]
+    y = np.asarray(y, dtype='float64')
+    edges = (np.arange(points - 1)*((n - 2)/(points - 2))).astype('int64') + 1
+    edges[-1] = n - 1
+
+    # Averages of every bucket, followed by the last point
+    starts = np.append(edges[:-1], n - 1)
+    counts = np.diff(np.append(starts, n))
+    avg_x = np.add.reduceat(x, starts)/counts
+    avg_y = np.add.reduceat(y, starts)/counts
+
+    # Area of point j with kept point a and next bucket's average is
+    # |x_a*c_j + y_a*d_j + e_j|, coefficients of every bucket are laid out
+    # in rows padded with zeros so the loop only evaluates one row
+    sizes = np.diff(edges)
+    bucket = np.repeat(np.arange(points - 2), sizes)
+    column = np.arange(edges[-1] - 1) - np.repeat(edges[:-1] - 1, sizes)
+    nx, ny = avg_x[bucket + 1], avg_y[bucket + 1]
+    xj, yj = x[1:n - 1], y[1:n - 1]
+    coefficients = np.zeros((points - 2, sizes.max(), 3))
+    coefficients[bucket, column] = np.column_stack([yj - ny, nx - xj, xj*ny - nx*yj])
+
+    positions = np.empty(points, dtype='int64')
+    positions[0], positions[-1] = 0, n - 1
+    a = 0
+    for i in range(points - 2):
+        a = edges[i] + int(np.abs(coefficients[i] @ (x[a], y[a], 1.0)).argmax())
+        positions[i + 1] = a
+    return positions
+
+
+def minmax(x, y, points):
+    """Minimum/maximum bucketing
+    Points are split into points // 2 buckets of equal x width, the lowest
+    and highest point of every bucket are kept
+
+    Parameters
+    ----------
+    x: np.ndarray
+        Increasing x values
+    y: np.ndarray
+        y values without NaN
+    points: int
+        Largest number of points kept
+
+    Returns
+    -------
+    positions: np.ndarray
+        Increasing positions of kept points
+    """
+
+    n = len(x)
+    if(points >= n or points < 2):
+        return np.arange(n)
+
+    x = np.asarray(x, dtype='float64')
+    buckets = points//2
+    bucket = np.minimum(((x - x[0])/(x[-1] - x[0] or 1)*buckets).astype('int64'), buckets - 1)
+
+    # Sorted by bucket then y, first and last of every bucket are its extremes
+    order = np.lexsort((y, bucket))
+    sorted_bucket = bucket[order]
+    first = np.flatnonzero(np.r_[True, sorted_bucket[1:] != sorted_bucket[:-1]])
+    last = np.r_[first[1:] - 1, n - 1]
+    return np.unique(np.concatenate([order[first], order[last], [0, n - 1]]))
+
+
+METHODS = {
+    'lttb': lttb,
+    'minmax': minmax,
+}
+
+
+def visible(dates, start=None, end=None):
+    """Returns row positions inside a date range
+    One row on either side of range is included, so lines reach the edges of
+    the chart
+
+    Parameters
+    ----------
+    dates: np.ndarray
+        Increasing dates as datetime64
+    start: str or pd.Timestamp (None)
+        First visible date, None is first date
+    end: str or pd.Timestamp (None)
+        Last visible date, None is last date
+
+    Returns
+    -------
+    rows: slice
+        Rows of visible range
+    """
+
+    first, last = 0, len(dates)
+    if(start is not None):
+        first = max(0, np.searchsorted(dates, np.datetime64(pd.Timestamp(start)), 'left') - 1)
+    if(end is not None):
+        last = min(len(dates), np.searchsorted(dates, np.datetime64(pd.Timestamp(end)), 'right') + 1)
+    return slice(first, last)
+
+
+def downsample(ohlc, points=1000, start=None, end=None, x='Date', y='Close', method='lttb'):
+    """Returns rows of OHLC data to be plotted
+    Rows with missing y are dropped, rows in visible range are reduced to
+    about points rows
+
+    Parameters
+    ----------
+    ohlc: pd.DataFrame
+        OHLC data sorted by x, x parsed as dates
+    points: int (1000)
+        Number of rows kept
+    start: str (None)
+        First visible date, None is first date
+    end: str (None)
+        Last visible date, None is last date
+    x: str ('Date')
+        Date column
+    y: str ('Close')
+        Plotted column
+    method: str ('lttb')
+        Downsampling method in METHODS
+
+    Returns
+    -------
+    rows: pd.DataFrame
+        x and y columns of kept rows
+    """
+
+    if(method not in METHODS):
+        raise ValueError("Unknown method: {}, expected one of {}".format(method, list(METHODS.keys())))
+
+    frame = ohlc[[x, y]]
+    if(frame[y].isna().any()):
+        frame = frame[frame[y].notna()]
+
+    dates = frame[x].values
+    frame = frame.iloc[visible(dates, start, end)]
+    positions = METHODS[method](frame[x].values.astype('int64'), frame[y].values, points)
+    return frame.iloc[positions]
+
+
+def relayout_range(relayout_data):
+    """Returns x-axis range of a Graph's relayoutData
+
+    Parameters
+    ----------
+    relayout_data: dict
+        relayoutData property of dcc.Graph
+
+    Returns
+    -------
+    x_range: tuple
+        (start, end) of zoomed range, (None, None) if axis was reset, None if
+        x-axis range did not change
+    """
+
+    if not relayout_data:
+        return None
+    if(relayout_data.get('xaxis.autorange')):
+        return (None, None)
+    if('xaxis.range[0]' in relayout_data):
+        return (relayout_data['xaxis.range[0]'], relayout_data['xaxis.range[1]'])
+    if('xaxis.range' in relayout_data):
+        return tuple(relayout_data['xaxis.range'][:2])
+    return None
@@ -1,2 +1,2 @@
 docker build -t dash .
-docker run -p 8050:8050 -v "$(pwd)":/app --rm dash
\ No newline at end of file
+docker run -p 8050:8050 -e DASH_WORKERS=4 -v "$(pwd)":/app --rm dash
\ No newline at end of file
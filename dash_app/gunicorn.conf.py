@@ -0,0 +1,22 @@
+"""Gunicorn configuration of the dashboard
+
+    gunicorn -c gunicorn.conf.py app:server
+
+The app is loaded once in the master process and OHLC data is packed into
+memory-mapped arrays before workers are forked, so workers share one copy
+of the data and adding workers does not multiply memory used.
+"""
+
+import os
+
+bind = '0.0.0.0:{}'.format(os.environ.get('PORT', 8050))
+workers = int(os.environ.get('DASH_WORKERS', 4))
+threads = int(os.environ.get('DASH_THREADS', 2))
+worker_class = 'gthread'
+preload_app = True
+timeout = 60
+
+
+def on_starting(server):
+    from datastore import get_store
+    get_store().share()
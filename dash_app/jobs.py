@@ -0,0 +1,377 @@
+"""Jobs module
+
+This script contains the background job queue of the dashboard, used for
+computations too slow for a callback. Jobs are identified by a hash of
+their function and parameters, so identical requests share one job and
+its cached result, callbacks poll job status with dcc.Interval. Results
+can be stored in a directory shared by every server worker process, along
+with a marker of every running job so other workers report it as pending
+instead of running it again.
+
+It contains following classes
+    * JobQueue: Worker pool running deduplicated jobs with cached results
+
+It contains following functions
+    * job_key: Returns id of a function called with parameters
+    * get_queue: Returns process-wide JobQueue
+"""
+
+import os
+import json
+import time
+import pickle
+import socket
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+def job_key(func, params):
+    """Returns id of a function called with parameters
+
+    Parameters
+    ----------
+    func: function
+        Module-level function run by job
+    params: dict
+        Keyword arguments of func, JSON serializable
+
+    Returns
+    -------
+    job_id: str
+        Hex digest identifying the call
+    """
+
+    h = hashlib.blake2b(digest_size=12)
+    h.update(json.dumps([func.__module__, func.__qualname__, params], sort_keys=True,
+                        default=str).encode())
+    return h.hexdigest()
+
+
+class JobQueue:
+    """
+    Class to represent a worker pool running deduplicated jobs with cached
+    results
+
+    Submitting a call already running returns the running job's id,
+    submitting a call that finished within ttl returns the finished job's
+    id so its result is reused. Failed jobs are run again when resubmitted.
+    With a result_dir, this holds for jobs run by other processes sharing
+    it too.
+
+    ...
+
+    Attributes
+    ----------
+    workers : int
+        Number of workers
+    processes : bool
+        Toggle to run jobs in worker processes instead of threads
+    ttl : float
+        Seconds a finished job's result is reused
+    max_jobs : int
+        Number of jobs kept, oldest finished jobs are removed first
+    result_dir : str
+        Location of directory results and markers of running jobs are
+        shared through, None keeps them in this process only
+    submitted : int
+        Number of jobs started
+    deduplicated : int
+        Number of submits served by an existing job
+
+    Methods
+    -------
+    submit(func=function, **params): str
+        Runs func(**params) in background unless an identical job exists,
+        returns job id
+    status(job_id=str): dict
+        Returns state, result and timings of job
+    shutdown(): void
+        Stops workers
+    """
+
+    def __init__(self, workers=2, processes=True, ttl=3600, max_jobs=128, result_dir=None):
+        self.workers = workers
+        self.processes = processes
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self.result_dir = result_dir
+        self.submitted = 0
+        self.deduplicated = 0
+        self._executor = None
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        """Worker pool, started on first use
+        """
+
+        if(self._executor is None):
+            pool = ProcessPoolExecutor if self.processes else ThreadPoolExecutor
+            self._executor = pool(max_workers=self.workers)
+        return self._executor
+
+    def submit(self, func, **params):
+        """Runs func(**params) in background unless an identical job exists,
+        returns job id
+
+        Parameters
+        ----------
+        func: function
+            Module-level function, picklable when processes is True
+        params: dict
+            Keyword arguments of func, JSON serializable
+
+        Returns
+        -------
+        job_id: str
+            Id to poll status() with
+        """
+
+        job_id = job_key(func, params)
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if(job is not None and self._reusable(job)):
+                self._jobs.move_to_end(job_id)
+                self.deduplicated += 1
+                return job_id
+
+            job = self._read(job_id)
+            if(job is not None and self._reusable(job)):
+                self._jobs[job_id] = job
+                self.deduplicated += 1
+                self._evict()
+                return job_id
+
+            submitted = time.time()
+            if not self._claim(job_id, submitted):
+                # Running in another process, its result is shared when done
+                self.deduplicated += 1
+                return job_id
+
+            try:
+                future = self.executor.submit(func, **params)
+            except BrokenProcessPool:
+                self._executor = None
+                future = self.executor.submit(func, **params)
+
+            job = {'future': future, 'submitted': submitted, 'finished': None}
+            future.add_done_callback(lambda f, job_id=job_id, job=job: self._finish(job_id, job))
+            self._jobs[job_id] = job
+            self.submitted += 1
+            self._evict()
+        return job_id
+
+    def status(self, job_id):
+        """Returns state, result and timings of job
+
+        Parameters
+        ----------
+        job_id: str
+            Id returned by submit()
+
+        Returns
+        -------
+        status: dict
+            state ('pending', 'running', 'done', 'failed' or 'unknown'),
+            result, error, submitted and finished times (epoch seconds)
+        """
+
+        job = self._jobs.get(job_id)
+        if(job is None):
+            job = self._read(job_id)
+        if(job is None):
+            job = self._running(job_id)
+        if(job is None):
+            return {'state': 'unknown', 'result': None, 'error': None}
+
+        future = job['future']
+        status = {'state': 'pending', 'result': None, 'error': None,
+                  'submitted': job['submitted'], 'finished': job['finished']}
+        if(future.done()):
+            error = future.exception()
+            if(error is None):
+                status.update(state='done', result=future.result())
+            else:
+                status.update(state='failed', error=repr(error))
+        elif(future.running()):
+            status['state'] = 'running'
+        return status
+
+    def shutdown(self):
+        """Stops workers, running jobs are finished first
+        """
+
+        if(self._executor is not None):
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _finish(self, job_id, job):
+        """Records finish time of job, shares its result or error and removes
+        its running marker
+        """
+
+        job['finished'] = time.time()
+        future = job['future']
+        if(self.result_dir is None):
+            return
+
+        if not future.cancelled():
+            shared = {'submitted': job['submitted'], 'finished': job['finished']}
+            if(future.exception() is None):
+                shared['result'] = future.result()
+            else:
+                shared['error'] = future.exception()
+            result_loc = os.path.join(self.result_dir, '{}.pkl'.format(job_id))
+            tmp_loc = '{}.{}.tmp'.format(result_loc, os.getpid())
+            try:
+                with open(tmp_loc, 'wb') as outfile:
+                    pickle.dump(shared, outfile)
+                os.replace(tmp_loc, result_loc)
+            except Exception as e:
+                print("Exception {} occured sharing result: {}".format(e, result_loc))
+
+        try:
+            os.remove(os.path.join(self.result_dir, '{}.running'.format(job_id)))
+        except FileNotFoundError:
+            pass
+
+    def _claim(self, job_id, submitted):
+        """Writes running marker of job to result_dir, returns False if another
+        process holds a valid marker of job
+        Marker is linked into place, so only one process can create it
+        """
+
+        if(self.result_dir is None):
+            return True
+
+        os.makedirs(self.result_dir, exist_ok=True)
+        marker_loc = os.path.join(self.result_dir, '{}.running'.format(job_id))
+        tmp_loc = '{}.{}.tmp'.format(marker_loc, os.getpid())
+        try:
+            with open(tmp_loc, 'w') as outfile:
+                json.dump({'submitted': submitted, 'host': socket.gethostname(),
+                           'pid': os.getpid()}, outfile)
+            for _ in range(2):
+                try:
+                    os.link(tmp_loc, marker_loc)
+                    return True
+                except FileExistsError:
+                    if(self._running(job_id) is not None):
+                        return False
+                    # Marker of a finished, expired or dead job
+                    try:
+                        os.remove(marker_loc)
+                    except FileNotFoundError:
+                        pass
+        except Exception as e:
+            print("Exception {} occured marking job: {}".format(e, marker_loc))
+        finally:
+            if os.path.exists(tmp_loc):
+                os.remove(tmp_loc)
+        return True
+
+    def _running(self, job_id):
+        """Returns pending job of another process from its running marker,
+        None if missing, older than ttl or its process is gone
+        """
+
+        if(self.result_dir is None):
+            return None
+
+        marker_loc = os.path.join(self.result_dir, '{}.running'.format(job_id))
+        try:
+            with open(marker_loc, 'r') as infile:
+                marker = json.load(infile)
+        except (FileNotFoundError, ValueError):
+            return None
+        if(time.time() - marker['submitted'] > self.ttl):
+            return None
+        if(marker['host'] == socket.gethostname() and marker['pid'] != os.getpid()):
+            try:
+                os.kill(marker['pid'], 0)
+            except ProcessLookupError:
+                return None
+            except PermissionError:
+                pass
+
+        return {'future': Future(), 'submitted': marker['submitted'], 'finished': None}
+
+    def _read(self, job_id):
+        """Returns finished or failed job shared by another process within
+        ttl, None if missing
+        """
+
+        if(self.result_dir is None):
+            return None
+
+        result_loc = os.path.join(self.result_dir, '{}.pkl'.format(job_id))
+        try:
+            with open(result_loc, 'rb') as infile:
+                shared = pickle.load(infile)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+        if(time.time() - shared['finished'] > self.ttl):
+            return None
+
+        future = Future()
+        if('error' in shared):
+            future.set_exception(shared['error'])
+        else:
+            future.set_result(shared['result'])
+        return {'future': future, 'submitted': shared['submitted'], 'finished': shared['finished']}
+
+    def _reusable(self, job):
+        """Checks if job is running or finished successfully within ttl
+        """
+
+        future = job['future']
+        if not future.done():
+            return True
+        if(future.cancelled() or future.exception() is not None):
+            return False
+        return job['finished'] is None or time.time() - job['finished'] <= self.ttl
+
+    def _evict(self):
+        """Removes oldest finished jobs while more than max_jobs are kept
+        """
+
+        for job_id in list(self._jobs.keys()):
+            if(len(self._jobs) <= self.max_jobs):
+                break
+            if(self._jobs[job_id]['future'].done()):
+                del self._jobs[job_id]
+
+
+_queue = None
+
+
+def get_queue(workers=None, processes=True, result_dir=None):
+    """Returns process-wide JobQueue, created on first call
+
+    Parameters
+    ----------
+    workers: int (None)
+        Number of workers, None reads DASH_JOB_WORKERS (default 2)
+    processes: bool (True)
+        Toggle to run jobs in worker processes instead of threads
+    result_dir: str (None)
+        Location of shared results, None reads DASH_JOB_DIR (default unset)
+
+    Returns
+    -------
+    queue: JobQueue()
+        Shared queue
+    """
+
+    global _queue
+    if(_queue is None):
+        if(workers is None):
+            workers = int(os.environ.get('DASH_JOB_WORKERS', 2))
+        if(result_dir is None):
+            result_dir = os.environ.get('DASH_JOB_DIR')
+        _queue = JobQueue(workers, processes, result_dir=result_dir)
+    return _queue
@@ -0,0 +1,464 @@
+"""Loadtest module
+
+This script contains the load-testing harness of the dashboard. Simulated
+users replay tab and dropdown callback sequences, either over HTTP against
+a running server or by calling the callbacks in-process, and latency
+percentiles, throughput, payload size, bytes and server CPU per session
+and server memory over time are reported and stored as JSON. Tab switches
+are clientside callbacks and make no calls, users keep the etags of
+tickers they received like the browser's ticker-cache.
+
+    python loadtest.py --url http://localhost:8050 --pid <server pid> --users 16
+    python loadtest.py --in-process --users 8 --duration 30 --output run.json
+    python loadtest.py --in-process --baseline previous.json
+
+It contains following classes
+    * HTTPClient: Calls callbacks through Dash's update endpoint
+    * InProcessClient: Calls callback functions of app module
+
+It contains following functions
+    * session: Returns callback calls of one simulated user session
+    * process_usage: Returns RSS, PSS and CPU time of a process and its
+                     children
+    * summarize: Returns latency percentiles, throughput and payload sizes
+    * load_test: Runs simulated users, returns results
+    * compare: Returns regressions of results against a baseline
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import urllib.request
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+# Number of tickers kept by a user, as MAX_CACHED_TICKERS of assets/clientside.js
+MAX_CACHED_TICKERS = 32
+
+# Outputs, inputs and state of callbacks, as (component id, property, argument)
+CALLBACKS = {
+    'sync_ticker': {
+        'output': ('ticker-delivery', 'data'),
+        'inputs': [('demo-dropdown', 'value', 'stock')],
+        'state': [('ticker-etags', 'data', 'etags')],
+    },
+    'zoom_graph': {
+        'output': ('price-zoom', 'data'),
+        'inputs': [('price-graph', 'relayoutData', 'relayout_data')],
+        'state': [('demo-dropdown', 'value', 'stock')],
+    },
+}
+
+
+def session(symbols, rng):
+    """Returns callback calls of one simulated user session
+    User opens a stock, zooms into a year and back out, looks at another
+    stock and returns to the first one. Switching tabs in between makes no
+    calls, etags of tickers are added by load_test()
+
+    Parameters
+    ----------
+    symbols: list[str]
+        Symbols users pick from
+    rng: random.Random
+        Random number generator of user
+
+    Returns
+    -------
+    calls: list[tuple]
+        (callback, arguments) of every call
+    """
+
+    stock, other = rng.choice(symbols), rng.choice(symbols)
+    year = rng.randint(2000, 2020)
+    return [
+        ('sync_ticker', {'stock': stock}),
+        ('zoom_graph', {'relayout_data': {'xaxis.range[0]': '{}-01-01'.format(year),
+                                          'xaxis.range[1]': '{}-12-31'.format(year)},
+                        'stock': stock}),
+        ('zoom_graph', {'relayout_data': {'xaxis.autorange': True}, 'stock': stock}),
+        ('sync_ticker', {'stock': other}),
+        ('sync_ticker', {'stock': stock}),
+    ]
+
+
+class HTTPClient:
+    """
+    Class to represent a client calling callbacks through Dash's update
+    endpoint of a running server
+
+    ...
+
+    Attributes
+    ----------
+    url : str
+        Base URL of server
+    timeout : float
+        Seconds a request may take
+
+    Methods
+    -------
+    call(callback=str, **arguments): tuple
+        Calls callback, returns payload size in bytes and output
+    """
+
+    def __init__(self, url='http://localhost:8050', timeout=60):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def call(self, callback, **arguments):
+        """Calls callback, returns payload size in bytes and output (0 and
+        None if not updated)
+        """
+
+        spec = CALLBACKS[callback]
+        output = {'id': spec['output'][0], 'property': spec['output'][1]}
+        body = {
+            'output': '{}.{}'.format(*spec['output']),
+            'outputs': output,
+            'inputs': [{'id': i, 'property': p, 'value': arguments[a]} for i, p, a in spec['inputs']],
+            'state': [{'id': i, 'property': p, 'value': arguments[a]} for i, p, a in spec['state']],
+            'changedPropIds': ['{}.{}'.format(i, p) for i, p, _ in spec['inputs']],
+        }
+        request = urllib.request.Request('{}/_dash-update-component'.format(self.url),
+                                         data=json.dumps(body).encode(),
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            payload = response.read()
+        if not payload:
+            return 0, None
+
+        # Single output responses of Dash 1.x hold props, later ones {id: props}
+        props = json.loads(payload)['response']
+        props = props.get('props', props.get(spec['output'][0], {}))
+        return len(payload), props.get(spec['output'][1])
+
+
+class InProcessClient:
+    """
+    Class to represent a client calling callback functions of app module in
+    this process
+
+    ...
+
+    Attributes
+    ----------
+    app : module
+        Dashboard app module
+
+    Methods
+    -------
+    call(callback=str, **arguments): tuple
+        Calls callback, returns size of its JSON serialized output and output
+    """
+
+    def __init__(self):
+        import app
+        import plotly.utils
+        from dash.exceptions import PreventUpdate
+
+        self.app = app
+        self._encoder = plotly.utils.PlotlyJSONEncoder
+        self._prevent = PreventUpdate
+
+    def call(self, callback, **arguments):
+        """Calls callback, returns size of its JSON serialized output and
+        output (0 and None if not updated)
+        """
+
+        spec = CALLBACKS[callback]
+        args = [arguments[a] for _, _, a in spec['inputs'] + spec['state']]
+        try:
+            output = getattr(self.app, callback)(*args)
+        except self._prevent:
+            return 0, None
+        payload = json.dumps(output, cls=self._encoder)
+        return len(payload.encode()), json.loads(payload)
+
+
+def process_usage(pid):
+    """Returns RSS, PSS and CPU time of a process and its children
+    PSS divides shared pages among processes sharing them, it is None where
+    /proc/<pid>/smaps_rollup is not available
+
+    Parameters
+    ----------
+    pid: int
+        Process id
+
+    Returns
+    -------
+    usage: dict[str] = int
+        rss and pss (bytes) and cpu (user and system seconds) summed over
+        process tree, processes counted
+    """
+
+    pids, i = [pid], 0
+    while(i < len(pids)):
+        try:
+            for tid in os.listdir('/proc/{}/task'.format(pids[i])):
+                with open('/proc/{}/task/{}/children'.format(pids[i], tid)) as infile:
+                    pids.extend(int(c) for c in infile.read().split())
+        except (FileNotFoundError, ProcessLookupError):
+            pass
+        i += 1
+
+    rss, pss, ticks = 0, 0, 0
+    for p in pids:
+        try:
+            with open('/proc/{}/status'.format(p)) as infile:
+                rss += next(int(l.split()[1])*1024 for l in infile if l.startswith('VmRSS:'))
+            with open('/proc/{}/stat'.format(p)) as infile:
+                # Fields after the command name, utime and stime are 12th and 13th
+                fields = infile.read().rsplit(')', 1)[1].split()
+                ticks += int(fields[11]) + int(fields[12])
+        except (FileNotFoundError, ProcessLookupError, StopIteration):
+            continue
+        if(pss is None):
+            continue
+        try:
+            with open('/proc/{}/smaps_rollup'.format(p)) as infile:
+                pss += next(int(l.split()[1])*1024 for l in infile if l.startswith('Pss:'))
+        except (FileNotFoundError, PermissionError, StopIteration):
+            pss = None
+    return {'rss': rss, 'pss': pss, 'cpu': ticks/os.sysconf('SC_CLK_TCK'), 'processes': len(pids)}
+
+
+def summarize(samples, elapsed):
+    """Returns latency percentiles, throughput and payload sizes
+
+    Parameters
+    ----------
+    samples: list[tuple]
+        (callback, seconds, payload bytes, error) of every call
+    elapsed: float
+        Seconds the test ran for
+
+    Returns
+    -------
+    summary: dict
+        Statistics of every callback and of all calls ('overall')
+    """
+
+    groups = {'overall': samples}
+    for sample in samples:
+        groups.setdefault(sample[0], []).append(sample)
+
+    summary = {}
+    for name, group in groups.items():
+        ok = [s for s in group if s[3] is None]
+        latency = np.array([s[1] for s in ok]) if ok else np.array([np.nan])
+        payload = np.array([s[2] for s in ok]) if ok else np.array([0])
+        summary[name] = {
+            'calls': len(group),
+            'errors': len(group) - len(ok),
+            'throughput': len(ok)/elapsed if elapsed else None,
+            'p50': float(np.percentile(latency, 50)),
+            'p95': float(np.percentile(latency, 95)),
+            'p99': float(np.percentile(latency, 99)),
+            'mean': float(latency.mean()),
+            'payload_mean': float(payload.mean()),
+            'payload_total': int(payload.sum()),
+        }
+    return summary
+
+
+def load_test(client, symbols, users=8, duration=30, pid=None, interval=1.0, seed=0):
+    """Runs simulated users, returns results
+
+    Parameters
+    ----------
+    client: HTTPClient() or InProcessClient()
+        Client callbacks are called with
+    symbols: list[str]
+        Symbols users pick from
+    users: int (8)
+        Number of concurrent users
+    duration: float (30)
+        Seconds users keep starting sessions
+    pid: int (None)
+        Process id of server, memory is sampled every interval seconds and
+        CPU time of run is measured
+    interval: float (1.0)
+        Seconds between memory samples
+    seed: int (0)
+        Seed of users' random choices
+
+    Returns
+    -------
+    results: dict
+        Configuration, summary of calls, bytes and server CPU seconds per
+        session and memory samples
+    """
+
+    samples, errors = [], {}
+    memory = []
+    sessions = [0]
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def sample_memory(start):
+        while True:
+            memory.append(dict(process_usage(pid), t=round(time.perf_counter() - start, 3)))
+            if(stop.wait(interval)):
+                break
+
+    def user(number, start):
+        rng = random.Random(seed*1000 + number)
+        etags = {}
+        while(time.perf_counter() - start < duration):
+            for callback, arguments in session(symbols, rng):
+                if(callback == 'sync_ticker'):
+                    arguments = dict(arguments, etags=dict(etags))
+                call_start = time.perf_counter()
+                try:
+                    (payload, output), error = client.call(callback, **arguments), None
+                except Exception as e:
+                    payload, output, error = 0, None, repr(e)
+                seconds = time.perf_counter() - call_start
+
+                if(isinstance(output, dict) and 'etag' in output):
+                    etags.pop(output['ticker'], None)
+                    etags[output['ticker']] = output['etag']
+                    while(len(etags) > MAX_CACHED_TICKERS):
+                        del etags[next(iter(etags))]
+                with lock:
+                    samples.append((callback, seconds, payload, error))
+                    if(error is not None):
+                        errors[error] = errors.get(error, 0) + 1
+            with lock:
+                sessions[0] += 1
+
+    cpu = process_usage(pid)['cpu'] if pid is not None else None
+    start = time.perf_counter()
+    sampler = None
+    if(pid is not None):
+        sampler = threading.Thread(target=sample_memory, args=(start,), daemon=True)
+        sampler.start()
+    with ThreadPoolExecutor(max_workers=users) as executor:
+        list(executor.map(lambda n: user(n, start), range(users)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    if(sampler is not None):
+        sampler.join()
+    if(pid is not None):
+        cpu = process_usage(pid)['cpu'] - cpu
+
+    return {
+        'started': datetime.now().isoformat(timespec='seconds'),
+        'config': {'client': type(client).__name__, 'users': users, 'duration': duration,
+                   'symbols': len(symbols), 'seed': seed},
+        'elapsed': elapsed,
+        'summary': summarize(samples, elapsed),
+        'sessions': sessions[0],
+        'per_session': {
+            'calls': len(samples)/max(sessions[0], 1),
+            'bytes': sum(s[2] for s in samples)/max(sessions[0], 1),
+            'cpu': cpu/max(sessions[0], 1) if cpu is not None else None,
+        },
+        'errors': errors,
+        'memory': memory,
+    }
+
+
+def compare(results, baseline, tolerance=0.2):
+    """Returns regressions of results against a baseline
+    p95 latency and mean payload of every callback, bytes and server CPU
+    per session are compared
+
+    Parameters
+    ----------
+    results: dict
+        Results of load_test()
+    baseline: dict
+        Results of an earlier load_test()
+    tolerance: float (0.2)
+        Relative increase reported as regression
+
+    Returns
+    -------
+    regressions: list[str]
+        Description of every regression
+    """
+
+    pairs = [(name, current, baseline['summary'].get(name), ['p95', 'payload_mean'])
+             for name, current in results['summary'].items()]
+    pairs.append(('per_session', results['per_session'], baseline.get('per_session'), ['bytes', 'cpu']))
+
+    regressions = []
+    for name, current, previous, keys in pairs:
+        if(previous is None):
+            continue
+        for key in keys:
+            if(previous[key] and current[key] is not None and current[key] > previous[key]*(1 + tolerance)):
+                regressions.append("{} {}: {} -> {} (+{}%)".format(
+                    name, key, round(previous[key], 4), round(current[key], 4),
+                    round((current[key]/previous[key] - 1)*100, 1)))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test of dashboard callbacks")
+    parser.add_argument('--url', default='http://localhost:8050', help="URL of running server")
+    parser.add_argument('--in-process', action='store_true', help="Call callbacks in this process")
+    parser.add_argument('--pid', type=int, help="Process id of server, for memory and CPU samples")
+    parser.add_argument('--users', type=int, default=8, help="Concurrent users")
+    parser.add_argument('--duration', type=float, default=30, help="Seconds to run for")
+    parser.add_argument('--symbols', nargs='*', help="Symbols users pick from")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of users' choices")
+    parser.add_argument('--output', help="Location of JSON to write results to")
+    parser.add_argument('--baseline', help="Location of earlier results to compare with")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Relative increase reported")
+    args = parser.parse_args()
+
+    if(args.in_process):
+        client = InProcessClient()
+        pid = os.getpid()
+    else:
+        client = HTTPClient(args.url)
+        pid = args.pid
+
+    symbols = args.symbols
+    if not symbols:
+        from datastore import get_store
+        symbols = [option['value'] for option in get_store().options()]
+
+    results = load_test(client, symbols, args.users, args.duration, pid, seed=args.seed)
+    for name, stats in results['summary'].items():
+        print("{}: {} calls {} errors {}/s p50 {}ms p95 {}ms p99 {}ms payload {}KB".format(
+            name, stats['calls'], stats['errors'], round(stats['throughput'], 1),
+            round(stats['p50']*1000, 2), round(stats['p95']*1000, 2), round(stats['p99']*1000, 2),
+            round(stats['payload_mean']/1024, 1)))
+    per_session = results['per_session']
+    print("Per session ({} sessions): {} calls {}KB{}".format(
+        results['sessions'], round(per_session['calls'], 1), round(per_session['bytes']/1024, 1),
+        '' if per_session['cpu'] is None else ' {}ms server CPU'.format(round(per_session['cpu']*1000, 1))))
+    if(results['memory']):
+        print("Server memory: RSS {}MB -> {}MB (peak {}MB)".format(
+            round(results['memory'][0]['rss']/1024/1024, 1),
+            round(results['memory'][-1]['rss']/1024/1024, 1),
+            round(max(m['rss'] for m in results['memory'])/1024/1024, 1)))
+    for error, count in results['errors'].items():
+        print("Error ({} calls): {}".format(count, error))
+
+    if(args.output):
+        tmp_loc = '{}.tmp'.format(args.output)
+        with open(tmp_loc, 'w') as outfile:
+            json.dump(results, outfile, indent=4)
+        os.replace(tmp_loc, args.output)
+
+    status = 0
+    if(args.baseline):
+        with open(args.baseline, 'r') as infile:
+            regressions = compare(results, json.load(infile), args.tolerance)
+        for regression in regressions:
+            print("Regression: {}".format(regression))
+        status = 1 if regressions else 0
+    sys.exit(status)
@@ -0,0 +1,107 @@
+"""Portfolio module
+
+This script contains the portfolio optimization run by the dashboard's
+Portfolio tab as a background job. Estimators of every strategy and
+objective are the ones used by the optimizer module.
+
+It contains following functions
+    * close_matrix: Returns close prices of symbols aligned on date
+    * optimize: Returns weights and performance of an optimized portfolio
+"""
+
+from pypfopt import expected_returns, risk_models
+from pypfopt.efficient_frontier import EfficientFrontier
+from pypfopt.hierarchical_portfolio import HRPOpt
+from pypfopt.cla import CLA
+import pandas as pd
+
+from datastore import get_store
+
+
+# Expected returns and covariance of every (strategy, objective)
+STRATEGIES = {
+    ('eff', 'max_sharpe'): ('capm_return', 'sample_cov'),
+    ('eff', 'min_volatility'): (None, 'ledoit_wolf'),
+    ('cla', 'max_sharpe'): ('capm_return', 'ledoit_wolf'),
+    ('cla', 'min_volatility'): ('capm_return', 'ledoit_wolf'),
+    ('hrp', None): (None, None),
+}
+
+
+def close_matrix(symbols, lookback=250, store=None):
+    """Returns close prices of symbols aligned on date
+    Symbols with a missing close price in the last lookback days are dropped
+
+    Parameters
+    ----------
+    symbols: list[str]
+        Symbols of stocks
+    lookback: int (250)
+        Number of trading days
+    store: DataStore() (None)
+        Store OHLC data is read from, None is process-wide store
+
+    Returns
+    -------
+    close: pd.DataFrame
+        Close prices indexed by Date, with a column per symbol
+    """
+
+    store = store if store is not None else get_store()
+    close = pd.concat({s: store.ohlc(s).set_index('Date')['Close'] for s in symbols}, axis=1)
+    return close.sort_index().iloc[-lookback:].dropna(axis=1, how='any')
+
+
+def optimize(symbols, strategy='eff', objective='max_sharpe', lookback=250):
+    """Returns weights and performance of an optimized portfolio
+
+    Parameters
+    ----------
+    symbols: list[str]
+        Symbols of stocks in universe
+    strategy: str ('eff')
+        Strategy: 'eff', 'cla' or 'hrp'
+    objective: str ('max_sharpe')
+        Objective: 'max_sharpe' or 'min_volatility', None for 'hrp'
+    lookback: int (250)
+        Number of trading days estimates are calculated from
+
+    Returns
+    -------
+    portfolio: dict
+        Non-zero weights, expected annual return, annual volatility, Sharpe
+        ratio and symbols dropped for missing prices
+    """
+
+    if((strategy, objective) not in STRATEGIES):
+        raise ValueError("Unknown strategy and objective: {}, expected one of {}".format(
+            (strategy, objective), list(STRATEGIES.keys())))
+
+    close = close_matrix(symbols, lookback)
+    mu_estimator, cov_estimator = STRATEGIES[(strategy, objective)]
+    mu = expected_returns.capm_return(close) if mu_estimator else None
+    if(cov_estimator == 'sample_cov'):
+        cov = risk_models.sample_cov(close)
+    elif(cov_estimator == 'ledoit_wolf'):
+        cov = risk_models.CovarianceShrinkage(close).ledoit_wolf()
+
+    if(strategy == 'eff'):
+        optimizer = EfficientFrontier(mu, cov)
+        getattr(optimizer, objective)()
+        weights = optimizer.clean_weights()
+    elif(strategy == 'cla'):
+        optimizer = CLA(mu, cov)
+        weights = getattr(optimizer, objective)()
+    else:
+        optimizer = HRPOpt(expected_returns.returns_from_prices(close))
+        optimizer.optimize()
+        weights = optimizer.clean_weights()
+
+    performance = [None if p is None else float(p) for p in optimizer.portfolio_performance()]
+    return {
+        'weights': {t: float(w) for t, w in weights.items() if w != 0},
+        'Expected Annual Return': performance[0],
+        'Annual Volatility': performance[1],
+        'Sharpe Ratio': performance[2],
+        'dropped': [t for t in symbols if t not in close.columns],
+    }
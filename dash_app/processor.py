@@ -0,0 +1,96 @@
+"""Processor module
+
+This script contains the processors of the dashboard's stock page. Metadata
+and OHLC data come from the process-wide DataStore of the exchange, so
+constructing a processor reads no files, metadata rows are looked up by
+symbol and OHLC data is loaded on first use.
+
+It contains following classes
+    * Processor: Base class of processors
+    * NSEProcessor: Metadata and OHLC data of an NSE stock
+"""
+
+import pandas as pd
+
+from datastore import get_store
+
+
+class Processor:
+    def __init__(self):
+        self.exchange = ''
+        self.stock_name = ''
+        self.ohlc_data = pd.DataFrame
+        self.metadata = []
+    
+    def process_metadata():
+        pass
+    
+    def process_ohlc():
+        pass
+
+
+class NSEProcessor:
+    """
+    Class to represent metadata and OHLC data of an NSE stock
+
+    ...
+
+    Attributes
+    ----------
+    exchange : str
+        Exchange, name of directory containing OHLC CSVs
+    stock_name : str
+        Symbol of stock
+    store : DataStore()
+        Store data is read from, shared by every processor of exchange
+    ohlc_data : pd.DataFrame
+        OHLC data of stock, loaded on first use
+    metadata : pd.DataFrame
+        Metadata joined with constituents list, indexed by symbol
+
+    Methods
+    -------
+    process_metadata(): dict
+        Returns metadata shown on stock page
+    process_ohlc(): pd.DataFrame
+        Returns OHLC data of stock
+    """
+
+    def __init__(self, exchange='NSE', stock_name='3MINDIA', store=None):
+        self.exchange = exchange
+        self.stock_name = stock_name
+        self.store = store if store is not None else get_store('static_files', self.exchange)
+
+    @property
+    def ohlc_data(self):
+        return self.store.ohlc(self.stock_name)
+
+    @property
+    def metadata(self):
+        return self.store.listing.frame()
+
+    def process_metadata(self):
+        raw_dump = self.store.listing_record(self.stock_name)
+        if(raw_dump is None):
+            raise KeyError("No metadata of stock: {}".format(self.stock_name))
+        metadata_dump = {"Open":"", 
+                 "Close":"",
+                 "High":"",
+                 "Low":"",
+                 "Sector":"",
+                 "% Change":"",
+                 "Volume":""}
+
+        metadata_dump['Open'] = raw_dump['open']
+        metadata_dump['Close'] = raw_dump['closePrice']
+        metadata_dump['High'] = raw_dump['dayHigh']
+        metadata_dump['Low'] = raw_dump['dayLow']
+        metadata_dump['Sector'] = raw_dump['Industry'].capitalize()
+        metadata_dump['% Change'] = raw_dump['pChange']
+        metadata_dump['Volume'] = raw_dump['totalTradedVolume']
+        
+        return metadata_dump
+
+    
+    def process_ohlc(self):
+        return self.ohlc_data.fillna('bfill') 
@@ -10,7 +10,7 @@ It contains following classes
 import pandas as pd
 from pypfopt.discrete_allocation import DiscreteAllocation
 
-from utils import read_json, find_in_json
+from metastore import MetadataStore
 
 
 class Stock:
@@ -127,9 +127,9 @@ class Portfolio:
             Weights dictionary provided by Optimizer
         """
 
-        meta_json = read_json(metadata_loc)
+        meta_store = MetadataStore.load(metadata_loc)
         for stock_ticker in stock_dict:
-            stock_data = find_in_json(meta_json, 'Ticker', stock_ticker)
+            stock_data = meta_store.get(stock_ticker)
             stock_data['Portfolio Allocation'] = self.composition[stock_ticker]
             stock = Stock()
             stock.load(stock_data)
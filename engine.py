@@ -0,0 +1,188 @@
+"""Engine module
+
+This script contains the concurrent, rate-limited fetch engine used by
+fetchers to download data from providers.
+
+It contains following classes
+    * TokenBucket: Thread-safe token bucket rate limiter
+    * FetchEngine: Worker pool that runs fetch jobs behind a TokenBucket
+"""
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TokenBucket:
+    """
+    Class to represent a thread-safe token bucket rate limiter
+
+    ...
+
+    Attributes
+    ----------
+    rate : float
+        Tokens added to the bucket per second (requests per second ceiling),
+        None disables limiting
+    capacity : float
+        Maximum number of tokens the bucket can hold (burst size)
+    tokens : float
+        Tokens currently available
+
+    Methods
+    -------
+    acquire(): float
+        Blocks until a token is available, consumes it and returns time waited
+    """
+
+    def __init__(self, rate=1.0, capacity=1):
+        if(rate is not None and rate <= 0):
+            raise ValueError("rate should be > 0, got {}".format(rate))
+
+        self.rate = None if rate is None else float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a token is available, consumes it and returns time waited
+
+        Returns
+        -------
+        waited: float
+            Seconds spent waiting for the token
+        """
+
+        waited = 0.0
+        if(self.rate is None):
+            return waited
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity,
+                                  self.tokens + (now - self._last)*self.rate)
+                self._last = now
+
+                if(self.tokens >= 1):
+                    self.tokens -= 1
+                    return waited
+
+                pause = (1 - self.tokens)/self.rate
+
+            time.sleep(pause)
+            waited += pause
+
+
+class FetchEngine:
+    """
+    Class to represent a pool of workers fetching data behind a shared
+    TokenBucket
+
+    ...
+
+    Attributes
+    ----------
+    provider : callable
+        Function called with each job's keyword arguments, returns fetched data
+        (eg. nsepy.get_history)
+    workers : int
+        Number of concurrent workers
+    limiter : TokenBucket()
+        Rate limiter shared by all workers
+    backoff : float
+        Base delay in seconds before retrying a job, doubled with every
+        previous attempt
+    stats : dict
+        Statistics of last run: completed, failed, elapsed seconds and
+        throughput (jobs per second)
+
+    Methods
+    -------
+    run(jobs=list[tuple], on_result=callable, on_error=callable, attempts=dict): dict
+        Runs jobs on the worker pool and returns run statistics
+    """
+
+    def __init__(self, provider, workers=4, rate=1.0, burst=1, backoff=1.0):
+        self.provider = provider
+        self.workers = max(1, int(workers))
+        self.limiter = TokenBucket(rate, burst)
+        self.backoff = backoff
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def _work(self, key, kwargs, on_result, on_error, progress, attempts):
+        """Fetches single job and hands its result to callbacks
+        """
+
+        if(attempts > 0):
+            time.sleep(self.backoff * 2**(attempts - 1))
+
+        self.limiter.acquire()
+        try:
+            data = self.provider(**kwargs)
+            if(on_result is not None):
+                on_result(key, data)
+            failed = False
+
+        except Exception as e:
+            if(on_error is not None):
+                on_error(key, e)
+            else:
+                print("Exception {} occured for ticker: {}".format(e, key))
+            failed = True
+
+        with self._lock:
+            progress['done'] += 1
+            progress['failed'] += int(failed)
+            progress_perc = round((progress['done']/progress['total'])*100, 2)
+            print("Progress: {}% Last ticker: {}".format(progress_perc, key))
+
+    def run(self, jobs, on_result=None, on_error=None, attempts=None):
+        """Runs jobs on the worker pool and returns run statistics
+
+        Parameters
+        ----------
+        jobs: list[tuple]
+            List of (key, kwargs) pairs, kwargs are passed to provider
+        on_result: callable (None)
+            Called as on_result(key, data) from the worker after a successful
+            fetch
+        on_error: callable (None)
+            Called as on_error(key, exception) from the worker after a failed
+            fetch
+        attempts: dict[str] = int (None)
+            Attempts already made for each key, a job with n previous attempts
+            waits backoff * 2^(n-1) seconds before being fetched
+
+        Returns
+        -------
+        stats: dict
+            Dictionary containing completed, failed, elapsed and throughput
+        """
+
+        jobs = list(jobs)
+        attempts = attempts or {}
+        progress = {'total': max(1, len(jobs)), 'done': 0, 'failed': 0}
+        start = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(self._work, key, kwargs, on_result, on_error,
+                                   progress, attempts.get(key, 0))
+                       for key, kwargs in jobs]
+            for f in futures:
+                f.result()
+
+        elapsed = time.monotonic() - start
+        self.stats = {
+            'completed': progress['done'] - progress['failed'],
+            'failed': progress['failed'],
+            'elapsed': round(elapsed, 3),
+            'throughput': round(progress['done']/elapsed, 3) if elapsed > 0 else 0.0
+        }
+        print("Fetched {} jobs ({} failed) in {}s, throughput: {} jobs/s".format(
+            progress['done'], self.stats['failed'], self.stats['elapsed'],
+            self.stats['throughput']))
+
+        return self.stats
@@ -5,9 +5,11 @@ This script contains fetcher classes for metadata and OHLC data.
 It contains following classes
     * IndexFetcher: Base IndexFetcher Class
     * Nifty500Fetcher: Derived IndexFetcher Class for Nifty 500 Index
+
+It contains following functions
+    * last_bday: Returns last business day on or before today
 """
 
-import time
 from datetime import date, datetime
 import os
 
@@ -16,6 +18,32 @@ import numpy as np
 from nsetools import Nse
 from nsepy import get_history
 
+from engine import FetchEngine
+from journal import FetchJournal
+from quotes import QuoteLog
+from manifest import Manifest
+from storage import get_storage
+
+
+def last_bday(today=None):
+    """Returns last business day on or before today
+
+    Parameters
+    ----------
+    today: datetime.date (None)
+        Reference date, None is today
+
+    Returns
+    -------
+    last_bday: datetime.date
+        Last business day
+    """
+
+    today = pd.Timestamp(today if today is not None else date.today())
+    if((today - pd.tseries.offsets.BDay(0)) > today):
+        return (today - pd.tseries.offsets.BDay(1)).date()
+    return (today - pd.tseries.offsets.BDay(0)).date()
+
 
 class IndexFetcher:
     """
@@ -27,6 +55,10 @@ class IndexFetcher:
     ----------
     fetcher : <varies>
         Fetcher object, contains methods for fetching data    
+    history_provider : callable
+        Function returning OHLC history of a ticker as pd.DataFrame
+    storage : Storage()
+        Storage backend of OHLC data
     ticker_list : list[str]
         List of constituent tickers
     ohlc_dir : str
@@ -42,7 +74,7 @@ class IndexFetcher:
         Reads static CSV containing tickers into ticker_list, updates if specified
     fetch_metadata(timeout=int): void
         Fetches metadata and stores as static CSVs
-    fetch_data(start_date=datetime.date, end_date=datetime.date, timeout=5): void
+    fetch_data(start_date=datetime.date, end_date=datetime.date, timeout=5, workers=4): dict
         Fetches OHLC data and stores as static CSVs
     ohlc_updation_check(): dict[str]=datetime.date
         Checks if static CSVs are outdated and returns a dictionary
@@ -51,8 +83,10 @@ class IndexFetcher:
         Updates OHLC data using list from ohlc_updation_check()
     """
 
-    def __init__(self):
+    def __init__(self, history_provider=None):
         self.fetcher = None
+        self.history_provider = history_provider
+        self.storage = None
         self.ticker_list = []
 
         self.make_dirs()
@@ -108,7 +142,8 @@ class IndexFetcher:
 
         pass
     
-    def fetch_data(self, start_date=date(1980, 1, 1), end_date=date.today(), timeout=5):
+    def fetch_data(self, start_date=date(1980, 1, 1), end_date=date.today(), timeout=5,
+                   workers=4, tickers=None):
         """Fetches OHLC data and stores as static CSVs
 
         Parameters
@@ -120,6 +155,15 @@ class IndexFetcher:
         timeout: int (5)
             Pause between every OHLC fetch. Keep > 0 if you don't want to be 
             blacklisted by provider
+        workers: int (4)
+            Number of concurrent fetch workers
+        tickers: list[str] (None)
+            Tickers to be fetched, None fetches every ticker in ticker list
+
+        Returns
+        -------
+        stats: dict
+            Fetch statistics reported by FetchEngine
         """
 
         pass
@@ -160,30 +204,42 @@ class Nifty500Fetcher(IndexFetcher):
     ----------
     fetcher : nsetools.nse.Nse 
         Nse Fetcher object    
+    history_provider : callable
+        Function returning OHLC history of a ticker (nsepy.get_history)
+    storage : Storage()
+        Storage backend of OHLC data ('csv', 'parquet' or 'feather')
     ticker_list : list[str]
         List of constituent tickers
     ohlc_dir : str
         Location of OHLC data
     metadata_dir : str
         Location of Metadata
+    manifest : Manifest()
+        Manifest of OHLC data
     
     Methods
     -------
     read_list(url=str, update=bool): void
         Reads static CSV containing tickers into ticker_list
-    fetch_metadata(timeout=int): void
+    fetch_metadata(timeout=int, workers=int, max_age=datetime.timedelta): void
         Fetches metadata and stores as static CSVs
-    fetch_data(start_date=datetime.date, end_date=datetime.date, timeout=int): void
+    fetch_data(start_date=datetime.date, end_date=datetime.date, timeout=int, workers=int): dict
         Fetches OHLC data and stores as static CSVs
     ohlc_updation_check(): dict[str]=datetime.date
         Checks if static CSVs are outdated and returns a dictionary
         of outdated tickers with last date as values
-    update_ohlc(timeout=int): void
-        Updates OHLC data using list from ohlc_updation_check(
+    update_ohlc(timeout=int, workers=int): void
+        Updates OHLC data using list from ohlc_updation_check()
+    journal(kind=str): FetchJournal()
+        Returns FetchJournal of given kind of fetch run
+    resume(kind=str, timeout=int, workers=int, max_attempts=int, backoff=float): list[str]
+        Resumes an interrupted fetch run using its journal
+    quote_log(): QuoteLog()
+        Returns QuoteLog of fetched metadata
     """
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, history_provider=get_history, storage='csv'):
+        super().__init__(history_provider)
         self.fetcher = Nse()
         self.ticker_list = []
 
@@ -197,6 +253,8 @@ class Nifty500Fetcher(IndexFetcher):
 
         self.metadata_dir = nifty500_metadata_dir
         self.ohlc_dir = nifty500_ohlc_dir
+        self.storage = get_storage(storage, nifty500_ohlc_dir)
+        self.manifest = Manifest(nifty500_ohlc_dir, self.storage.ext, self.storage)
 
     def read_list(self, 
                   url = 'https://www1.nseindia.com/content/indices/ind_nifty500list.csv', 
@@ -222,35 +280,147 @@ class Nifty500Fetcher(IndexFetcher):
 
         self.ticker_list = list(pd.read_csv("{}/nifty_500_list.csv".format(self.metadata_dir))['Symbol'].values)
     
-    def fetch_metadata(self, timeout=5):
+    def journal(self, kind):
+        """Returns FetchJournal of given kind of fetch run
+
+        Parameters
+        ----------
+        kind: str
+            Kind of fetch run: 'ohlc', 'update' or 'metadata'
+
+        Returns
+        -------
+        journal: FetchJournal()
+            Journal stored in metadata_dir
+        """
+
+        return FetchJournal('{}/{}_journal.json'.format(self.metadata_dir, kind), kind)
+
+    def _run_jobs(self, journal, provider, jobs, store, timeout=5, workers=4,
+                  backoff=None):
+        """Runs jobs on FetchEngine, storing results with store() and recording
+        every outcome in journal
+        """
+
+        def on_result(c, data):
+            store(c, data)
+            if(journal.kind != 'metadata'):
+                self._check(c, journal.entries[c]['end'])
+            journal.mark(c, 'done')
+
+        def on_error(c, e):
+            print("Exception {} occured for ticker: {}".format(e, c))
+            journal.mark(c, 'failed', e)
+
+        engine = FetchEngine(provider, workers=workers,
+                             rate=(1/timeout) if timeout > 0 else None,
+                             backoff=timeout if backoff is None else backoff)
+
+        stats = engine.run(jobs, on_result, on_error, journal.attempts())
+        self.manifest.save()
+
+        return stats
+
+    def _ohlc_jobs(self, journal, tickers):
+        """Returns history_provider jobs for tickers using ranges in journal
+        """
+
+        return [(c, {'symbol': c,
+                     'start': date.fromisoformat(journal.entries[c]['start']),
+                     'end': date.fromisoformat(journal.entries[c]['end'])})
+                for c in tickers]
+
+    def _store_ohlc(self, c, data):
+        """Stores fetched OHLC data of ticker c
+        """
+
+        self.storage.write(data, c)
+        self.manifest.record(c, data)
+
+    def _store_update(self, c, data):
+        """Appends rows of fetched OHLC data of ticker c dated after the stored
+        last date to stored OHLC data
+        """
+
+        entry = self.manifest.get(c)
+        last_date = entry['last_date'] if entry is not None else self.storage.last_date(c)
+
+        new_data = data
+        if(last_date is not None):
+            new_data = data[pd.to_datetime(data.index) > pd.Timestamp(last_date)]
+        if(new_data.shape[0] == 0):
+            print("Ticker: {} has no new rows after: {}".format(c, last_date))
+            return
+
+        self.storage.append(new_data, c)
+        self.manifest.extend(c, new_data, entry)
+
+        print("Ticker: {} updated till: {}".format(c, new_data.index[-1]))
+
+    def _check(self, c, end):
+        """Records ticker c as checked today if its fetched range reached the
+        last business day, a fetch ending earlier leaves it outdated
+        """
+
+        if(end is None or date.fromisoformat(end) >= last_bday()):
+            self.manifest.check(c)
+
+    def quote_log(self):
+        """Returns QuoteLog of fetched metadata
+
+        Returns
+        -------
+        quote_log: QuoteLog()
+            Quote log stored in metadata_dir
+        """
+
+        return QuoteLog('{}/nifty_500_metadata.jsonl'.format(self.metadata_dir))
+
+    def fetch_metadata(self, timeout=5, workers=4, max_age=None):
         """Fetches metadata and stores as static CSVs
+        Quotes are fetched concurrently by FetchEngine and streamed to the
+        quote log as they arrive, the CSV is written from the quote log.
+        Progress is recorded in 'metadata' journal
+
+        Parameters
+        ----------
+        timeout: int (5)
+            Pause between every quote fetch. Keep > 0 if you don't want to be 
+            blacklisted by provider
+        workers: int (4)
+            Number of concurrent fetch workers
+        max_age: datetime.timedelta (None)
+            Only tickers whose quotes are older than max_age are fetched,
+            None fetches all tickers
         """
 
         self.read_list()
 
-        num_tickers = len(self.ticker_list)
-        progress = 0
-        metadata = []
-        exception_tickers = []
+        quote_log = self.quote_log()
+        if(max_age is None):
+            tickers = self.ticker_list
+        else:
+            tickers = quote_log.stale(self.ticker_list, max_age)
+            print("{} of {} quotes older than {}".format(len(tickers),
+                                                       len(self.ticker_list), max_age))
 
-        for c in self.ticker_list:
-            try:
-                data = self.fetcher.get_quote(c)
-                metadata.append(data)
-            
-            except Exception as e:
-                print("Exception {} occured for ticker: {}".format(e, c))
-                exception_tickers.append(c)
-            
-            progress +=1
-            progress_perc = np.round((progress/num_tickers)*100, 2)
-            print("Progress: {}% Last ticker: {}".format(progress_perc, c))
-            time.sleep(timeout)
+        journal = self.journal('metadata')
+        journal.begin({c: (None, None) for c in tickers})
 
-        pd.DataFrame.from_dict(metadata, orient='columns').to_csv("{}/nifty_500_metadata.csv".format(self.metadata_dir))
+        jobs = [(c, {'code': c}) for c in tickers]
+        self._run_jobs(journal, self.fetcher.get_quote, jobs, quote_log.append,
+                       timeout, workers)
 
-    def fetch_data(self, start_date=date(1980, 1, 1), end_date=date.today(), timeout=5):
+        quote_log.compact()
+        quote_log.to_csv("{}/nifty_500_metadata.csv".format(self.metadata_dir),
+                         self.ticker_list)
+
+    def fetch_data(self, start_date=date(1980, 1, 1), end_date=date.today(), timeout=5,
+                   workers=4, tickers=None):
         """Fetches OHLC data and stores as static CSVs
+        Tickers are fetched concurrently by FetchEngine, at most one request
+        per timeout seconds is sent to the provider across all workers.
+        Progress is recorded in 'ohlc' journal
 
         Parameters
         ----------
@@ -261,31 +431,98 @@ class Nifty500Fetcher(IndexFetcher):
         timeout: int (5)
             Pause between every OHLC fetch. Keep > 0 if you don't want to be 
             blacklisted by provider
+        workers: int (4)
+            Number of concurrent fetch workers
+        tickers: list[str] (None)
+            Tickers to be fetched, None fetches every ticker in ticker list
+
+        Returns
+        -------
+        stats: dict
+            Fetch statistics reported by FetchEngine
         """
         
         self.read_list()
+        if(tickers is None):
+            tickers = self.ticker_list
 
-        num_tickers = len(self.ticker_list)
-        progress = 0
-        exception_tickers = []
+        journal = self.journal('ohlc')
+        journal.begin({c: (start_date, end_date) for c in tickers})
 
-        for c in self.ticker_list:
-            try:
-                data = get_history(symbol=c, start=start_date, end=end_date)
-                data.to_csv("{}/{}.csv".format(self.ohlc_dir, c))
+        return self._run_jobs(journal, self.history_provider,
+                              self._ohlc_jobs(journal, tickers),
+                              self._store_ohlc, timeout, workers)
 
-            except Exception as e:
-                print("Exception {} occured for ticker: {}".format(e, c))
-                exception_tickers.append(c)
+    def resume(self, kind='ohlc', timeout=5, workers=4, max_attempts=5, backoff=None):
+        """Resumes an interrupted fetch run using its journal
+        Only pending and failed tickers are re-queued, a ticker failed n times
+        waits backoff * 2^(n-1) seconds before being fetched again. Failed
+        tickers are re-queued until they succeed or reach max_attempts
 
-            progress +=1
-            progress_perc = np.round((progress/num_tickers)*100, 2)
-            print("Progress: {}% Last ticker: {}".format(progress_perc, c))
-            time.sleep(timeout)
+        Parameters
+        ----------
+        kind: str ('ohlc')
+            Kind of fetch run: 'ohlc', 'update' or 'metadata'
+        timeout: int (5)
+            Pause between every fetch. Keep > 0 if you don't want to be 
+            blacklisted by provider
+        workers: int (4)
+            Number of concurrent fetch workers
+        max_attempts: int (5)
+            Attempts after which a ticker is no longer re-queued
+        backoff: float (None)
+            Base delay of exponential backoff, defaults to timeout
+
+        Returns
+        -------
+        failed: list[str]
+            Tickers which are still not fetched
+        """
+
+        journal = self.journal(kind)
+        quote_log = self.quote_log()
+
+        if(kind == 'metadata'):
+            logged = quote_log.latest()
+            for c, entry in journal.entries.items():
+                if(entry['status'] == 'done' and c not in logged):
+                    entry['status'] = 'pending'
+
+        tickers = journal.pending(max_attempts)
+        print("Resuming {} run, {} tickers left".format(kind, len(tickers)))
+
+        while(len(tickers) > 0):
+            if(kind == 'metadata'):
+                jobs = [(c, {'code': c}) for c in tickers]
+                self._run_jobs(journal, self.fetcher.get_quote, jobs,
+                               quote_log.append, timeout, workers, backoff)
+            else:
+                store = self._store_update if kind == 'update' else self._store_ohlc
+                self._run_jobs(journal, self.history_provider,
+                               self._ohlc_jobs(journal, tickers), store,
+                               timeout, workers, backoff)
+
+            tickers = journal.pending(max_attempts)
+
+        if(kind == 'metadata'):
+            self.read_list()
+            quote_log.compact()
+            quote_log.to_csv("{}/nifty_500_metadata.csv".format(self.metadata_dir),
+                             self.ticker_list)
+
+        failed = journal.pending()
+        if(len(failed) > 0):
+            print("Tickers not fetched after {} attempts: {}".format(max_attempts, failed))
+
+        return failed
     
     def ohlc_updation_check(self):
         """Checks if static CSVs are outdated and returns a dictionary
-        of outdated tickers with last date as values
+        of outdated tickers with last date as values.
+        Last dates are looked up in the manifest, files changed since they
+        were recorded are read by seeking to their last row. Tickers already
+        fetched today are not outdated, so holidays and suspended tickers
+        are not fetched again on every run
 
         Returns
         -------
@@ -297,69 +534,59 @@ class Nifty500Fetcher(IndexFetcher):
 
         today = date.today()
 
-        last_bday = np.where((today - pd.tseries.offsets.BDay(0)) > today,
-            (today - pd.tseries.offsets.BDay(1)),
-            (today - pd.tseries.offsets.BDay(0))).item()
-        last_bday = np.datetime64(last_bday)
+        last_day = np.datetime64(last_bday(today))
 
         outdated = {}
         for ticker in self.ticker_list:
             try:
-                temp_df = pd.read_csv("{}/{}.csv".format(self.ohlc_dir,ticker))
-                last_date = pd.to_datetime(temp_df['Date']).values[-1]
+                entry = self.manifest.recover(ticker)
+                if(entry is not None and entry.get('checked') == today.isoformat()):
+                    continue
+                if(entry is not None):
+                    last_date = entry['last_date']
+                else:
+                    last_date = self.storage.last_date(ticker)
+                last_date = np.datetime64(last_date, 'D')
             
-                if(last_date != last_bday):
-                    tdelta = (last_bday - last_date)/(1e9*3600*24)
-                    tdelta = str(tdelta).split(' ')[0]
+                if(last_date != last_day):
+                    tdelta = (last_day - last_date).astype(int)
                     print("{} is outdated by {} days".format(ticker, tdelta))
-                    outdated[ticker] = last_date.astype('M8[D]').astype('O')
+                    outdated[ticker] = last_date.astype('O')
             
             except Exception as e:
                 print("Exception: {} for ticker {}".format(e, ticker))
         
         print("Total outdated tickers: {}\n".format(len(outdated)))
+        self.manifest.save()
         
         return outdated
 
-    def update_ohlc(self, timeout=5):
+    def update_ohlc(self, timeout=5, workers=4):
         """Updates OHLC data using dict from ohlc_updation_check()
+        Only rows after the stored last date are appended to OHLC CSVs.
+        Progress is recorded in 'update' journal
 
         Parameters
         ----------
         timeout: int (5)
             Pause between every OHLC fetch. Keep > 0 if you don't want to be 
             blacklisted by provider
+        workers: int (4)
+            Number of concurrent fetch workers
         """
         
         outdated_tickers = self.ohlc_updation_check()
         num_tickers = len(outdated_tickers)
 
         if(num_tickers>0):
-            progress = 0
-            exception_tickers = []
-
-            for c in list(outdated_tickers.keys()):
-                start_date = outdated_tickers[c]
-                end_date = date.today()
-
-                try:
-                    data = get_history(symbol=c, start=start_date, end=end_date)
-                    old_data = pd.read_csv("{}/{}.csv".format(self.ohlc_dir, c))
-                    old_data.set_index('Date', inplace=True)
-
-                    new_data = pd.concat([old_data, data]).drop_duplicates()
-                    new_data.to_csv("{}/{}.csv".format(self.ohlc_dir, c))
-
-                    last_date = new_data.index[-1]
-
-                except Exception as e:
-                    print("Exception {} occured for ticker: {}".format(e, c))
-                    exception_tickers.append(c)
-
-                progress +=1
-                progress_perc = np.round((progress/num_tickers)*100, 2)
-                print("Progress: {}% Ticker: {} updated till: {}".format(progress_perc, c, last_date))
-                time.sleep(timeout)
+            end_date = date.today()
+            journal = self.journal('update')
+            journal.begin({c: (start_date, end_date)
+                           for c, start_date in outdated_tickers.items()})
+
+            self._run_jobs(journal, self.history_provider,
+                           self._ohlc_jobs(journal, list(outdated_tickers.keys())),
+                           self._store_update, timeout, workers)
         
         else:
-            print("OHLC data is up-to-date")
\ No newline at end of file
+            print("OHLC data is up-to-date")
@@ -0,0 +1,122 @@
+"""Indicators module
+
+This script contains technical indicator calculations shared by processors.
+Functions work on a pd.Series of close prices or on a pd.DataFrame with a
+column of close prices per stock.
+
+It contains following functions
+    * compute_indicators: Calculates technical indicators out of close prices
+    * compute_indicators_panel: Calculates technical indicators of many stocks
+                                at once
+    * lookback: Returns number of past closes needed to calculate indicators
+"""
+
+import numpy as np
+import pandas as pd
+
+
+INDICATORS = ['14MA', '50MA', '200MA', '200STD', 'Daily Return', 'Monthly Return',
+              'Yearly Return', 'Profit Exit', 'Stop Loss', 'Bollinger Band Up',
+              'Bollinger Band Down']
+
+
+def lookback(bband_ma=20):
+    """Returns number of past closes needed to calculate indicators of a row
+
+    Parameters
+    ----------
+    bband_ma: int (20)
+        Window of Bollinger Band moving average
+
+    Returns
+    -------
+    rows: int
+        Number of closes preceding a row which indicators depend on
+    """
+
+    return max(200, 252, 30, bband_ma)
+
+
+def compute_indicators(close, upper_margin=0.05, lower_margin=0.05, bband_ma=20,
+                       bband_std=2):
+    """Calculates technical indicators out of close prices
+
+    Parameters
+    ----------
+    close: pd.Series or pd.DataFrame
+        Close prices, ordered by date
+    upper_margin: float (0.05)
+        Margin of Profit Exit over close price
+    lower_margin: float (0.05)
+        Margin of Stop Loss under close price
+    bband_ma: int (20)
+        Window of Bollinger Band moving average
+    bband_std: float (2)
+        Number of standard deviations of Bollinger Band
+
+    Returns
+    -------
+    indicators: dict[str] = pd.Series or pd.DataFrame
+        Indicators in INDICATORS order, shaped like close
+    """
+
+    bband_mean = close.rolling(window=bband_ma).mean()
+    bband_dev = bband_std*close.rolling(window=bband_ma).std(ddof=0)
+
+    indicators = {}
+    indicators['14MA'] = close.rolling(window=14).mean()
+    indicators['50MA'] = close.rolling(window=50).mean()
+    indicators['200MA'] = close.rolling(window=200).mean()
+    indicators['200STD'] = close.rolling(window=200).std(ddof=0)
+    indicators['Daily Return'] = close.pct_change()*100
+    indicators['Monthly Return'] = close.pct_change(30)*100
+    indicators['Yearly Return'] = close.pct_change(252)*100
+    indicators['Profit Exit'] = close + (close * (upper_margin))
+    indicators['Stop Loss'] = close - (close * (lower_margin))
+    indicators['Bollinger Band Up'] = bband_mean + bband_dev
+    indicators['Bollinger Band Down'] = bband_mean - bband_dev
+    return indicators
+
+
+def compute_indicators_panel(closes, upper_margin=0.05, lower_margin=0.05,
+                             bband_ma=20, bband_std=2):
+    """Calculates technical indicators of many stocks at once
+    Close prices of every stock are placed in a column of one 2-D array,
+    starting at the first row and padded with NaN, so every indicator is a
+    single vectorized pass over the array. Indicators are identical to
+    compute_indicators() on each stock's close prices
+
+    Parameters
+    ----------
+    closes: dict[str] = np.ndarray
+        Close prices of every stock, ordered by date
+    upper_margin: float (0.05)
+        Margin of Profit Exit over close price
+    lower_margin: float (0.05)
+        Margin of Stop Loss under close price
+    bband_ma: int (20)
+        Window of Bollinger Band moving average
+    bband_std: float (2)
+        Number of standard deviations of Bollinger Band
+
+    Returns
+    -------
+    indicators: dict[str] = dict[str] = np.ndarray
+        Indicators of every stock, keyed by stock and indicator
+    """
+
+    names = list(closes.keys())
+    if(len(names) == 0):
+        return {}
+
+    lengths = [len(closes[n]) for n in names]
+    block = np.full((max(lengths), len(names)), np.nan)
+    for j, n in enumerate(names):
+        block[:lengths[j], j] = closes[n]
+
+    panel = compute_indicators(pd.DataFrame(block), upper_margin, lower_margin,
+                               bband_ma, bband_std)
+    panel = {key: value.values for key, value in panel.items()}
+
+    return {n: {key: value[:lengths[j], j] for key, value in panel.items()}
+            for j, n in enumerate(names)}
@@ -0,0 +1,145 @@
+"""Journal module
+
+This script contains the on-disk journal used to track fetch runs so that an
+interrupted run can be resumed.
+
+It contains following classes
+    * FetchJournal: Persistent per-ticker status journal of a fetch run
+"""
+
+import os
+import json
+import threading
+from datetime import datetime
+
+
+class FetchJournal:
+    """
+    Class to represent a persistent per-ticker status journal of a fetch run
+
+    ...
+
+    Attributes
+    ----------
+    journal_loc : str
+        Location of journal JSON file
+    kind : str
+        Kind of fetch run journaled (eg. 'ohlc', 'update', 'metadata')
+    entries : dict[str] = dict
+        Per-ticker entry with status ('pending', 'done', 'failed'), start and
+        end date of requested range, attempts made and last error
+
+    Methods
+    -------
+    begin(ranges=dict): void
+        Starts a new run, marking every ticker in ranges as pending
+    mark(ticker=str, status=str, error=Exception): void
+        Records outcome of an attempt for ticker
+    pending(max_attempts=int): list[str]
+        Returns tickers which are pending or failed
+    attempts(): dict[str] = int
+        Returns attempts made for every ticker
+    save(): void
+        Atomically writes journal to journal_loc
+    """
+
+    def __init__(self, journal_loc, kind=''):
+        self.journal_loc = journal_loc
+        self.kind = kind
+        self.entries = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(journal_loc):
+            with open(journal_loc, 'r') as infile:
+                data = json.load(infile)
+            self.kind = data.get('kind', kind)
+            self.entries = data.get('tickers', {})
+
+    def begin(self, ranges):
+        """Starts a new run, marking every ticker in ranges as pending
+
+        Parameters
+        ----------
+        ranges: dict[str] = tuple
+            (start date, end date) of requested data for every ticker,
+            dates may be None
+        """
+
+        with self._lock:
+            self.entries = {}
+            for ticker, (start, end) in ranges.items():
+                self.entries[ticker] = {
+                    'status': 'pending',
+                    'start': None if start is None else str(start),
+                    'end': None if end is None else str(end),
+                    'attempts': 0,
+                    'error': None
+                }
+            self._save()
+
+    def mark(self, ticker, status, error=None):
+        """Records outcome of an attempt for ticker
+
+        Parameters
+        ----------
+        ticker: str
+            Ticker attempted
+        status: str
+            'done' or 'failed'
+        error: Exception (None)
+            Exception raised by failed attempt
+        """
+
+        with self._lock:
+            entry = self.entries.setdefault(ticker, {'start': None, 'end': None,
+                                                     'attempts': 0})
+            entry['status'] = status
+            entry['attempts'] += 1
+            entry['error'] = None if error is None else str(error)
+            self._save()
+
+    def pending(self, max_attempts=None):
+        """Returns tickers which are pending or failed
+
+        Parameters
+        ----------
+        max_attempts: int (None)
+            Tickers with this many attempts are left out, None keeps all
+
+        Returns
+        -------
+        tickers: list[str]
+            Tickers which still have to be fetched
+        """
+
+        return [t for t, e in self.entries.items() if e['status'] != 'done'
+                and (max_attempts is None or e['attempts'] < max_attempts)]
+
+    def attempts(self):
+        """Returns attempts made for every ticker
+
+        Returns
+        -------
+        attempts: dict[str] = int
+            Attempts made for every ticker
+        """
+
+        return {t: e['attempts'] for t, e in self.entries.items()}
+
+    def save(self):
+        """Atomically writes journal to journal_loc
+        """
+
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        data = {
+            'kind': self.kind,
+            'updated': datetime.now().isoformat(timespec='seconds'),
+            'tickers': self.entries
+        }
+        tmp_loc = '{}.tmp'.format(self.journal_loc)
+        with open(tmp_loc, 'w') as outfile:
+            json.dump(data, outfile, indent=4)
+        os.replace(tmp_loc, self.journal_loc)
@@ -0,0 +1,376 @@
+"""Manifest module
+
+This script contains the manifest index kept alongside every OHLC directory,
+so date ranges of OHLC files can be looked up without parsing them.
+
+It contains following classes
+    * Manifest: Per-ticker index of OHLC files in a directory
+
+It contains following functions
+    * fingerprint: Returns cheap fingerprint (size, mtime) of a file
+    * content_hash: Returns hash of a file's content
+    * head_date: Reads date of first row of an OHLC CSV
+    * tail_date: Reads date of last row of an OHLC CSV by seeking to its end
+"""
+
+import os
+import json
+import hashlib
+import threading
+from datetime import date
+
+
+def fingerprint(file_loc):
+    """Returns cheap fingerprint (size, mtime) of a file
+
+    Parameters
+    ----------
+    file_loc: str
+        Location of file
+
+    Returns
+    -------
+    fingerprint: dict
+        Dictionary containing size and mtime_ns of file
+    """
+
+    st = os.stat(file_loc)
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def content_hash(file_loc, chunk=1 << 20):
+    """Returns hash of a file's content
+
+    Parameters
+    ----------
+    file_loc: str
+        Location of file
+    chunk: int (1 MiB)
+        Bytes hashed per read
+
+    Returns
+    -------
+    hash: str
+        Hex digest (BLAKE2b, 128 bits) of file content
+    """
+
+    h = hashlib.blake2b(digest_size=16)
+    with open(file_loc, 'rb') as infile:
+        for block in iter(lambda: infile.read(chunk), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def head_date(file_loc):
+    """Reads date of first row of an OHLC CSV
+
+    Parameters
+    ----------
+    file_loc: str
+        Location of OHLC CSV, with date as first column
+
+    Returns
+    -------
+    date: str
+        Date of first row, None if CSV has no rows
+    """
+
+    with open(file_loc, 'r') as infile:
+        infile.readline()
+        line = infile.readline().strip()
+    return line.split(',')[0] if line else None
+
+
+def tail_date(file_loc, chunk=4096):
+    """Reads date of last row of an OHLC CSV by seeking to its end
+
+    Parameters
+    ----------
+    file_loc: str
+        Location of OHLC CSV, with date as first column
+    chunk: int (4096)
+        Bytes read from the end of the file per step
+
+    Returns
+    -------
+    date: str
+        Date of last row, None if CSV has no rows
+    """
+
+    with open(file_loc, 'rb') as infile:
+        infile.seek(0, os.SEEK_END)
+        end = infile.tell()
+        pos = end
+        lines = []
+        while pos > 0:
+            pos = max(0, pos - chunk)
+            infile.seek(pos)
+            lines = infile.read(end - pos).strip().split(b'\n')
+            if(len(lines) > 1):
+                break
+
+    if(len(lines) < 2):
+        return None
+    return lines[-1].decode().strip().split(',')[0]
+
+
+class Manifest:
+    """
+    Class to represent a per-ticker index of OHLC files in a directory
+    The manifest is stored next to the directory as <directory>.manifest.json
+
+    ...
+
+    Attributes
+    ----------
+    ohlc_dir : str
+        Location of OHLC directory indexed
+    ext : str
+        Extension of OHLC files
+    storage : Storage()
+        Storage backend of OHLC files, used to read non CSV files
+    manifest_loc : str
+        Location of manifest JSON file
+    entries : dict[str] = dict
+        Per-ticker entry with first_date, last_date, rows, size and mtime_ns,
+        fingerprint of source file if file was derived from one and date
+        provider was last successfully checked on (checked)
+
+    Methods
+    -------
+    file_loc(ticker=str): str
+        Returns location of ticker's OHLC file
+    record(ticker=str, df=pd.DataFrame, source=dict): dict
+        Records entry of ticker's OHLC file
+    extend(ticker=str, df=pd.DataFrame): dict
+        Records rows appended to ticker's OHLC file
+    get(ticker=str): dict
+        Returns entry of ticker if its file is unchanged since it was recorded
+    recover(ticker=str): dict
+        Drops rows of an interrupted append to ticker's CSV, returns entry
+    check(ticker=str, day=str): void
+        Records date ticker was successfully fetched on
+    set_source(ticker=str, source=dict): void
+        Records fingerprint of the file ticker's file was derived from
+    remove(ticker=str): void
+        Removes entry of ticker
+    save(): void
+        Atomically writes manifest to manifest_loc
+    """
+
+    def __init__(self, ohlc_dir, ext='csv', storage=None):
+        self.ohlc_dir = ohlc_dir
+        self.ext = ext
+        self.storage = storage
+        self.manifest_loc = '{}.manifest.json'.format(ohlc_dir.rstrip('/'))
+        self.entries = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(self.manifest_loc):
+            try:
+                with open(self.manifest_loc, 'r') as infile:
+                    self.entries = json.load(infile)
+            except ValueError as e:
+                print("Exception {} occured reading manifest: {}".format(e, self.manifest_loc))
+
+    def file_loc(self, ticker):
+        """Returns location of ticker's OHLC file
+        """
+
+        return '{}/{}.{}'.format(self.ohlc_dir, ticker, self.ext)
+
+    def record(self, ticker, df=None, source=None):
+        """Records entry of ticker's OHLC file
+
+        Parameters
+        ----------
+        ticker: str
+            Ticker whose file was written
+        df: pd.DataFrame (None)
+            Complete data written to the file, indexed by date. If None, file
+            is read to collect first date, last date and rows
+        source: dict (None)
+            Fingerprint (size, mtime_ns, hash) of the file ticker's file was
+            derived from, eg. raw file of a cleaned file
+
+        Returns
+        -------
+        entry: dict
+            Recorded entry
+        """
+
+        file_loc = self.file_loc(ticker)
+        if(df is None and self.ext != 'csv'):
+            df = self.storage.read(ticker, columns=[])
+
+        if(df is not None):
+            entry = {
+                'first_date': str(df.index[0])[:10] if len(df) else None,
+                'last_date': str(df.index[-1])[:10] if len(df) else None,
+                'rows': int(len(df))
+            }
+        else:
+            with open(file_loc, 'rb') as infile:
+                rows = max(0, sum(1 for line in infile if line.strip()) - 1)
+            entry = {
+                'first_date': head_date(file_loc),
+                'last_date': tail_date(file_loc),
+                'rows': rows
+            }
+        entry.update(fingerprint(file_loc))
+        if(source is not None):
+            entry['source'] = source
+
+        with self._lock:
+            self.entries[ticker] = entry
+        return entry
+
+    def extend(self, ticker, df, entry=None):
+        """Records rows appended to ticker's OHLC file
+        Falls back to record() if ticker has no valid entry
+
+        Parameters
+        ----------
+        ticker: str
+            Ticker whose file was appended to
+        df: pd.DataFrame
+            Rows appended to the file, indexed by date
+        entry: dict (None)
+            Entry of the file before appending, as returned by get()
+
+        Returns
+        -------
+        entry: dict
+            Recorded entry
+        """
+
+        if(entry is None):
+            return self.record(ticker)
+
+        entry = dict(entry)
+        if(len(df)):
+            entry['first_date'] = entry['first_date'] or str(df.index[0])[:10]
+            entry['last_date'] = str(df.index[-1])[:10]
+            entry['rows'] += int(len(df))
+        entry.update(fingerprint(self.file_loc(ticker)))
+
+        with self._lock:
+            self.entries[ticker] = entry
+        return entry
+
+    def get(self, ticker):
+        """Returns entry of ticker if its file is unchanged since it was recorded
+
+        Parameters
+        ----------
+        ticker: str
+            Ticker to be looked up
+
+        Returns
+        -------
+        entry: dict
+            Entry of ticker, None if missing or outdated
+        """
+
+        entry = self.entries.get(ticker)
+        if(entry is None):
+            return None
+
+        try:
+            fp = fingerprint(self.file_loc(ticker))
+        except OSError:
+            return None
+
+        if(fp['size'] != entry['size'] or fp['mtime_ns'] != entry['mtime_ns']):
+            return None
+        return entry
+
+    def recover(self, ticker):
+        """Drops rows of an interrupted append to ticker's CSV, returns entry
+        A CSV that grew past its recorded size, whose recorded size still
+        ends in a row dated last_date, was appended to after it was recorded
+        without its entry being saved. It is truncated to its recorded size,
+        so the rows are fetched again
+
+        Parameters
+        ----------
+        ticker: str
+            Ticker to be looked up
+
+        Returns
+        -------
+        entry: dict
+            Entry of ticker, None if missing or outdated
+        """
+
+        entry = self.entries.get(ticker)
+        file_loc = self.file_loc(ticker)
+        if(self.ext != 'csv' or entry is None or not entry['last_date'] or
+           not os.path.exists(file_loc) or os.stat(file_loc).st_size <= entry['size']):
+            return self.get(ticker)
+
+        with open(file_loc, 'rb+') as infile:
+            start = max(0, entry['size'] - 4096)
+            infile.seek(start)
+            lines = infile.read(entry['size'] - start).split(b'\n')
+            if(len(lines) < 2 or lines[-1] != b'' or
+               not lines[-2].startswith(entry['last_date'].encode())):
+                return self.get(ticker)
+            infile.truncate(entry['size'])
+
+        print("Dropped rows after {} of interrupted append to: {}".format(
+            entry['last_date'], file_loc))
+        with self._lock:
+            self.entries[ticker] = dict(entry, **fingerprint(file_loc))
+        return self.entries[ticker]
+
+    def check(self, ticker, day=None):
+        """Records date ticker was successfully fetched on, even if the fetch
+        returned no new rows (holidays, suspended or delisted tickers). Entry
+        is replaced under the lock so it is never seen half updated
+
+        Parameters
+        ----------
+        ticker: str
+            Ticker fetched
+        day: str (None)
+            Date as YYYY-MM-DD, None is today
+        """
+
+        day = day if day is not None else date.today().isoformat()
+        with self._lock:
+            if(ticker in self.entries):
+                self.entries[ticker] = dict(self.entries[ticker], checked=day)
+
+    def set_source(self, ticker, source):
+        """Records fingerprint of the file ticker's file was derived from,
+        entry is replaced under the lock so it is never seen half updated
+
+        Parameters
+        ----------
+        ticker: str
+            Ticker whose entry is updated
+        source: dict
+            Fingerprint (size, mtime_ns, hash) of source file
+        """
+
+        with self._lock:
+            if(ticker in self.entries):
+                self.entries[ticker] = dict(self.entries[ticker], source=source)
+
+    def remove(self, ticker):
+        """Removes entry of ticker
+        """
+
+        with self._lock:
+            self.entries.pop(ticker, None)
+
+    def save(self):
+        """Atomically writes manifest to manifest_loc
+        """
+
+        with self._lock:
+            tmp_loc = '{}.tmp'.format(self.manifest_loc)
+            with open(tmp_loc, 'w') as outfile:
+                json.dump(self.entries, outfile, indent=4, sort_keys=True)
+            os.replace(tmp_loc, self.manifest_loc)
@@ -0,0 +1,192 @@
+"""Metastore module
+
+This script contains the indexed metadata store used in place of linear
+find_in_json() scans.
+
+It contains following classes
+    * MetadataStore: Metadata records with hash indexes on key attributes
+
+It contains following functions
+    * normalize: Unescapes '&amp;' in tickers
+"""
+
+import os
+import json
+import threading
+
+
+def normalize(value):
+    """Returns value with HTML escaped ampersands ('&amp;') unescaped, so
+    tickers from the index list and from quotes compare equal
+    """
+
+    return value.replace('&amp;', '&') if isinstance(value, str) else value
+
+
+class MetadataStore:
+    """
+    Class to represent metadata records with hash indexes on key attributes
+
+    Stores loaded with load() are cached per process and shared, lookups
+    return copies of records so callers can modify them freely.
+
+    ...
+
+    Attributes
+    ----------
+    records : list[dict]
+        Metadata records, in file order
+    keys : tuple[str]
+        Attributes indexed for lookups
+
+    Methods
+    -------
+    load(json_loc=str, keys=tuple): MetadataStore()
+        Loads metadata JSON once per process and file version
+    get(value=str, key=str): dict
+        Returns copy of record where key = value
+    get_many(values=list[str], key=str): list[dict]
+        Returns copies of records for every value, None where missing
+    project(fields=list[str], values=list[str], key=str): list[dict]
+        Returns records (or records of values) with only given fields
+    save(json_loc=str): void
+        Atomically writes records as JSON
+    """
+
+    _cache = {}
+    _cache_lock = threading.Lock()
+
+    def __init__(self, records=None, keys=('Ticker',)):
+        self.records = records if records is not None else []
+        self.keys = tuple(keys)
+        self._indexes = {}
+
+        for key in self.keys:
+            self._index(key)
+
+    @classmethod
+    def load(cls, json_loc, keys=('Ticker',)):
+        """Loads metadata JSON once per process and file version
+        File is parsed again only if its size or modification time changed
+
+        Parameters
+        ----------
+        json_loc: str
+            Location of metadata JSON
+        keys: tuple[str] (('Ticker',))
+            Attributes indexed for lookups
+
+        Returns
+        -------
+        store: MetadataStore()
+            Shared store of file's records
+        """
+
+        st = os.stat(json_loc)
+        version = (st.st_size, st.st_mtime_ns)
+        cache_key = os.path.abspath(json_loc)
+
+        with cls._cache_lock:
+            cached = cls._cache.get(cache_key)
+            if(cached is not None and cached[0] == version):
+                store = cached[1]
+                for key in keys:
+                    store._index(key)
+                return store
+
+        with open(json_loc, 'r') as infile:
+            store = cls(json.load(infile), keys)
+
+        with cls._cache_lock:
+            cls._cache[cache_key] = (version, store)
+        return store
+
+    def _index(self, key):
+        """Returns index of key, building it on first use
+        """
+
+        index = self._indexes.get(key)
+        if(index is None):
+            index = {}
+            for r in self.records:
+                index.setdefault(normalize(r.get(key)), r)
+            self._indexes[key] = index
+        return index
+
+    def get(self, value, key='Ticker'):
+        """Returns copy of record where key = value
+
+        Parameters
+        ----------
+        value: str
+            Expected value of attribute, '&amp;' and '&' are equivalent
+        key: str ('Ticker')
+            Attribute of the record to be checked
+
+        Returns
+        -------
+        entry: dict
+            Copy of record that fulfills the condition, None if missing
+        """
+
+        entry = self._index(key).get(normalize(value))
+        return None if entry is None else dict(entry)
+
+    def get_many(self, values, key='Ticker'):
+        """Returns copies of records for every value, None where missing
+
+        Parameters
+        ----------
+        values: list[str]
+            Expected values of attribute
+        key: str ('Ticker')
+            Attribute of the records to be checked
+
+        Returns
+        -------
+        entries: list[dict]
+            Copies of records in order of values
+        """
+
+        index = self._index(key)
+        entries = [index.get(normalize(v)) for v in values]
+        return [None if e is None else dict(e) for e in entries]
+
+    def project(self, fields, values=None, key='Ticker'):
+        """Returns records (or records of values) with only given fields
+
+        Parameters
+        ----------
+        fields: list[str]
+            Attributes kept in returned records
+        values: list[str] (None)
+            Values of key to be returned, None returns all records
+        key: str ('Ticker')
+            Attribute values are matched against
+
+        Returns
+        -------
+        entries: list[dict]
+            Projected records, None where value is missing
+        """
+
+        if(values is None):
+            entries = self.records
+        else:
+            index = self._index(key)
+            entries = [index.get(normalize(v)) for v in values]
+        return [None if e is None else {f: e.get(f) for f in fields} for e in entries]
+
+    def save(self, json_loc):
+        """Atomically writes records as JSON
+
+        Parameters
+        ----------
+        json_loc: str
+            Location of JSON file to be written
+        """
+
+        tmp_loc = '{}.tmp'.format(json_loc)
+        with open(tmp_loc, 'w') as outfile:
+            json.dump(self.records, outfile, indent=4)
+        os.replace(tmp_loc, json_loc)
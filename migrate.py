@@ -0,0 +1,83 @@
+"""Migrate module
+
+This script converts a directory of per-ticker OHLC files from one storage
+format to another, eg. from the CSV layout to Parquet and back.
+
+    python migrate.py data/cleaned/OHLC/Nifty500 --target parquet \
+        --metadata data/cleaned/Metadata/nifty500.json
+
+It contains following functions
+    * migrate: Converts every OHLC file in a directory to another format
+"""
+
+import os
+import argparse
+
+from manifest import Manifest
+from storage import get_storage
+from utils import read_json, write_json
+
+
+def migrate(ohlc_dir, source='csv', target='parquet', metadata_loc=None, remove=False):
+    """Converts every OHLC file in a directory to another format
+
+    Parameters
+    ----------
+    ohlc_dir: str
+        Location of OHLC directory
+    source: str ('csv')
+        Current storage format
+    target: str ('parquet')
+        Storage format to convert to
+    metadata_loc: str (None)
+        Location of metadata JSON whose 'OHLC Data Location' entries are
+        pointed to converted files
+    remove: bool (False)
+        Toggle to remove source files after conversion
+
+    Returns
+    -------
+    converted: list[str]
+        Tickers converted
+    """
+
+    src = get_storage(source, ohlc_dir)
+    dst = get_storage(target, ohlc_dir)
+    manifest = Manifest(ohlc_dir, dst.ext, dst)
+
+    converted = []
+    for name in src.names():
+        try:
+            df = src.read(name)
+            dst.write(df, name)
+            manifest.record(name, df)
+            converted.append(name)
+            if(remove):
+                os.remove(src.path(name))
+        except Exception as e:
+            print("Exception {} occured for file: {}".format(e, src.path(name)))
+
+    manifest.save()
+
+    if(metadata_loc is not None):
+        metadata_json = read_json(metadata_loc)
+        for entry in metadata_json:
+            if(entry.get('OHLC Data Location') == src.path(entry['Ticker'])):
+                entry['OHLC Data Location'] = dst.path(entry['Ticker'])
+        write_json(metadata_json, metadata_loc)
+
+    print("Converted {} files in {} from {} to {}".format(len(converted), ohlc_dir,
+                                                         source, target))
+    return converted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Converts OHLC files to another storage format")
+    parser.add_argument('ohlc_dir', help="Location of OHLC directory")
+    parser.add_argument('--source', default='csv', help="Current storage format")
+    parser.add_argument('--target', default='parquet', help="Storage format to convert to")
+    parser.add_argument('--metadata', default=None, help="Metadata JSON to be pointed to converted files")
+    parser.add_argument('--remove', action='store_true', help="Remove source files after conversion")
+    args = parser.parse_args()
+
+    migrate(args.ohlc_dir, args.source, args.target, args.metadata, args.remove)
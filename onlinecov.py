@@ -0,0 +1,367 @@
+"""Onlinecov module
+
+This script contains the incremental covariance engine used in place of
+recalculating covariance over the full close price matrix every day.
+Running sums of returns and their cross-products are updated in O(N^2) per
+new trading day, the oldest day is removed for sliding windows.
+
+It contains following classes
+    * OnlineCovariance: Sample and shrunk covariance of returns over a window
+"""
+
+import os
+import json
+
+import numpy as np
+import pandas as pd
+from pypfopt import risk_models
+
+
+class OnlineCovariance:
+    """
+    Class to represent sample and shrunk covariance of daily returns over a
+    lookback window, maintained incrementally
+
+    Sums kept are n, sum of returns, sum of outer products of returns and,
+    for Ledoit-Wolf shrinkage, sum of squared return norms, sum of their
+    squares and sum of returns weighted by squared norm. Estimates match
+    risk_models.sample_cov() and CovarianceShrinkage() of the same window.
+    Close prices must not contain NaN.
+
+    ...
+
+    Attributes
+    ----------
+    tickers : list[str]
+        Tickers (columns) of covariance
+    window : int
+        Number of returns in lookback window, None keeps every return
+    frequency : int
+        Number of trading days in a year, used to annualise covariance
+    n : int
+        Number of returns in window
+    last_date : str
+        Date of last close price added
+    delta : float
+        Shrinkage constant of last shrunk estimate
+
+    Methods
+    -------
+    from_prices(close_matrix=pd.DataFrame, window=int, frequency=int): OnlineCovariance()
+        Builds engine from close price matrix
+    update(close=array-like, date=str): void
+        Adds close prices of a new trading day
+    sync(close_matrix=pd.DataFrame): int
+        Adds rows of close_matrix dated after last_date, returns rows added
+    cov(): pd.DataFrame
+        Returns annualised sample covariance
+    shrunk_covariance(delta=float): pd.DataFrame
+        Returns annualised covariance shrunk towards scaled identity by delta
+    ledoit_wolf(): pd.DataFrame
+        Returns annualised Ledoit-Wolf shrunk covariance
+    check(close_matrix=pd.DataFrame): dict
+        Returns largest difference of estimates from pypfopt's
+    save(state_loc=str): void
+        Atomically stores engine state
+    load(state_loc=str): OnlineCovariance()
+        Loads engine state
+    """
+
+    def __init__(self, tickers, window=None, frequency=252):
+        self.tickers = list(tickers)
+        self.window = window
+        self.frequency = frequency
+        self.last_date = None
+        self.last_close = None
+
+        num = len(self.tickers)
+        self.n = 0
+        self.s1 = np.zeros(num)
+        self.m11 = np.zeros((num, num))
+        self.v = np.zeros(num)
+        self.a1 = 0.0
+        self.a2 = 0.0
+
+        self.buffer = np.zeros((window, num)) if window else None
+        self.head = 0
+        self.updates = 0
+        self.delta = None
+
+    @classmethod
+    def from_prices(cls, close_matrix, window=None, frequency=252):
+        """Builds engine from close price matrix
+
+        Parameters
+        ----------
+        close_matrix: pd.DataFrame
+            Close prices indexed by date, with a column per ticker
+        window: int (None)
+            Number of returns in lookback window, None keeps every return
+        frequency: int (252)
+            Number of trading days in a year
+
+        Returns
+        -------
+        engine: OnlineCovariance()
+            Engine whose window ends on last row of close_matrix
+        """
+
+        engine = cls(close_matrix.columns, window, frequency)
+        if(close_matrix.shape[0] == 0):
+            return engine
+
+        close = close_matrix.values.astype('float64')
+        engine._validate(close)
+        returns = close[1:]/close[:-1] - 1
+        if(window):
+            returns = returns[-window:]
+            engine.buffer[:len(returns)] = returns
+            engine.head = len(returns) % window
+
+        engine.n = len(returns)
+        engine._rebuild(returns)
+        engine.last_close = close[-1]
+        engine.last_date = str(close_matrix.index[-1])[:10]
+        return engine
+
+    def update(self, close, date=None):
+        """Adds close prices of a new trading day
+        Oldest return leaves window once window is full
+
+        Parameters
+        ----------
+        close: array-like
+            Close prices of every ticker, in order of tickers
+        date: str (None)
+            Date of close prices
+        """
+
+        if isinstance(close, pd.Series):
+            close = close.reindex(self.tickers)
+        close = np.asarray(close, dtype='float64')
+        self._validate(close)
+
+        if(self.last_close is not None):
+            r = close/self.last_close - 1
+            if(self.window):
+                if(self.n == self.window):
+                    self._add(self.buffer[self.head], -1)
+                self.buffer[self.head] = r
+                self.head = (self.head + 1) % self.window
+            self._add(r, 1)
+
+            self.updates += 1
+            if(self.window and self.updates % self.window == 0):
+                self._rebuild(self.buffer[:self.n])
+
+        self.last_close = close
+        self.last_date = None if date is None else str(date)[:10]
+
+    def sync(self, close_matrix):
+        """Adds rows of close_matrix dated after last_date, returns rows added
+
+        Parameters
+        ----------
+        close_matrix: pd.DataFrame
+            Close prices indexed by date, with a column per ticker
+
+        Returns
+        -------
+        added: int
+            Number of rows added
+        """
+
+        rows = close_matrix[self.tickers]
+        if(self.last_date is not None):
+            rows = rows[rows.index > pd.Timestamp(self.last_date)]
+        for date, close in zip(rows.index, rows.values):
+            self.update(close, date)
+        return rows.shape[0]
+
+    def cov(self):
+        """Returns annualised sample covariance
+        Matches risk_models.sample_cov() of the window
+        """
+
+        return self._format(self._scatter()/(self.n - 1))
+
+    def shrunk_covariance(self, delta=0.2):
+        """Returns annualised covariance shrunk towards scaled identity by delta
+        Matches CovarianceShrinkage().shrunk_covariance() of the window
+
+        Parameters
+        ----------
+        delta: float (0.2)
+            Shrinkage constant
+        """
+
+        self.delta = delta
+        s = self._scatter()/(self.n - 1)
+        mu = np.trace(s)/len(self.tickers)
+        return self._format(delta*mu*np.identity(len(self.tickers)) + (1 - delta)*s)
+
+    def ledoit_wolf(self):
+        """Returns annualised Ledoit-Wolf shrunk covariance
+        Matches CovarianceShrinkage().ledoit_wolf() of the window. Shrinkage
+        constant is calculated from maintained sums, see
+        sklearn.covariance.ledoit_wolf_shrinkage()
+        """
+
+        n, p = self.n, len(self.tickers)
+        m = self.s1/n
+        c = self._scatter()
+        emp_cov = c/n
+        mu = np.trace(emp_cov)/p
+
+        # beta_ is sum over days of squared norms of centered returns, squared
+        mm = m @ m
+        beta_ = (self.a2 - 4*(self.v @ m) + 4*(m @ self.m11 @ m) + 2*mm*self.a1
+                 - 4*mm*(self.s1 @ m) + n*mm*mm)
+        delta_ = np.sum(c**2)/n**2
+        beta = (beta_/n - delta_)/(p*n)
+        delta = (delta_ - 2*mu*np.trace(emp_cov) + p*mu**2)/p
+        beta = min(beta, delta)
+        self.delta = 0 if beta == 0 else beta/delta
+
+        shrunk = (1 - self.delta)*emp_cov
+        shrunk.flat[::p + 1] += self.delta*mu
+        return self._format(shrunk)
+
+    def check(self, close_matrix, atol=1e-10):
+        """Returns largest difference of estimates from pypfopt's
+        close_matrix has to end on the last row added to engine
+
+        Parameters
+        ----------
+        close_matrix: pd.DataFrame
+            Close prices indexed by date, with a column per ticker
+        atol: float (1e-10)
+            Largest difference reported as consistent
+
+        Returns
+        -------
+        diffs: dict[str] = float
+            Largest absolute difference of every estimate
+        """
+
+        prices = close_matrix[self.tickers]
+        if(self.window):
+            prices = prices.iloc[-(self.window + 1):]
+
+        shrinkage = risk_models.CovarianceShrinkage(prices, frequency=self.frequency)
+        expected = {
+            'sample_cov': risk_models.sample_cov(prices, frequency=self.frequency),
+            'shrunk_covariance': shrinkage.shrunk_covariance(),
+            'ledoit_wolf': shrinkage.ledoit_wolf()
+        }
+        actual = {
+            'sample_cov': self.cov(),
+            'shrunk_covariance': self.shrunk_covariance(),
+            'ledoit_wolf': self.ledoit_wolf()
+        }
+
+        diffs = {key: float(np.max(np.abs(actual[key].values - expected[key].values)))
+                 for key in expected}
+        for key, diff in diffs.items():
+            print("{}: largest difference {} {}".format(
+                key, diff, 'consistent' if diff <= atol else 'INCONSISTENT'))
+        return diffs
+
+    def save(self, state_loc):
+        """Atomically stores engine state
+
+        Parameters
+        ----------
+        state_loc: str
+            Location of state file (.npz)
+        """
+
+        meta = {'tickers': self.tickers, 'window': self.window,
+                'frequency': self.frequency, 'last_date': self.last_date,
+                'n': self.n, 'head': self.head, 'updates': self.updates,
+                'a1': self.a1, 'a2': self.a2}
+        arrays = {'s1': self.s1, 'm11': self.m11, 'v': self.v,
+                  'last_close': np.array([]) if self.last_close is None else self.last_close}
+        if(self.window):
+            arrays['buffer'] = self.buffer
+
+        tmp_loc = '{}.tmp'.format(state_loc)
+        with open(tmp_loc, 'wb') as outfile:
+            np.savez(outfile, meta=np.array(json.dumps(meta)), **arrays)
+        os.replace(tmp_loc, state_loc)
+
+    @classmethod
+    def load(cls, state_loc):
+        """Loads engine state
+
+        Parameters
+        ----------
+        state_loc: str
+            Location of state file (.npz)
+
+        Returns
+        -------
+        engine: OnlineCovariance()
+            Engine stored by save()
+        """
+
+        with np.load(state_loc) as state:
+            meta = json.loads(str(state['meta']))
+            engine = cls(meta['tickers'], meta['window'], meta['frequency'])
+            engine.s1 = state['s1']
+            engine.m11 = state['m11']
+            engine.v = state['v']
+            engine.last_close = state['last_close'] if state['last_close'].size else None
+            if(engine.window):
+                engine.buffer = state['buffer']
+
+        for key in ['last_date', 'n', 'head', 'updates', 'a1', 'a2']:
+            setattr(engine, key, meta[key])
+        return engine
+
+    def _add(self, r, sign):
+        """Adds (sign=1) or removes (sign=-1) a day's returns from sums
+        """
+
+        a = r @ r
+        self.n += sign
+        self.s1 += sign*r
+        self.m11 += sign*np.outer(r, r)
+        self.v += sign*a*r
+        self.a1 += sign*a
+        self.a2 += sign*a*a
+
+    def _rebuild(self, returns):
+        """Recalculates sums from returns in window, clearing rounding errors
+        accumulated by removing days
+        """
+
+        a = np.einsum('ij,ij->i', returns, returns)
+        self.s1 = returns.sum(axis=0)
+        self.m11 = returns.T @ returns
+        self.v = a @ returns
+        self.a1 = float(a.sum())
+        self.a2 = float(a @ a)
+
+    def _scatter(self):
+        """Returns sum of outer products of centered returns
+        """
+
+        if(self.n < 2):
+            raise ValueError("At least 2 returns are needed, window has {}".format(self.n))
+        m = self.s1/self.n
+        return self.m11 - self.n*np.outer(m, m)
+
+    def _format(self, cov):
+        """Returns annualised covariance as DataFrame, fixed like pypfopt's
+        """
+
+        cov = pd.DataFrame(cov, index=self.tickers, columns=self.tickers)*self.frequency
+        return risk_models.fix_nonpositive_semidefinite(cov, fix_method='spectral')
+
+    def _validate(self, close):
+        """Raises ValueError if close prices contain NaN
+        """
+
+        if(np.isnan(close).any()):
+            raise ValueError("Close prices contain NaN, drop tickers without data")
@@ -14,13 +14,35 @@ It contains following classes
                     based allocation
 """
 
+from concurrent.futures import ProcessPoolExecutor
+
 from pypfopt.efficient_frontier import EfficientFrontier
 from pypfopt.hierarchical_portfolio import HRPOpt
 from pypfopt.cla import CLA
-from pypfopt import risk_models, expected_returns
+import numpy as np
 import pandas as pd
 
 from ds import Portfolio
+from riskcache import get_cache
+
+
+def _frontier_segment(mu, s, targets, solver=None):
+    """Solves efficient_return() of every target with one EfficientFrontier,
+    run in a worker process. The problem is built once, later targets only
+    update its target return parameter and are warm-started from the
+    previous solution. Returns list of (target, weights, performance, error)
+    """
+
+    optimizer = EfficientFrontier(mu, s, solver=solver)
+    points = []
+    for target in targets:
+        try:
+            optimizer.efficient_return(float(target))
+            points.append((target, dict(optimizer.clean_weights()),
+                           optimizer.portfolio_performance(), None))
+        except Exception as e:
+            points.append((target, {}, (None, None, None), repr(e)))
+    return points
 
 
 class Optimizer:
@@ -37,17 +59,43 @@ class Optimizer:
         IndexProcessor object to collect input data
     optimizer : <varies>
         Optimizer object used for calculations
+    cache : RiskModelCache()
+        Cache of expected returns and covariance estimates
     
     Methods
     -------
     optimize(): void
         Performs portfolio optimization and constructs portfolio to store data
+    estimate(estimator=str, **params): pd.Series or pd.DataFrame
+        Returns cached estimate of processor's close price matrix
     """
 
-    def __init__(self, processor=None):
+    def __init__(self, processor=None, cache=None):
         self.portfolio = Portfolio()
         self.processor = processor
         self.optimizer = None
+        self.cache = cache if cache is not None else get_cache()
+
+    def estimate(self, estimator, **params):
+        """Returns cached estimate of processor's close price matrix
+        Close price matrix is processed if processor has none yet
+
+        Parameters
+        ----------
+        estimator: str
+            Name of estimator in riskcache.ESTIMATORS
+        params: dict
+            Parameters passed to estimator
+
+        Returns
+        -------
+        estimate: pd.Series or pd.DataFrame
+            Expected returns or covariance matrix
+        """
+
+        if not isinstance(self.processor.close_matrix, pd.DataFrame):
+            self.processor.process_close()
+        return self.cache.get(self.processor.close_matrix, estimator, **params)
     
     def optimize(self):
         """Performs portfolio optimization and constructs portfolio to store data
@@ -56,7 +104,7 @@ class Optimizer:
         pass
 
 
-class EffOptimizer:
+class EffOptimizer(Optimizer):
     """
     Derived Optimizer Class for Efficient Frontiner based allocation
 
@@ -83,21 +131,21 @@ class EffOptimizer:
     optimize_min_volatility(): void
         Performs portfolio optimization (aiming for minimum volatility)
         and constructs portfolio to store data
+    frontier(points=int, workers=int, solver=str): (pd.DataFrame, pd.DataFrame)
+        Returns points of efficient frontier, with weights of every point
     """
 
-    def __init__(self, processor=None):
-        super().__init__()
-        self.processor = processor
-        self.mu = expected_returns.capm_return(processor.close_matrix)
-        self.s = risk_models.CovarianceShrinkage(processor.close_matrix).ledoit_wolf()
-        self.optimizer = None
+    def __init__(self, processor=None, cache=None):
+        super().__init__(processor, cache)
+        self.mu = self.estimate('capm_return')
+        self.s = self.estimate('ledoit_wolf')
 
     def optimize_max_sharpe(self):
         """Performs portfolio optimization (aiming for maximum sharpe ratio value)
         and constructs portfolio to store data
         """
 
-        self.s = risk_models.sample_cov(self.processor.close_matrix)
+        self.s = self.estimate('sample_cov')
         self.optimizer = EfficientFrontier(self.mu, self.s)
 
         self.optimizer.max_sharpe()
@@ -118,8 +166,56 @@ class EffOptimizer:
         self.portfolio.construct(self.processor.metadata_loc, 
                                  self.optimizer.portfolio_performance())
 
+    def frontier(self, points=20, workers=1, solver=None):
+        """Returns points of efficient frontier, with weights of every point
+        Target returns are spaced evenly from return of minimum volatility
+        portfolio up to (excluding) the highest expected return. Targets are
+        split into contiguous segments, one per worker, each solved with a
+        single warm-started EfficientFrontier. A target the solver fails on
+        is reported in error column
+
+        Parameters
+        ----------
+        points: int (20)
+            Number of frontier points
+        workers: int (1)
+            Number of worker processes, 1 solves in this process
+        solver: str (None)
+            cvxpy solver, None uses pypfopt's default
+
+        Returns
+        -------
+        frontier: pd.DataFrame
+            target_return, expected_return, volatility, sharpe and error of
+            every point, in increasing target return
+        weights: pd.DataFrame
+            Weights of every point, with a column per ticker
+        """
 
-class HRPOptimizer:
+        low = EfficientFrontier(self.mu, self.s, solver=solver)
+        low.min_volatility()
+        min_return = low.portfolio_performance()[0]
+        targets = np.linspace(min_return, float(self.mu.max()), points + 1)[:-1]
+
+        segments = [list(t) for t in np.array_split(targets, max(1, min(workers, points))) if len(t)]
+        if(workers <= 1):
+            solved = [_frontier_segment(self.mu, self.s, t, solver) for t in segments]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                solved = list(executor.map(_frontier_segment, [self.mu]*len(segments),
+                                           [self.s]*len(segments), segments,
+                                           [solver]*len(segments)))
+
+        solved = [point for segment in solved for point in segment]
+        frontier = pd.DataFrame([{'target_return': target, 'expected_return': performance[0],
+                                  'volatility': performance[1], 'sharpe': performance[2],
+                                  'error': error}
+                                 for target, _, performance, error in solved])
+        weights = pd.DataFrame([w for _, w, _, _ in solved], columns=self.mu.index).fillna(0)
+        return frontier, weights
+
+
+class HRPOptimizer(Optimizer):
     """
     Derived Optimizer Class for Hierarchial Risk Parity based allocation
 
@@ -143,12 +239,10 @@ class HRPOptimizer:
         and constructs portfolio to store data
     """
 
-    def __init__(self, processor=None):
-        super().__init__()
-        self.processor = processor
+    def __init__(self, processor=None, cache=None):
+        super().__init__(processor, cache)
 
-        self.processor.process_close()
-        self.mu = expected_returns.returns_from_prices(processor.close_matrix)
+        self.mu = self.estimate('returns_from_prices')
 
         self.optimizer = HRPOpt(self.mu)
 
@@ -163,7 +257,7 @@ class HRPOptimizer:
                                  self.optimizer.portfolio_performance())
 
 
-class CLAOptimizer:
+class CLAOptimizer(Optimizer):
     """
     Derived Optimizer Class for Critial Line Algorithm based allocation
 
@@ -192,14 +286,12 @@ class CLAOptimizer:
         and constructs portfolio to store data
     """
 
-    def __init__(self, processor=None):
-        super().__init__()
-        self.processor = processor
+    def __init__(self, processor=None, cache=None):
+        super().__init__(processor, cache)
 
-        self.processor.process_close()
-        self.mu = expected_returns.capm_return(processor.close_matrix)
-        #self.s = risk_models.sample_cov(processor.close_matrix)
-        self.s = risk_models.CovarianceShrinkage(processor.close_matrix).ledoit_wolf()
+        self.mu = self.estimate('capm_return')
+        #self.s = self.estimate('sample_cov')
+        self.s = self.estimate('ledoit_wolf')
 
         self.optimizer = CLA(self.mu, self.s)
 
@@ -0,0 +1,290 @@
+"""Panel module
+
+This script contains the memory-mapped close price panel shared by
+processors and optimizers.
+
+It contains following classes
+    * ClosePanel: Date x ticker close price panel stored as memory-mapped array
+"""
+
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+from manifest import fingerprint
+
+
+class ClosePanel:
+    """
+    Class to represent a date x ticker close price panel stored as a
+    memory-mapped NumPy array
+
+    The date axis is the union of trading dates of all tickers, days on which
+    a ticker has no data are NaN. Rows are preallocated so new dates are
+    written in place. Fingerprint of every ticker's file is recorded when it
+    is read, so updates only read files changed since.
+
+    ...
+
+    Attributes
+    ----------
+    panel_dir : str
+        Location of directory containing panel files
+    tickers : list[str]
+        Tickers (columns) of panel
+    dates : np.ndarray
+        Dates (rows) of panel as datetime64[D]
+    rows : int
+        Number of filled rows
+    capacity : int
+        Number of preallocated rows
+    close : np.memmap
+        Close prices, shape (capacity, len(tickers))
+    sources : dict[str] = dict
+        Fingerprint (size, mtime_ns) of every ticker's file when it was read
+
+    Methods
+    -------
+    exists(): bool
+        Checks if panel files are present
+    load(mode=str): void
+        Opens panel files
+    build(storage=Storage()): void
+        Builds panel from Close column of every ticker in storage
+    update(storage=Storage()): int
+        Updates columns of tickers whose file changed, returns dates added
+    frame(time_period=int): pd.DataFrame
+        Returns last time_period rows as DataFrame sharing panel's memory
+    """
+
+    def __init__(self, panel_dir):
+        self.panel_dir = panel_dir
+        self.meta_loc = os.path.join(panel_dir, 'panel.json')
+        self.dates_loc = os.path.join(panel_dir, 'dates.npy')
+        self.close_loc = os.path.join(panel_dir, 'close.dat')
+
+        self.tickers = []
+        self.dates = np.array([], dtype='M8[D]')
+        self.rows = 0
+        self.capacity = 0
+        self.close = None
+        self.sources = {}
+
+    def exists(self):
+        """Checks if panel files are present
+        """
+
+        return os.path.exists(self.meta_loc)
+
+    def load(self, mode='r'):
+        """Opens panel files
+
+        Parameters
+        ----------
+        mode: str ('r')
+            Memory-map mode, 'r' for read-only or 'r+' for updating
+        """
+
+        with open(self.meta_loc, 'r') as infile:
+            meta = json.load(infile)
+
+        self.tickers = meta['tickers']
+        self.rows = meta['rows']
+        self.capacity = meta['capacity']
+        self.sources = meta.get('sources', {})
+        self.dates = np.load(self.dates_loc)[:self.rows]
+        self.close = np.memmap(self.close_loc, dtype='float64', mode=mode,
+                               shape=(self.capacity, len(self.tickers)))
+
+    def build(self, storage, headroom=256):
+        """Builds panel from Close column of every ticker in storage
+
+        Parameters
+        ----------
+        storage: Storage()
+            Storage backend of OHLC data
+        headroom: int (256)
+            Rows preallocated for future dates
+        """
+
+        series, sources = {}, {}
+        for name in storage.names():
+            close = self._read(storage, name)
+            if(close is not None):
+                sources[name] = close.attrs['source']
+                if(close.shape[0] != 0):
+                    series[name] = close
+
+        df = pd.DataFrame(series).sort_index()
+        self._write(df.index.values.astype('M8[D]'), list(df.columns),
+                    df.values, headroom, sources)
+
+    def update(self, storage, headroom=256):
+        """Updates columns of tickers whose file changed, returns dates added
+        A changed ticker's column is rewritten from its file, so rows dated on
+        or before panel's last date (late or rewritten history) are picked
+        up. Tickers whose file is gone are dropped, new tickers are added.
+
+        Parameters
+        ----------
+        storage: Storage()
+            Storage backend of OHLC data
+        headroom: int (256)
+            Rows preallocated when panel has to grow
+
+        Returns
+        -------
+        added: int
+            Number of dates added
+        """
+
+        if not self.exists():
+            self.build(storage, headroom)
+            return self.rows
+
+        self.load('r+')
+        names = storage.names()
+        series, sources = {}, dict(self.sources)
+        for name in names:
+            try:
+                if(self.sources.get(name) == fingerprint(storage.path(name))):
+                    continue
+            except OSError:
+                continue
+            close = self._read(storage, name)
+            if(close is not None):
+                series[name] = close
+                sources[name] = close.attrs['source']
+
+        gone = set(self.tickers) - set(names)
+        if(len(series) == 0 and len(gone) == 0):
+            return 0
+        for name in gone:
+            sources.pop(name, None)
+
+        new_dates = [close.index.values.astype('M8[D]') for close in series.values()]
+        new_dates = np.setdiff1d(np.concatenate([self.dates] + new_dates), self.dates)
+        tickers = [t for t in self.tickers if t not in gone]
+        tickers += [t for t in series if t not in self.tickers]
+        added = len(new_dates)
+
+        if(tickers != self.tickers or (added and self.rows and new_dates[0] <= self.dates[-1])):
+            # Columns changed or dates were inserted before last date
+            dates = np.union1d(self.dates, new_dates)
+            df = self.frame()[[t for t in tickers if t in self.tickers]]
+            df = df.reindex(index=pd.DatetimeIndex(dates, name='Date'), columns=tickers)
+            for name, close in series.items():
+                df[name] = self._column(dates, close)
+            self.close = None
+            self._write(dates, tickers, df.values, headroom, sources)
+            return added
+
+        if(self.rows + added > self.capacity):
+            values = np.array(self.close[:self.rows])
+            dates = self.dates
+            self.close = None
+            self._write(dates, self.tickers, values, added + headroom, self.sources)
+            self.load('r+')
+
+        rows = self.rows + added
+        dates = np.concatenate([self.dates, new_dates])
+        self.close[self.rows:rows] = np.nan
+
+        # Only rows whose values differ are written
+        cols = [self.tickers.index(t) for t in series]
+        block = np.column_stack([self._column(dates, close) for close in series.values()])
+        old = self.close[:rows][:, cols]
+        dirty = np.flatnonzero(((old != block) & ~(np.isnan(old) & np.isnan(block))).any(axis=1))
+        if(len(dirty)):
+            self.close[np.ix_(dirty, cols)] = block[dirty]
+        self.close.flush()
+
+        self._write_meta(dates, self.tickers, rows, self.capacity, sources)
+        self.load()
+
+        return added
+
+    def frame(self, time_period=None):
+        """Returns last time_period rows as DataFrame sharing panel's memory
+
+        Parameters
+        ----------
+        time_period: int (None)
+            Number of rows, None returns all rows
+
+        Returns
+        -------
+        close_matrix: pd.DataFrame
+            Close prices indexed by Date, with a column per ticker
+        """
+
+        if(self.close is None):
+            self.load()
+
+        start = 0 if time_period is None else max(0, self.rows - time_period)
+        index = pd.DatetimeIndex(self.dates[start:self.rows], name='Date')
+        return pd.DataFrame(self.close[start:self.rows], index=index,
+                            columns=self.tickers, copy=False)
+
+    def _read(self, storage, name):
+        """Returns deduplicated Close column of ticker, with fingerprint of
+        its file in attrs['source'], None if it can not be read
+        """
+
+        try:
+            source = fingerprint(storage.path(name))
+            close = storage.read(name, columns=['Close'])['Close']
+        except Exception as e:
+            print("Exception {} occured for file: {}".format(e, storage.path(name)))
+            return None
+
+        close = close[~close.index.duplicated(keep='last')].sort_index()
+        close.attrs['source'] = source
+        return close
+
+    def _column(self, dates, close):
+        """Returns close aligned on dates, NaN where it has no data
+        """
+
+        column = np.full(len(dates), np.nan)
+        positions = np.searchsorted(dates, close.index.values.astype('M8[D]'))
+        column[positions] = close.values
+        return column
+
+    def _write(self, dates, tickers, values, headroom, sources):
+        """Writes panel files from scratch
+        """
+
+        if not os.path.exists(self.panel_dir):
+            os.makedirs(self.panel_dir)
+
+        rows = len(dates)
+        capacity = rows + headroom
+        tmp_loc = '{}.tmp'.format(self.close_loc)
+        close = np.memmap(tmp_loc, dtype='float64', mode='w+',
+                          shape=(capacity, max(1, len(tickers))))
+        close[:] = np.nan
+        if(rows):
+            close[:rows, :len(tickers)] = values
+        close.flush()
+        del close
+        os.replace(tmp_loc, self.close_loc)
+
+        self._write_meta(dates, tickers, rows, capacity, sources)
+        self.load()
+
+    def _write_meta(self, dates, tickers, rows, capacity, sources):
+        """Atomically writes dates and metadata of panel
+        """
+
+        tmp_loc = '{}.tmp.npy'.format(self.dates_loc[:-4])
+        np.save(tmp_loc, np.asarray(dates, dtype='M8[D]'))
+        os.replace(tmp_loc, self.dates_loc)
+
+        tmp_loc = '{}.tmp'.format(self.meta_loc)
+        with open(tmp_loc, 'w') as outfile:
+            json.dump({'tickers': tickers, 'rows': int(rows),
+                       'capacity': int(capacity), 'sources': sources}, outfile)
+        os.replace(tmp_loc, self.meta_loc)
@@ -0,0 +1,624 @@
+"""Pipeline module
+
+This script contains the dependency-aware pipeline runner of the data
+pipeline, replacing the fixed fetch -> clean -> process sequence. Every stage
+declares per-ticker inputs and outputs, only stale tickers are rebuilt,
+make-style, and a stage is skipped when nothing it depends on changed.
+
+    python pipeline.py [stage ...] [--dry-run] [--force] [--workers N]
+
+Stages are run with the stages they depend on, all stages are run if none
+are given. The runner is non-interactive so it can be driven by cron, its
+exit status is 1 if any stage failed.
+
+It contains following classes
+    * Stage: Base Stage Class
+    * ListStage: Derived Stage Class for Nifty 500 ticker list
+    * MetadataStage: Derived Stage Class for fetching quotes
+    * OHLCStage: Derived Stage Class for fetching OHLC data
+    * CleanMetadataStage: Derived Stage Class for cleaning metadata
+    * CleanOHLCStage: Derived Stage Class for cleaning OHLC data
+    * ProcessStage: Derived Stage Class for processing metrics
+    * PanelStage: Derived Stage Class for updating close price panel
+    * Pipeline: DAG of stages
+
+It contains following functions
+    * is_stale: Checks if any output is missing or older than an input
+    * touch: Marks existing outputs as built now
+    * describe: Returns printable summary of stale tickers
+"""
+
+import os
+import sys
+import time
+import argparse
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from fetcher import Nifty500Fetcher
+from cleaner import Nifty500Cleaner
+from processor import IndexProcessor
+from manifest import Manifest, fingerprint
+from quotes import QuoteLog
+from storage import get_storage
+
+
+def is_stale(inputs, outputs):
+    """Checks if any output is missing or older than an input
+
+    Parameters
+    ----------
+    inputs: list[str]
+        Locations of files outputs are built from, missing inputs are ignored
+    outputs: list[str]
+        Locations of files built
+
+    Returns
+    -------
+    stale: bool
+        True if outputs have to be rebuilt, False if none of the inputs
+        exist as there is nothing to build from
+    """
+
+    changed = [os.stat(i).st_mtime_ns for i in inputs if os.path.exists(i)]
+    if(len(inputs) and len(changed) == 0):
+        return False
+
+    try:
+        built = min(os.stat(o).st_mtime_ns for o in outputs)
+    except OSError:
+        return True
+
+    return len(changed) != 0 and max(changed) > built
+
+
+def touch(outputs):
+    """Marks existing outputs as built now
+    """
+
+    for o in outputs:
+        if os.path.exists(o):
+            os.utime(o)
+
+
+class Stage:
+    """
+    Base class to represent a pipeline Stage
+
+    A stage builds outputs of every ticker from its inputs, tasks keyed by
+    None build outputs shared by all tickers.
+
+    ...
+
+    Attributes
+    ----------
+    name : str
+        Name of stage
+    deps : list[str]
+        Names of stages whose outputs are inputs of this stage
+    pipeline : Pipeline()
+        Pipeline stage belongs to
+
+    Methods
+    -------
+    tasks(): dict[str] = (list[str], list[str])
+        Returns inputs and outputs of every ticker
+    stale(): list[str]
+        Returns tickers whose outputs have to be rebuilt
+    run(stale=list[str]): void
+        Rebuilds outputs of stale tickers
+    """
+
+    name = ''
+    deps = []
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+
+    def tasks(self):
+        """Returns inputs and outputs of every ticker
+
+        Returns
+        -------
+        tasks: dict[str] = (list[str], list[str])
+            Input and output locations keyed by ticker, None for outputs
+            shared by all tickers
+        """
+
+        return {}
+
+    def stale(self):
+        """Returns tickers whose outputs have to be rebuilt
+        Outputs are stale if missing or older than an input
+
+        Returns
+        -------
+        stale: list[str]
+            Stale tickers, None if shared outputs are stale
+        """
+
+        tasks = self.tasks()
+        if(self.pipeline.force):
+            return list(tasks.keys())
+        return [key for key, (inputs, outputs) in tasks.items() if is_stale(inputs, outputs)]
+
+    def run(self, stale):
+        """Rebuilds outputs of stale tickers
+
+        Parameters
+        ----------
+        stale: list[str]
+            Stale tickers as returned by stale()
+        """
+
+        pass
+
+
+class ListStage(Stage):
+    """
+    Derived class to represent the Stage fetching Nifty 500 ticker list
+    List is stale once it is older than pipeline's list_age
+    """
+
+    name = 'list'
+    deps = []
+
+    def tasks(self):
+        return {None: ([], [self.pipeline.list_loc])}
+
+    def stale(self):
+        list_loc = self.pipeline.list_loc
+        if(self.pipeline.force or not os.path.exists(list_loc) or
+           time.time() - os.path.getmtime(list_loc) > self.pipeline.list_age.total_seconds()):
+            return [None]
+        return []
+
+    def run(self, stale):
+        self.pipeline.fetcher.read_list(update=True)
+
+
+class MetadataStage(Stage):
+    """
+    Derived class to represent the Stage fetching quotes of every ticker
+    Quote of a ticker is stale once it is older than pipeline's metadata_age
+    """
+
+    name = 'metadata'
+    deps = ['list']
+
+    def tasks(self):
+        tasks = {t: ([self.pipeline.list_loc], [self.pipeline.quote_loc])
+                 for t in self.pipeline.tickers()}
+        tasks[None] = ([self.pipeline.list_loc, self.pipeline.quote_loc],
+                       [self.pipeline.raw_metadata_loc])
+        return tasks
+
+    def stale(self):
+        tickers = self.pipeline.tickers()
+        if(self.pipeline.force):
+            stale = list(tickers)
+        else:
+            stale = QuoteLog(self.pipeline.quote_loc).stale(tickers, self.pipeline.metadata_age)
+
+        inputs, outputs = self.tasks()[None]
+        if(len(stale) or is_stale(inputs, outputs)):
+            stale.append(None)
+        return stale
+
+    def run(self, stale):
+        max_age = None if self.pipeline.force else self.pipeline.metadata_age
+        self.pipeline.fetcher.fetch_metadata(timeout=self.pipeline.timeout,
+                                             workers=self.pipeline.workers,
+                                             max_age=max_age)
+
+
+class OHLCStage(Stage):
+    """
+    Derived class to represent the Stage fetching OHLC data of every ticker
+    OHLC data of a ticker is stale if missing or if it ends before last
+    business day, unless it was already fetched today
+    """
+
+    name = 'ohlc'
+    deps = ['list']
+
+    def tasks(self):
+        storage = self.pipeline.raw_storage
+        return {t: ([self.pipeline.list_loc], [storage.path(t)])
+                for t in self.pipeline.tickers()}
+
+    def stale(self):
+        storage = self.pipeline.raw_storage
+        tickers = self.pipeline.tickers()
+        if(self.pipeline.force):
+            return list(tickers)
+
+        today = pd.Timestamp.today().normalize()
+        if(today.dayofweek > 4):
+            today = today - pd.tseries.offsets.BDay(1)
+        last_bday = today.strftime('%Y-%m-%d')
+        checked = pd.Timestamp.today().strftime('%Y-%m-%d')
+        manifest = Manifest(storage.root, storage.ext, storage)
+
+        stale = []
+        for t in tickers:
+            if not storage.exists(t):
+                stale.append(t)
+                continue
+            entry = manifest.get(t)
+            if(entry is not None and entry.get('checked') == checked):
+                # Fetched today without new rows, eg. holiday or suspended
+                continue
+            last_date = entry['last_date'] if entry is not None else storage.last_date(t)
+            if(last_date is None or last_date < last_bday):
+                stale.append(t)
+        return stale
+
+    def run(self, stale):
+        fetcher = self.pipeline.fetcher
+        missing = [t for t in stale if not self.pipeline.raw_storage.exists(t)]
+        if(self.pipeline.force or len(missing)):
+            fetcher.fetch_data(timeout=self.pipeline.timeout, workers=self.pipeline.workers,
+                               tickers=stale if self.pipeline.force else missing)
+        if not self.pipeline.force and len(missing) < len(stale):
+            fetcher.update_ohlc(timeout=self.pipeline.timeout, workers=self.pipeline.workers)
+
+
+class CleanMetadataStage(Stage):
+    """
+    Derived class to represent the Stage cleaning metadata
+    """
+
+    name = 'clean_metadata'
+    deps = ['list', 'metadata']
+
+    def tasks(self):
+        return {None: ([self.pipeline.list_loc, self.pipeline.raw_metadata_loc],
+                       [self.pipeline.clean_metadata_loc])}
+
+    def run(self, stale):
+        self.pipeline.cleaner.clean_metadata()
+
+
+class CleanOHLCStage(Stage):
+    """
+    Derived class to represent the Stage cleaning OHLC data of every ticker
+    Cleaned data of a ticker is stale if raw file changed since the
+    fingerprint recorded in cleaned data's manifest, or if raw file is gone
+    while other raw files are present
+    """
+
+    name = 'clean_ohlc'
+    deps = ['ohlc']
+
+    def tasks(self):
+        raw, clean = self.pipeline.raw_storage, self.pipeline.clean_storage
+        tickers = sorted(set(self.pipeline.tickers()) | set(raw.names()))
+        return {t: ([raw.path(t)], [clean.path(t)]) for t in tickers}
+
+    def stale(self):
+        raw, clean = self.pipeline.raw_storage, self.pipeline.clean_storage
+        if(self.pipeline.force):
+            return raw.names()
+
+        manifest = Manifest(clean.root, clean.ext, clean)
+        names = raw.names()
+        stale = []
+        for t in names:
+            entry = manifest.get(t)
+            source = entry.get('source') if entry is not None else None
+            fp = fingerprint(raw.path(t))
+            if(source is None or source['size'] != fp['size'] or
+               source['mtime_ns'] != fp['mtime_ns']):
+                stale.append(t)
+        if(len(names)):
+            stale.extend(sorted(set(clean.names()) - set(names)))
+        return stale
+
+    def run(self, stale):
+        self.pipeline.cleaner.clean_ohlc_data(workers=self.pipeline.workers,
+                                              force=self.pipeline.force)
+
+
+class ProcessStage(Stage):
+    """
+    Derived class to represent the Stage processing metrics of every ticker
+    """
+
+    name = 'process'
+    deps = ['clean_metadata', 'clean_ohlc']
+
+    def tasks(self):
+        clean = self.pipeline.clean_storage
+        tickers = sorted(set(self.pipeline.tickers()) | set(clean.names()))
+        tasks = {t: ([clean.path(t)], [clean.path(t).replace('cleaned', 'processed')])
+                 for t in tickers}
+        tasks[None] = ([self.pipeline.clean_metadata_loc],
+                       [self.pipeline.clean_metadata_loc.replace('cleaned', 'processed')])
+        return tasks
+
+    def run(self, stale):
+        processor = self.pipeline.processor()
+        tickers = None if self.pipeline.force else [t for t in stale if t is not None]
+        failed = processor.process_metrics(incremental=not self.pipeline.force,
+                                           workers=self.pipeline.workers, tickers=tickers)
+
+        # Incremental runs leave processed data untouched if cleaned data had
+        # no new rows, processed data is marked as built so it is not stale
+        tasks = self.tasks()
+        for t in stale:
+            if(t is not None and t not in failed):
+                touch(tasks[t][1])
+
+
+class PanelStage(Stage):
+    """
+    Derived class to represent the Stage updating close price panel
+    """
+
+    name = 'panel'
+    deps = ['clean_ohlc']
+
+    def tasks(self):
+        clean = self.pipeline.clean_storage
+        panel_loc = os.path.join('{}.panel'.format(clean.root.rstrip('/')), 'panel.json')
+        return {None: ([clean.path(t) for t in clean.names()], [panel_loc])}
+
+    def run(self, stale):
+        processor = self.pipeline.processor()
+        if(self.pipeline.force and processor.panel.exists()):
+            processor.panel.build(processor.storage)
+        else:
+            processor.update_panel()
+        touch(self.tasks()[None][1])
+
+
+class Pipeline:
+    """
+    Class to represent a DAG of stages of the Nifty 500 data pipeline
+
+    ...
+
+    Attributes
+    ----------
+    stages : dict[str] = Stage()
+        Stages keyed by name, in dependency order
+    workers : int
+        Number of tickers processed at once by every stage
+    timeout : int
+        Pause between fetches sent to provider
+    metadata_age : datetime.timedelta
+        Age after which quotes are fetched again
+    list_age : datetime.timedelta
+        Age after which ticker list is fetched again
+    force : bool
+        Toggle to rebuild every output
+
+    Methods
+    -------
+    processor(): IndexProcessor()
+        Returns IndexProcessor of cleaned data
+    tickers(): list[str]
+        Returns tickers of ticker list
+    order(targets=list[str]): list[str]
+        Returns targets and the stages they depend on, in dependency order
+    plan(targets=list[str]): dict[str] = list[str]
+        Returns stale tickers of every stage, assuming upstream stages run
+    run(targets=list[str], dry_run=bool): dict[str] = str
+        Runs stale stages, returns status of every stage
+    """
+
+    STAGES = [ListStage, MetadataStage, OHLCStage, CleanMetadataStage,
+              CleanOHLCStage, ProcessStage, PanelStage]
+
+    def __init__(self, workers=4, timeout=5, metadata_age=timedelta(hours=12),
+                 list_age=timedelta(days=7), storage='csv', force=False):
+        self.workers = workers
+        self.timeout = timeout
+        self.metadata_age = metadata_age
+        self.list_age = list_age
+        self.storage = storage
+        self.force = force
+
+        self.list_loc = 'data/raw/nifty_500_list.csv'
+        self.quote_loc = 'data/raw/nifty_500_metadata.jsonl'
+        self.raw_metadata_loc = 'data/raw/nifty_500_metadata.csv'
+        self.clean_metadata_loc = 'data/cleaned/Metadata/nifty500.json'
+        self.raw_storage = get_storage(storage, 'data/raw/Nifty500')
+        self.clean_storage = get_storage(storage, 'data/cleaned/OHLC/Nifty500')
+
+        for d in [self.raw_storage.root, self.clean_storage.root]:
+            if not os.path.exists(d):
+                os.makedirs(d)
+
+        self.stages = {s.name: s(self) for s in self.STAGES}
+        self._fetcher = None
+        self._cleaner = None
+
+    @property
+    def fetcher(self):
+        """Nifty500Fetcher, created on first use
+        """
+
+        if(self._fetcher is None):
+            self._fetcher = Nifty500Fetcher(storage=self.storage)
+        return self._fetcher
+
+    @property
+    def cleaner(self):
+        """Nifty500Cleaner, created on first use
+        """
+
+        if(self._cleaner is None):
+            self._cleaner = Nifty500Cleaner(self.storage, self.storage)
+        return self._cleaner
+
+    def processor(self):
+        """Returns IndexProcessor of cleaned data
+        """
+
+        return IndexProcessor(self.clean_storage.root, self.clean_metadata_loc,
+                              self.storage)
+
+    def tickers(self):
+        """Returns tickers of ticker list, empty if list is missing
+        """
+
+        if not os.path.exists(self.list_loc):
+            return []
+        return list(pd.read_csv(self.list_loc)['Symbol'].values)
+
+    def order(self, targets=None):
+        """Returns targets and the stages they depend on, in dependency order
+
+        Parameters
+        ----------
+        targets: list[str] (None)
+            Names of stages to be run, None runs every stage
+
+        Returns
+        -------
+        order: list[str]
+            Names of stages
+        """
+
+        if not targets:
+            return list(self.stages.keys())
+
+        needed = set()
+        def visit(name):
+            if(name not in self.stages):
+                raise ValueError("Unknown stage: {}, expected one of {}".format(
+                    name, list(self.stages.keys())))
+            if(name not in needed):
+                needed.add(name)
+                for dep in self.stages[name].deps:
+                    visit(dep)
+
+        for name in targets:
+            visit(name)
+        return [name for name in self.stages if name in needed]
+
+    def plan(self, targets=None):
+        """Returns stale tickers of every stage, assuming upstream stages run
+        A ticker stale in a stage is stale in the stages depending on it, or
+        their shared outputs are stale if they have no task for the ticker
+
+        Parameters
+        ----------
+        targets: list[str] (None)
+            Names of stages to be run, None runs every stage
+
+        Returns
+        -------
+        plan: dict[str] = list[str]
+            Stale tickers of every stage, None marks stale shared outputs
+        """
+
+        plan = {}
+        for name in self.order(targets):
+            stage = self.stages[name]
+            keys = set(stage.tasks().keys())
+            stale = list(stage.stale())
+            for dep in stage.deps:
+                for key in plan.get(dep, []):
+                    key = key if key in keys or None not in keys else None
+                    if(key in keys and key not in stale):
+                        stale.append(key)
+            plan[name] = stale
+        return plan
+
+    def run(self, targets=None, dry_run=False):
+        """Runs stale stages, returns status of every stage
+        Stages run in dependency order, staleness of a stage is checked after
+        the stages it depends on ran. A stage whose dependency failed is not run
+
+        Parameters
+        ----------
+        targets: list[str] (None)
+            Names of stages to be run, None runs every stage
+        dry_run: bool (False)
+            Toggle to only print what would be rebuilt
+
+        Returns
+        -------
+        status: dict[str] = str
+            'ran', 'skipped', 'failed' or 'blocked' for every stage, 'stale'
+            in dry run
+        """
+
+        if(dry_run):
+            plan = self.plan(targets)
+            for name, stale in plan.items():
+                print("{}: {}".format(name, describe(stale)))
+            return {name: 'stale' if len(stale) else 'skipped' for name, stale in plan.items()}
+
+        status = {}
+        for name in self.order(targets):
+            stage = self.stages[name]
+            if any(status.get(dep) in ('failed', 'blocked') for dep in stage.deps):
+                status[name] = 'blocked'
+                print("\nStage {}: blocked by failed dependency".format(name))
+                continue
+
+            start = time.perf_counter()
+            try:
+                stale = stage.stale()
+                if(len(stale) == 0):
+                    status[name] = 'skipped'
+                    print("\nStage {}: up-to-date".format(name))
+                    continue
+
+                print("\nStage {}: {}".format(name, describe(stale)))
+                stage.run(stale)
+                status[name] = 'ran'
+            except Exception as e:
+                status[name] = 'failed'
+                print("Exception {} occured in stage: {}".format(e, name))
+
+            print("Stage {} {} in {}s".format(name, status[name],
+                                              round(time.perf_counter() - start, 2)))
+
+        return status
+
+
+def describe(stale, limit=10):
+    """Returns printable summary of stale tickers
+    """
+
+    if(len(stale) == 0):
+        return "up-to-date"
+
+    tickers = [t for t in stale if t is not None]
+    text = []
+    if(len(tickers)):
+        text.append("{} stale tickers [{}{}]".format(len(tickers), ', '.join(tickers[:limit]),
+                                                     ', ...' if len(tickers) > limit else ''))
+    if(None in stale):
+        text.append("shared outputs stale")
+    return ", ".join(text)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuilds stale outputs of Nifty 500 data pipeline")
+    parser.add_argument('stages', nargs='*', help="Stages to be run with their dependencies, "
+                        "one of {}".format([s.name for s in Pipeline.STAGES]))
+    parser.add_argument('--dry-run', action='store_true', help="Only print what would be rebuilt")
+    parser.add_argument('--force', action='store_true', help="Rebuild every output")
+    parser.add_argument('--workers', type=int, default=4, help="Tickers processed at once")
+    parser.add_argument('--timeout', type=float, default=5, help="Pause between fetches (seconds)")
+    parser.add_argument('--metadata-age', type=float, default=12, help="Refetch quotes older than (hours)")
+    parser.add_argument('--list-age', type=float, default=168, help="Refetch ticker list older than (hours)")
+    parser.add_argument('--storage', default='csv', help="Storage format of OHLC data")
+    args = parser.parse_args()
+
+    pipeline = Pipeline(args.workers, args.timeout, timedelta(hours=args.metadata_age),
+                        timedelta(hours=args.list_age), args.storage, args.force)
+
+    start = time.perf_counter()
+    status = pipeline.run(args.stages, args.dry_run)
+    print("\nFinished in {}s at {}: {}".format(round(time.perf_counter() - start, 2),
+                                               datetime.now().isoformat(timespec='seconds'),
+                                               status))
+    sys.exit(1 if 'failed' in status.values() or 'blocked' in status.values() else 0)
@@ -0,0 +1,523 @@
+"""Processor module
+
+This script contains processor classes for metadata and OHLC data.
+
+It contains following classes
+    * Processor: Base Processor Class
+    * StockProcessor: Derived Cleaner Class for processing data of 
+                     individual stocks
+    * IndexProcessor: Derived Cleaner Class for processing data of 
+                     all stocks present in index
+"""
+
+import os
+import json
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from ds import Portfolio, Stock
+from utils import write_json
+from metastore import MetadataStore
+from storage import get_storage, split_loc, read_frame, write_frame
+from indicators import compute_indicators, compute_indicators_panel, lookback
+from panel import ClosePanel
+
+
+class Processor:
+    """
+    Base class to represent a Processor
+
+    ...
+
+    Attributes
+    ----------
+    ohlc_location : str
+        Location of OHLC Cleaned data
+    metadata_loc : str
+        Location of Cleaned Metadata
+    
+    Methods
+    -------
+    process_metrics(): void
+        Calculates required metrics and stores them in CSV format
+    """
+
+    def __init__(self, ohlc_loc=None, metadata_loc=None):
+        self.ohlc_location = ohlc_loc
+        self.metadata_loc = metadata_loc
+
+    def process_metrics(self):
+        """Calculates required metrics and stores them in CSV format
+        """
+
+        pass
+
+
+class StockProcessor(Processor):
+    """
+    Derived class to represent a Stock Processor
+
+    ...
+
+    Attributes
+    ----------
+    ohlc_location : str
+        Location of OHLC Cleaned data
+    metadata_loc : str
+        Location of Cleaned Metadata
+    metadata : dict
+        Stock's metadata record, looked up in metadata_loc if not given
+    stock: Stock()
+        Stock Object
+    
+    Methods
+    -------
+    process_metrics(incremental=bool, verify=bool): void
+        Calculates required metrics and stores them in CSV format for OHLC data
+        Updates location and availability data for OHLC in metadata
+    store_metrics(ohlc_data=pd.DataFrame, indicators=dict, params=dict): void
+        Stores OHLC data along with its calculated metrics as processed data
+    set_available(available=bool): void
+        Updates location and availability data for OHLC in metadata
+    state_loc(): str
+        Returns location of stock's incremental state
+    """
+
+    def __init__(self, symbol=None, ohlc_loc=None, metadata_loc=None, metadata=None):
+        super().__init__()
+        self.stock = Stock()
+        if(metadata is None):
+            metadata = MetadataStore.load(metadata_loc).get(symbol)
+        self.stock.load(metadata)
+    
+    def process_metrics(self, upper_margin=0.05, lower_margin=0.05, bband_ma=20,
+                        bband_std=2, incremental=False, verify=False):
+        """Calculates required metrics and stores them in CSV format for OHLC 
+           data. 
+           Updates location and availability data for OHLC in metadata
+
+        Parameters
+        ----------
+        incremental: bool (False)
+            Toggle to calculate metrics only for rows dated after the last
+            processed row, using the close prices kept in the stock's state.
+            Falls back to full calculation if there is no valid state
+        verify: bool (False)
+            Toggle to check incrementally calculated rows against a full
+            calculation, full calculation is stored if they differ
+        """
+
+        params = {'upper_margin': upper_margin, 'lower_margin': lower_margin,
+                  'bband_ma': bband_ma, 'bband_std': bband_std}
+        proc_loc = self.stock.ohlc.replace('cleaned', 'processed')
+
+        try:
+            done = False
+            if(incremental):
+                done = self._process_new_rows(proc_loc, params, verify)
+
+            if not done:
+                ohlc_data = read_frame(self.stock.ohlc)
+                self.store_metrics(ohlc_data, compute_indicators(ohlc_data['Close'], **params),
+                                   params)
+            else:
+                self.set_available(True)
+
+        except FileNotFoundError as e:            
+            self.set_available(False)
+            print("File not present: {}".format(self.stock.ohlc))
+
+    def store_metrics(self, ohlc_data, indicators, params):
+        """Stores OHLC data along with its calculated metrics as processed data
+        Updates location and availability data for OHLC in metadata
+
+        Parameters
+        ----------
+        ohlc_data: pd.DataFrame
+            Cleaned OHLC data
+        indicators: dict[str] = array-like
+            Metrics of every row of ohlc_data, as returned by compute_indicators()
+        params: dict
+            Parameters metrics were calculated with
+        """
+
+        for key, value in indicators.items():
+            ohlc_data[key] = value
+        write_frame(ohlc_data.round(2), self.stock.ohlc.replace('cleaned', 'processed'))
+
+        last_date = str(ohlc_data.index[-1])[:10] if len(ohlc_data) else None
+        self._write_state(ohlc_data['Close'].values, last_date, params)
+        self.set_available(True)
+
+    def set_available(self, available):
+        """Updates location and availability data for OHLC in metadata
+
+        Parameters
+        ----------
+        available: bool
+            Toggle marking processed OHLC data as present
+        """
+
+        if(available):
+            self.stock.metadata['OHLC Data Available'] = True
+            mp = self.stock.metadata['OHLC Data Location'].replace('cleaned', 'processed')
+            self.stock.metadata['OHLC Data Location'] = mp
+        else:
+            self.stock.metadata['OHLC Data Available'] = False
+            self.stock.metadata['OHLC Data Location'] = None
+
+    def state_loc(self):
+        """Returns location of stock's incremental state
+        State is stored as <processed OHLC directory>.state/<ticker>.json
+        """
+
+        proc_storage, name = split_loc(self.stock.ohlc.replace('cleaned', 'processed'))
+        return '{}.state/{}.json'.format(proc_storage.root.rstrip('/'), name)
+
+    def _write_state(self, close, last_date, params):
+        """Stores last closes needed to continue calculations after last_date
+        """
+
+        state_loc = self.state_loc()
+        if not os.path.exists(os.path.dirname(state_loc)):
+            os.makedirs(os.path.dirname(state_loc), exist_ok=True)
+
+        state = {
+            'last_date': last_date,
+            'params': params,
+            'tail': [float(c) for c in close[-lookback(params['bband_ma']):]]
+        }
+        tmp_loc = '{}.tmp'.format(state_loc)
+        with open(tmp_loc, 'w') as outfile:
+            json.dump(state, outfile)
+        os.replace(tmp_loc, state_loc)
+
+    def _process_new_rows(self, proc_loc, params, verify=False):
+        """Calculates metrics of rows dated after the last processed row and
+        appends them to processed data. Returns False if stock's state is
+        missing or does not match processed data
+        """
+
+        state_loc = self.state_loc()
+        if not (os.path.exists(state_loc) and os.path.exists(proc_loc)):
+            return False
+
+        with open(state_loc, 'r') as infile:
+            state = json.load(infile)
+
+        proc_storage, name = split_loc(proc_loc)
+        if(state['params'] != params or state['last_date'] is None or
+           proc_storage.last_date(name) != state['last_date']):
+            return False
+
+        clean_storage, _ = split_loc(self.stock.ohlc)
+        new_rows = clean_storage.read_after(name, state['last_date'])
+        if(new_rows.shape[0] == 0):
+            return True
+
+        num_new = new_rows.shape[0]
+        close = pd.Series(state['tail'] + list(new_rows['Close'].values))
+        for key, value in compute_indicators(close, **params).items():
+            new_rows[key] = value.values[-num_new:]
+
+        if(verify):
+            ohlc_data = read_frame(self.stock.ohlc)
+            full = compute_indicators(ohlc_data['Close'], **params)
+            for key, value in full.items():
+                expected = value.values[-num_new:]
+                if not np.allclose(new_rows[key].values, expected, atol=1e-6, equal_nan=True):
+                    print("Incremental {} of {} differs from full calculation".format(
+                        key, self.stock.ticker))
+                    return False
+
+        proc_storage.append(new_rows.round(2), name)
+        self._write_state(close.values, str(new_rows.index[-1])[:10], params)
+        return True
+
+
+def _process_shard(shard, metadata_loc, incremental=False, verify=False, tickers=None):
+    """Processes metrics of a shard of stocks, run in a worker process
+    Returns (position, metadata delta, error) of every stock, an exception
+    only fails its own stock. Stocks missing from tickers are not processed,
+    only their availability is updated
+    """
+
+    results = []
+    for pos, entry in shard:
+        metadata = dict(entry)
+        error = None
+        try:
+            sp = StockProcessor(entry['Ticker'], entry['OHLC Data Location'],
+                                metadata_loc, metadata)
+            if(tickers is None or entry['Ticker'] in tickers):
+                sp.process_metrics(incremental=incremental, verify=verify)
+            else:
+                sp.set_available(os.path.exists(sp.stock.ohlc.replace('cleaned', 'processed')))
+        except Exception as e:
+            metadata['OHLC Data Available'] = False
+            metadata['OHLC Data Location'] = None
+            error = repr(e)
+
+        delta = {k: v for k, v in metadata.items() if k not in entry or entry[k] != v}
+        results.append((pos, delta, error))
+    return results
+
+
+class IndexProcessor(Processor):
+    """
+    Derived class to represent a Index Processor
+
+    ...
+
+    Attributes
+    ----------
+    ohlc_location : str
+        Location of OHLC Cleaned data
+    metadata_loc : str
+        Location of Cleaned Metadata
+    metadata_store: MetadataStore()
+        Indexed metadata of all the stocks
+    metadata_json: list[dict]
+        JSON containing metadata of all the stocks
+    proc_metadata_loc: str
+        Location of Processed metadata to be stored
+    close_matrix: pd.DataFrame
+        Matrix containing close price of all the stocks in index, over time
+    storage: Storage()
+        Storage backend of OHLC Cleaned data
+    panel: ClosePanel()
+        Memory-mapped close price panel of OHLC Cleaned data
+            
+    Methods
+    -------
+    process_metrics(incremental=bool, verify=bool, engine=str, chunk_size=int,
+                    workers=int, tickers=list[str]): list[str]
+        Processes metrics for each stock individually
+    update_panel(): int
+        Builds or incrementally updates close price panel
+    process_close(time_period=int, dropna=bool): void
+        Processes close price matrix out of close price panel
+    """
+
+    def __init__(self, ohlc_loc=None, metadata_loc=None, storage='csv'):
+        super().__init__()
+        self.ohlc_location = ohlc_loc
+        self.storage = get_storage(storage, ohlc_loc)
+        self.panel = ClosePanel('{}.panel'.format(ohlc_loc.rstrip('/')))
+        self.metadata_store = MetadataStore.load(metadata_loc)
+        self.metadata_json = self.metadata_store.records
+        self.metadata_loc = metadata_loc
+        self.proc_metadata_loc = metadata_loc.replace('cleaned', 'processed')
+        self.close_matrix = pd.DataFrame
+        # self.returns_matrix = pd.DataFrame
+        # self.cov_matrix = pd.DataFrame
+        
+        if not os.path.exists(self.ohlc_location.replace('cleaned', 'processed')):
+                os.makedirs(self.ohlc_location.replace('cleaned', 'processed'))
+        if not os.path.exists(os.path.dirname(self.proc_metadata_loc)):
+                os.makedirs(os.path.dirname(self.proc_metadata_loc))
+
+    
+    def process_metrics(self, incremental=False, verify=False, engine='stock',
+                        chunk_size=100, workers=1, tickers=None):
+        """Processes metrics for each stock individually
+
+        Parameters
+        ----------
+        incremental: bool (False)
+            Toggle to process only rows added since last run
+        verify: bool (False)
+            Toggle to check incremental rows against a full calculation
+        engine: str ('stock')
+            'stock' calculates metrics one stock at a time, 'panel' calculates
+            metrics of chunk_size stocks at once with compute_indicators_panel().
+            incremental and verify are only used by 'stock' engine
+        chunk_size: int (100)
+            Number of stocks held in memory at once by 'panel' engine
+        workers: int (1)
+            Number of worker processes used by 'stock' engine. Stocks are
+            sharded across workers, which return metadata changes so
+            processed metadata is written once, in metadata order
+        tickers: list[str] (None)
+            Stocks to be processed by 'stock' engine, metadata of other stocks
+            is only marked with availability of their processed data. None
+            processes every stock
+
+        Returns
+        -------
+        failed: list[str]
+            Stocks whose metrics failed
+        """
+
+        if(engine == 'panel'):
+            new_meta_json, failed = self._process_metrics_panel(chunk_size)
+        else:
+            new_meta_json, failed = self._process_metrics_stock(incremental, verify,
+                                                                workers, tickers)
+        write_json(new_meta_json, self.proc_metadata_loc)
+        return failed
+
+    def _process_metrics_stock(self, incremental=False, verify=False, workers=1,
+                               tickers=None):
+        """Processes metrics one stock at a time, sharded across workers
+        processes, returns processed metadata and failed stocks
+        """
+
+        tickers = None if tickers is None else set(tickers)
+        entries = list(enumerate(self.metadata_json))
+        num_shards = min(len(entries), max(1, workers)*4)
+        shards = [entries[i::num_shards] for i in range(num_shards)]
+
+        deltas = {}
+        failed = []
+
+        def collect(results):
+            for pos, delta, error in results:
+                deltas[pos] = delta
+                if(error is not None):
+                    failed.append(self.metadata_json[pos].get('Ticker'))
+                    print("Exception {} occured for ticker: {}".format(
+                        error, self.metadata_json[pos].get('Ticker')))
+            progress_perc = round(len(deltas)/len(entries)*100, 2)
+            print("Progress: {}% Last ticker: {}".format(
+                progress_perc, self.metadata_json[results[-1][0]].get('Ticker')))
+
+        if(workers <= 1):
+            for shard in shards:
+                collect(_process_shard(shard, self.metadata_loc, incremental, verify,
+                                       tickers))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(_process_shard, shard, self.metadata_loc,
+                                           incremental, verify, tickers) for shard in shards]
+                for future in as_completed(futures):
+                    collect(future.result())
+
+        if(len(failed)):
+            print("Metrics failed for {} stocks: {}".format(len(failed), failed))
+
+        return [dict(entry, **deltas[pos]) for pos, entry in entries], failed
+
+    def _process_metrics_panel(self, chunk_size=100, **params):
+        """Processes metrics of chunk_size stocks at once, returns processed
+        metadata and failed stocks. An exception only fails its own stock
+        """
+
+        params = dict({'upper_margin': 0.05, 'lower_margin': 0.05, 'bband_ma': 20,
+                       'bband_std': 2}, **params)
+        new_meta_json = []
+        failed = []
+
+        for i in range(0, len(self.metadata_json), chunk_size):
+            processors = []
+            frames = {}
+            closes = {}
+            for entry in self.metadata_json[i:i + chunk_size]:
+                metadata = dict(entry)
+                try:
+                    sp = StockProcessor(entry['Ticker'], 
+                                        entry['OHLC Data Location'], 
+                                        self.metadata_loc, metadata)
+                    frame = read_frame(sp.stock.ohlc)
+                    closes[sp.stock.ticker] = frame['Close'].values.astype('float64')
+                    frames[sp.stock.ticker] = frame
+                except FileNotFoundError as e:
+                    sp = None
+                    metadata['OHLC Data Available'] = False
+                    metadata['OHLC Data Location'] = None
+                    print("File not present: {}".format(entry.get('OHLC Data Location')))
+                except Exception as e:
+                    sp = None
+                    metadata['OHLC Data Available'] = False
+                    metadata['OHLC Data Location'] = None
+                    failed.append(entry.get('Ticker'))
+                    print("Exception {} occured for ticker: {}".format(e, entry.get('Ticker')))
+                processors.append((sp, metadata))
+
+            indicators = compute_indicators_panel(closes, **params)
+
+            for sp, metadata in processors:
+                if(sp is not None):
+                    try:
+                        sp.store_metrics(frames[sp.stock.ticker], indicators[sp.stock.ticker],
+                                         params)
+                    except Exception as e:
+                        sp.set_available(False)
+                        failed.append(sp.stock.ticker)
+                        print("Exception {} occured for ticker: {}".format(e, sp.stock.ticker))
+                new_meta_json.append(metadata)
+
+        if(len(failed)):
+            print("Metrics failed for {} stocks: {}".format(len(failed), failed))
+
+        return new_meta_json, failed
+        
+    def update_panel(self):
+        """Builds or incrementally updates close price panel
+        Only tickers whose file changed since the panel read it are read
+
+        Returns
+        -------
+        added: int
+            Number of dates added to panel
+        """
+
+        added = self.panel.update(self.storage)
+        print("Close panel updated with {} dates, last date: {}".format(
+            added, self.panel.dates[-1] if self.panel.rows else None))
+        return added
+
+    def process_close(self, time_period=250, dropna=True):
+        """Processes close price matrix out of close price panel
+        Rows are aligned on the union of trading dates, days without data
+        are NaN. close_matrix shares the panel's memory unless columns are
+        dropped
+
+        Parameters
+        ----------
+        time_period: int
+            Number of rows in close_matrix
+        dropna: bool (True)
+            Toggle to drop tickers with a missing close price in time period,
+            as optimizers do not accept NaN
+        """
+
+        if not self.panel.exists():
+            self.update_panel()
+
+        self.close_matrix = self.panel.frame(time_period)
+        if(dropna):
+            available = self.close_matrix.notna().all().values
+            if not available.all():
+                self.close_matrix = self.close_matrix.loc[:, available]
+    
+    # def process_close_returns(self, time_period=250):
+    #     self.returns_matrix = self.close_matrix.pct_change(time_period)
+
+    # def process_cov(self):
+    #     if(self.close_matrix.shape[0] != 0):
+    #         self.cov_matrix = self.close_matrix.cov()
+
+    
+class PortfolioProcessor(Processor):
+    """
+    Derived class to represent a Portfolio Processor
+
+    ...
+
+    Attributes
+    ----------
+    ohlc_location : str
+        Location of OHLC Cleaned data
+    metadata_loc : str
+        Location of Cleaned Metadata
+            
+    Methods
+    -------
+    """
+
+    def __init__(self):
+        super().__init__()
+        pass
\ No newline at end of file
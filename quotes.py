@@ -0,0 +1,141 @@
+"""Quotes module
+
+This script contains the append-only quote log used to stream metadata
+quotes to disk as they are fetched.
+
+It contains following classes
+    * QuoteLog: Append-only JSON lines log of fetched quotes
+"""
+
+import os
+import json
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+
+class QuoteLog:
+    """
+    Class to represent an append-only JSON lines log of fetched quotes
+
+    Every line is a JSON object {"ticker": str, "fetchedAt": str, "quote": dict},
+    later lines supersede earlier lines of the same ticker.
+
+    ...
+
+    Attributes
+    ----------
+    log_loc : str
+        Location of JSON lines file
+
+    Methods
+    -------
+    append(ticker=str, quote=dict): void
+        Appends quote of ticker to log
+    latest(): dict[str] = dict
+        Returns latest log entry of every ticker
+    stale(tickers=list[str], max_age=datetime.timedelta): list[str]
+        Returns tickers whose latest quote is missing or older than max_age
+    compact(): void
+        Rewrites log keeping only latest entry of every ticker
+    to_csv(csv_loc=str, tickers=list[str]): void
+        Writes latest quotes as CSV
+    """
+
+    def __init__(self, log_loc):
+        self.log_loc = log_loc
+        self._lock = threading.Lock()
+
+    def append(self, ticker, quote):
+        """Appends quote of ticker to log
+
+        Parameters
+        ----------
+        ticker: str
+            Ticker quote belongs to
+        quote: dict
+            Quote returned by provider
+        """
+
+        line = json.dumps({'ticker': ticker,
+                           'fetchedAt': datetime.now().isoformat(timespec='seconds'),
+                           'quote': quote}, default=str)
+        with self._lock:
+            with open(self.log_loc, 'a') as outfile:
+                outfile.write(line + '\n')
+                outfile.flush()
+
+    def latest(self):
+        """Returns latest log entry of every ticker
+        Partially written lines (eg. after a crash) are skipped
+
+        Returns
+        -------
+        entries: dict[str] = dict
+            Latest entry of every ticker
+        """
+
+        entries = {}
+        if not os.path.exists(self.log_loc):
+            return entries
+
+        with open(self.log_loc, 'r') as infile:
+            for line in infile:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                entries[entry['ticker']] = entry
+        return entries
+
+    def stale(self, tickers, max_age):
+        """Returns tickers whose latest quote is missing or older than max_age
+
+        Parameters
+        ----------
+        tickers: list[str]
+            Tickers to be checked
+        max_age: datetime.timedelta
+            Maximum age of a fresh quote
+
+        Returns
+        -------
+        stale: list[str]
+            Tickers to be refreshed
+        """
+
+        entries = self.latest()
+        oldest = datetime.now() - max_age
+        return [t for t in tickers if t not in entries or
+                datetime.fromisoformat(entries[t]['fetchedAt']) < oldest]
+
+    def compact(self):
+        """Rewrites log keeping only latest entry of every ticker
+        """
+
+        with self._lock:
+            entries = self.latest()
+            tmp_loc = '{}.tmp'.format(self.log_loc)
+            with open(tmp_loc, 'w') as outfile:
+                for entry in entries.values():
+                    outfile.write(json.dumps(entry, default=str) + '\n')
+            os.replace(tmp_loc, self.log_loc)
+
+    def to_csv(self, csv_loc, tickers=None):
+        """Writes latest quotes as CSV
+
+        Parameters
+        ----------
+        csv_loc: str
+            Location of CSV file to be created
+        tickers: list[str] (None)
+            Tickers to be written, None writes all tickers in log
+        """
+
+        entries = self.latest()
+        if(tickers is None):
+            tickers = list(entries.keys())
+
+        metadata = [entries[t]['quote'] for t in tickers if t in entries]
+        pd.DataFrame.from_dict(metadata, orient='columns').to_csv(csv_loc)
@@ -0,0 +1,261 @@
+"""Riskcache module
+
+This script contains the cache of expected returns and covariance estimates
+shared by optimizers, so every estimate of a close price matrix is
+calculated once.
+
+It contains following classes
+    * RiskModelCache: LRU cache of risk model estimates, backed by disk
+
+It contains following functions
+    * matrix_key: Returns hash of tickers, date range and close prices
+    * get_cache: Returns process-wide RiskModelCache
+"""
+
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from pypfopt import risk_models, expected_returns
+
+
+def _ledoit_wolf(prices, **params):
+    return risk_models.CovarianceShrinkage(prices, **params).ledoit_wolf()
+
+
+def _oracle_approximating(prices, **params):
+    return risk_models.CovarianceShrinkage(prices, **params).oracle_approximating()
+
+
+ESTIMATORS = {
+    'capm_return': expected_returns.capm_return,
+    'mean_historical_return': expected_returns.mean_historical_return,
+    'ema_historical_return': expected_returns.ema_historical_return,
+    'returns_from_prices': expected_returns.returns_from_prices,
+    'sample_cov': risk_models.sample_cov,
+    'semicovariance': risk_models.semicovariance,
+    'exp_cov': risk_models.exp_cov,
+    'ledoit_wolf': _ledoit_wolf,
+    'oracle_approximating': _oracle_approximating,
+}
+
+
+def matrix_key(close_matrix):
+    """Returns hash of tickers, date range and close prices
+
+    Parameters
+    ----------
+    close_matrix: pd.DataFrame
+        Close prices indexed by date, with a column per ticker
+
+    Returns
+    -------
+    key: str
+        Hex digest identifying close_matrix
+    """
+
+    h = hashlib.blake2b(digest_size=16)
+    index = close_matrix.index
+    h.update(json.dumps([list(map(str, close_matrix.columns)),
+                         str(index[0]) if len(index) else None,
+                         str(index[-1]) if len(index) else None,
+                         list(close_matrix.shape)]).encode())
+    h.update(np.ascontiguousarray(close_matrix.values, dtype='float64').tobytes())
+    return h.hexdigest()
+
+
+class RiskModelCache:
+    """
+    Class to represent an LRU cache of risk model estimates, backed by disk
+
+    Estimates are keyed by a hash of close price matrix (tickers, date range,
+    prices), estimator and its parameters. Entries evicted from memory stay
+    on disk, so other processes reuse them, at most max_files estimates are
+    kept on disk and the least recently used are removed first.
+
+    ...
+
+    Attributes
+    ----------
+    cache_dir : str
+        Location of directory storing estimates, None keeps them in memory only
+    max_entries : int
+        Number of estimates kept in memory
+    max_files : int
+        Number of estimates kept on disk
+    hits : int
+        Number of estimates served from memory or disk
+    misses : int
+        Number of estimates calculated
+
+    Methods
+    -------
+    key(close_matrix=pd.DataFrame, estimator=str, params=dict): str
+        Returns cache key of an estimate
+    get(close_matrix=pd.DataFrame, estimator=str, **params): pd.Series or pd.DataFrame
+        Returns estimate, calculating it only if not cached
+    clear(): void
+        Removes estimates from memory and disk
+    """
+
+    def __init__(self, cache_dir=None, max_entries=32, max_files=256):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_files = max_files
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        if(cache_dir is not None and not os.path.exists(cache_dir)):
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, close_matrix, estimator, params):
+        """Returns cache key of an estimate
+        close_matrix is hashed on every call, as it may share memory with a
+        close panel updated in place
+        """
+
+        h = hashlib.blake2b(digest_size=16)
+        h.update(json.dumps([matrix_key(close_matrix), estimator, params], sort_keys=True,
+                            default=str).encode())
+        return h.hexdigest()
+
+    def get(self, close_matrix, estimator, **params):
+        """Returns estimate, calculating it only if not cached
+
+        Parameters
+        ----------
+        close_matrix: pd.DataFrame
+            Close prices indexed by date, with a column per ticker
+        estimator: str
+            Name of estimator in ESTIMATORS
+        params: dict
+            Parameters passed to estimator
+
+        Returns
+        -------
+        estimate: pd.Series or pd.DataFrame
+            Copy of estimate
+        """
+
+        if(estimator not in ESTIMATORS):
+            raise ValueError("Unknown estimator: {}, expected one of {}".format(
+                estimator, list(ESTIMATORS.keys())))
+
+        key = self.key(close_matrix, estimator, params)
+        with self._lock:
+            estimate = self._entries.get(key)
+            if(estimate is not None):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return estimate.copy()
+
+        estimate = self._read(key)
+        if(estimate is not None):
+            self.hits += 1
+        else:
+            estimate = ESTIMATORS[estimator](close_matrix, **params)
+            self.misses += 1
+            self._write(key, estimate)
+
+        with self._lock:
+            self._entries[key] = estimate
+            self._entries.move_to_end(key)
+            while(len(self._entries) > self.max_entries):
+                self._entries.popitem(last=False)
+        return estimate.copy()
+
+    def clear(self):
+        """Removes estimates from memory and disk
+        """
+
+        with self._lock:
+            self._entries.clear()
+            if(self.cache_dir is not None):
+                for f in os.listdir(self.cache_dir):
+                    if f.endswith('.pkl'):
+                        os.remove(os.path.join(self.cache_dir, f))
+
+    def _read(self, key):
+        """Reads estimate from disk, None if missing or unreadable
+        """
+
+        if(self.cache_dir is None):
+            return None
+
+        cache_loc = os.path.join(self.cache_dir, '{}.pkl'.format(key))
+        if not os.path.exists(cache_loc):
+            return None
+        try:
+            estimate = pd.read_pickle(cache_loc)
+            os.utime(cache_loc)
+            return estimate
+        except Exception as e:
+            print("Exception {} occured reading cached estimate: {}".format(e, cache_loc))
+            return None
+
+    def _write(self, key, estimate):
+        """Atomically writes estimate to disk, then removes least recently
+        used estimates beyond max_files
+        """
+
+        if(self.cache_dir is None):
+            return
+
+        cache_loc = os.path.join(self.cache_dir, '{}.pkl'.format(key))
+        tmp_loc = '{}.{}.tmp'.format(cache_loc, os.getpid())
+        pd.to_pickle(estimate, tmp_loc)
+        os.replace(tmp_loc, cache_loc)
+        self._evict()
+
+    def _evict(self):
+        """Removes least recently used estimates on disk beyond max_files,
+        estimates read or written last have the latest mtime
+        """
+
+        files = []
+        for f in os.listdir(self.cache_dir):
+            if f.endswith('.pkl'):
+                try:
+                    files.append((os.stat(os.path.join(self.cache_dir, f)).st_mtime_ns, f))
+                except FileNotFoundError:
+                    continue
+
+        files.sort()
+        for _, f in files[:max(0, len(files) - self.max_files)]:
+            try:
+                os.remove(os.path.join(self.cache_dir, f))
+            except FileNotFoundError:
+                pass
+
+
+_cache = None
+
+
+def get_cache(cache_dir='data/processed/RiskModels', max_entries=32, max_files=256):
+    """Returns process-wide RiskModelCache, created on first call
+
+    Parameters
+    ----------
+    cache_dir: str ('data/processed/RiskModels')
+        Location of directory storing estimates
+    max_entries: int (32)
+        Number of estimates kept in memory
+    max_files: int (256)
+        Number of estimates kept on disk
+
+    Returns
+    -------
+    cache: RiskModelCache()
+        Shared cache
+    """
+
+    global _cache
+    if(_cache is None):
+        _cache = RiskModelCache(cache_dir, max_entries, max_files)
+    return _cache
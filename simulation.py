@@ -0,0 +1,335 @@
+"""Simulation module
+
+This script contains the walk-forward backtester, which evaluates an
+optimizer strategy over time on the close price panel. Portfolio is
+rebalanced on a schedule using only prices known at the rebalance date,
+holdings drift with prices between rebalances.
+
+    python simulation.py [--strategy eff] [--objective max_sharpe] [--rebalance M]
+
+Profit and loss between two rebalances is calculated at once for the whole
+segment with NumPy, covariance estimates are warm-started from the previous
+rebalance with OnlineCovariance instead of being recalculated over the full
+lookback window.
+
+It contains following classes
+    * Backtest: Walk-forward backtest of a strategy and objective
+"""
+
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from batch import STRATEGIES, solve
+from riskcache import ESTIMATORS
+from onlinecov import OnlineCovariance
+
+
+class Backtest:
+    """
+    Class to represent a walk-forward backtest of a strategy and objective
+
+    Weights are solved at the close of every rebalance date from the last
+    lookback close prices of tickers without missing prices, and held until
+    the next rebalance. Equity starts at 1.0 on the first rebalance date.
+
+    ...
+
+    Attributes
+    ----------
+    close_matrix : pd.DataFrame
+        Close prices indexed by date, with a column per ticker
+    strategy : str
+        Strategy: 'eff', 'cla' or 'hrp'
+    objective : str
+        Objective: 'max_sharpe' or 'min_volatility', None for 'hrp'
+    lookback : int
+        Number of close prices estimates are calculated from
+    rebalance : str or int
+        Pandas period alias ('W', 'M', 'Q') rebalancing on first trading day
+        of every period, or number of trading days between rebalances
+    cost : float
+        Transaction cost per unit of value traded
+    estimates : dict[str] = str
+        Estimator of every input, as in batch.STRATEGIES
+    warm_start : bool
+        Toggle to update covariance from previous rebalance instead of
+        recalculating it
+    frequency : int
+        Number of trading days in a year
+    risk_free_rate : float
+        Annual risk-free rate used in Sharpe ratio
+    equity : pd.Series
+        Portfolio value by date
+    drawdown : pd.Series
+        Fall of equity from its running maximum by date
+    weights : pd.DataFrame
+        Weights solved on every rebalance date, with a column per ticker
+    turnover : pd.Series
+        One-way turnover (half of total absolute weight change) by rebalance
+        date
+    errors : dict[str] = str
+        Errors of rebalances that failed, previous weights are kept
+    statistics : dict
+        Return, volatility, Sharpe ratio, drawdown and turnover statistics
+    timings : dict[str] = float
+        Seconds spent estimating, solving and calculating profit and loss
+
+    Methods
+    -------
+    schedule(): np.ndarray
+        Returns row positions of rebalance dates
+    inputs(t=int): dict
+        Returns estimates of lookback window ending on row t
+    run(): dict
+        Runs backtest, returns statistics
+    """
+
+    WARM_ESTIMATORS = {
+        'sample_cov': OnlineCovariance.cov,
+        'ledoit_wolf': OnlineCovariance.ledoit_wolf,
+    }
+
+    def __init__(self, close_matrix, strategy='eff', objective='max_sharpe', lookback=250,
+                 rebalance='M', cost=0.0, estimates=None, warm_start=True, frequency=252,
+                 risk_free_rate=0.02):
+        if(strategy == 'hrp'):
+            objective = None
+        if(estimates is None):
+            estimates = STRATEGIES.get((strategy, objective))
+            if(estimates is None):
+                raise ValueError("Unknown strategy and objective: {}, expected one of {}".format(
+                    (strategy, objective), list(STRATEGIES.keys())))
+
+        self.close_matrix = close_matrix
+        self.strategy = strategy
+        self.objective = objective
+        self.lookback = lookback
+        self.rebalance = rebalance
+        self.cost = cost
+        self.estimates = dict(estimates)
+        self.warm_start = warm_start
+        self.frequency = frequency
+        self.risk_free_rate = risk_free_rate
+
+        self.engine = None
+        self.rebuilds = 0
+        self._engine_t = None
+
+        self.equity = pd.Series(dtype='float64')
+        self.drawdown = pd.Series(dtype='float64')
+        self.weights = pd.DataFrame()
+        self.turnover = pd.Series(dtype='float64')
+        self.errors = {}
+        self.statistics = {}
+        self.timings = {'estimate': 0.0, 'solve': 0.0, 'pnl': 0.0}
+
+    def schedule(self):
+        """Returns row positions of rebalance dates
+        First rebalance is the first scheduled date with lookback rows before
+        it (inclusive)
+
+        Returns
+        -------
+        points: np.ndarray
+            Increasing row positions in close_matrix
+        """
+
+        rows = self.close_matrix.shape[0]
+        first = self.lookback - 1
+        if isinstance(self.rebalance, (int, np.integer)):
+            return np.arange(first, rows, self.rebalance)
+
+        periods = self.close_matrix.index.to_period(self.rebalance)
+        starts = np.flatnonzero(periods[1:] != periods[:-1]) + 1
+        points = np.concatenate([[0], starts])
+        return points[points >= first]
+
+    def inputs(self, t):
+        """Returns estimates of lookback window ending on row t
+        Tickers with a missing price in window are left out
+
+        Parameters
+        ----------
+        t: int
+            Row position of rebalance date in close_matrix
+
+        Returns
+        -------
+        inputs: dict[str] = pd.Series or pd.DataFrame
+            Estimates keyed by input
+        """
+
+        window = self.close_matrix.iloc[t - self.lookback + 1:t + 1]
+        prices = window.loc[:, window.notna().all().values]
+
+        inputs = {}
+        for name, estimator in self.estimates.items():
+            if(self.warm_start and estimator in self.WARM_ESTIMATORS):
+                self._sync(prices, t)
+                inputs[name] = self.WARM_ESTIMATORS[estimator](self.engine)
+            else:
+                inputs[name] = ESTIMATORS[estimator](prices)
+        return inputs
+
+    def _sync(self, prices, t):
+        """Moves covariance engine's window to end on row t
+        Engine is rebuilt if tickers changed or window moved further than its
+        length since last rebalance
+        """
+
+        if(self._engine_t == t):
+            return
+
+        tickers = list(prices.columns)
+        if(self.engine is None or self.engine.tickers != tickers
+                or t - self._engine_t >= self.lookback - 1):
+            self.engine = OnlineCovariance.from_prices(prices, self.lookback - 1, self.frequency)
+            self.rebuilds += 1
+        else:
+            self.engine.sync(prices)
+        self._engine_t = t
+
+    def run(self):
+        """Runs backtest, returns statistics
+        Between rebalances every held ticker's price relative to the rebalance
+        date is calculated for the whole segment at once. On a rebalance the
+        drifted weights are replaced by solved weights and the cost of value
+        traded is deducted from equity. A failed solve keeps drifted weights.
+
+        Returns
+        -------
+        statistics: dict
+            Return, volatility, Sharpe ratio, drawdown and turnover statistics
+        """
+
+        index = self.close_matrix.index
+        positions = {t: i for i, t in enumerate(self.close_matrix.columns)}
+        prices = self.close_matrix.ffill().values.astype('float64')
+        points = self.schedule()
+        if(len(points) == 0):
+            raise ValueError("Close prices have {} rows, at least lookback ({}) are needed".format(
+                prices.shape[0], self.lookback))
+
+        equity = np.full(prices.shape[0], np.nan)
+        w = np.zeros(prices.shape[1])
+        value = 1.0
+        weights, turnover = {}, {}
+        self.errors = {}
+        self.timings = {'estimate': 0.0, 'solve': 0.0, 'pnl': 0.0}
+        config = {'strategy': self.strategy, 'objective': self.objective,
+                  'lookback': self.lookback, 'universe': None}
+
+        for k, t0 in enumerate(points):
+            t1 = points[k + 1] if k + 1 < len(points) else prices.shape[0] - 1
+            date = str(index[t0])[:10]
+
+            start = time.perf_counter()
+            try:
+                inputs = self.inputs(t0)
+                error = None
+            except Exception as e:
+                error = repr(e)
+            self.timings['estimate'] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            if(error is None):
+                _, solved, _, error = solve(config, inputs)
+            self.timings['solve'] += time.perf_counter() - start
+
+            if(error is None):
+                new_w = np.zeros(prices.shape[1])
+                new_w[[positions[t] for t in solved]] = list(solved.values())
+                traded = np.abs(new_w - w).sum()
+                value *= 1 - self.cost*traded
+                turnover[date] = traded/2
+                weights[date] = {t: x for t, x in solved.items() if x != 0}
+                w = new_w
+            else:
+                self.errors[date] = error
+                print("Rebalance on {} failed, keeping weights: {}".format(date, error))
+
+            start = time.perf_counter()
+            held = np.flatnonzero(w)
+            relative = prices[t0:t1 + 1, held]/prices[t0, held]
+            growth = relative @ w[held] + (1 - w.sum())
+            equity[t0:t1 + 1] = value*growth
+            value = equity[t1]
+            if(len(held)):
+                w[held] = w[held]*relative[-1]/growth[-1]
+            self.timings['pnl'] += time.perf_counter() - start
+
+        self.equity = pd.Series(equity[points[0]:], index=index[points[0]:], name='Equity')
+        self.drawdown = (self.equity/self.equity.cummax() - 1).rename('Drawdown')
+        self.weights = pd.DataFrame.from_dict(weights, orient='index').fillna(0)
+        self.turnover = pd.Series(turnover, name='Turnover', dtype='float64')
+        self.statistics = self._statistics(len(points))
+        return self.statistics
+
+    def _statistics(self, rebalances):
+        """Returns return, volatility, Sharpe ratio, drawdown and turnover
+        statistics of equity curve
+        """
+
+        equity = self.equity.values
+        days = len(equity) - 1
+        years = days/self.frequency if days else np.nan
+        daily = equity[1:]/equity[:-1] - 1
+
+        annual_return = (equity[-1]/equity[0])**(1/years) - 1 if days else np.nan
+        annual_volatility = daily.std(ddof=1)*np.sqrt(self.frequency) if days > 1 else np.nan
+        positions = np.arange(len(equity))
+        peaks = np.maximum.accumulate(np.where(self.drawdown.values == 0, positions, 0))
+
+        return {
+            'Start': str(self.equity.index[0])[:10],
+            'End': str(self.equity.index[-1])[:10],
+            'Total Return': equity[-1]/equity[0] - 1,
+            'Annual Return': annual_return,
+            'Annual Volatility': annual_volatility,
+            'Sharpe Ratio': (annual_return - self.risk_free_rate)/annual_volatility
+                            if annual_volatility else np.nan,
+            'Max Drawdown': self.drawdown.min(),
+            'Max Drawdown Days': int((positions - peaks).max()),
+            'Rebalances': rebalances,
+            'Failed Rebalances': len(self.errors),
+            'Average Turnover': self.turnover.mean(),
+            'Annual Turnover': self.turnover.sum()/years if days else np.nan,
+        }
+
+
+if __name__ == "__main__":
+    from pipeline import Pipeline
+
+    parser = argparse.ArgumentParser(description="Walk-forward backtest of an optimizer strategy")
+    parser.add_argument('--strategy', default='eff', help="One of 'eff', 'cla' or 'hrp'")
+    parser.add_argument('--objective', default='max_sharpe', help="'max_sharpe' or 'min_volatility'")
+    parser.add_argument('--lookback', type=int, default=250, help="Close prices in estimates")
+    parser.add_argument('--rebalance', default='M',
+                        help="Period alias (W, M, Q) or trading days between rebalances")
+    parser.add_argument('--cost', type=float, default=0.0, help="Cost per unit of value traded")
+    parser.add_argument('--cold', action='store_true', help="Recalculate covariance every rebalance")
+    parser.add_argument('--storage', default='csv', help="Storage format of OHLC data")
+    parser.add_argument('--output', help="Location of CSV to write equity curve to")
+    args = parser.parse_args()
+
+    processor = Pipeline(storage=args.storage).processor()
+    if not processor.panel.exists():
+        processor.update_panel()
+    rebalance = int(args.rebalance) if args.rebalance.isdigit() else args.rebalance
+
+    backtest = Backtest(processor.panel.frame(), args.strategy, args.objective, args.lookback,
+                        rebalance, args.cost, warm_start=not args.cold)
+    start = time.perf_counter()
+    statistics = backtest.run()
+    for key, value in statistics.items():
+        print("{}: {}".format(key, value))
+    print("Finished in {}s, timings: {}".format(round(time.perf_counter() - start, 2),
+                                               {k: round(v, 2) for k, v in backtest.timings.items()}))
+
+    if(args.output):
+        pd.concat([backtest.equity, backtest.drawdown], axis=1).to_csv(args.output)
+    sys.exit(1 if backtest.errors else 0)
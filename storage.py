@@ -0,0 +1,414 @@
+"""Storage module
+
+This script contains storage backends for per-ticker OHLC data. Every backend
+keeps one file per ticker in a directory, indexed by a typed 'Date' column.
+
+It contains following classes
+    * Storage: Base Storage Class
+    * CSVStorage: Derived Storage Class for CSV files
+    * ParquetStorage: Derived Storage Class for Parquet files (needs pyarrow)
+    * FeatherStorage: Derived Storage Class for Feather files (needs pyarrow)
+
+It contains following functions
+    * get_storage: Returns storage backend for a format
+    * split_loc: Returns storage backend and ticker of an OHLC file location
+    * read_frame: Reads OHLC file, backend is picked by file extension
+    * write_frame: Writes OHLC file, backend is picked by file extension
+"""
+
+import os
+import io
+
+import pandas as pd
+
+from manifest import tail_date
+from utils import append_csv
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+class Storage:
+    """
+    Base class to represent a Storage backend
+
+    ...
+
+    Attributes
+    ----------
+    root : str
+        Location of directory containing one file per ticker
+    ext : str
+        Extension of files
+
+    Methods
+    -------
+    path(name=str): str
+        Returns location of ticker's file
+    exists(name=str): bool
+        Checks if ticker's file exists
+    names(): list[str]
+        Returns tickers stored in root, sorted
+    read(name=str, columns=list[str]): pd.DataFrame
+        Reads ticker's data indexed by Date, optionally only given columns
+    read_after(name=str, date=str): pd.DataFrame
+        Reads ticker's rows dated after date
+    write(df=pd.DataFrame, name=str): void
+        Atomically writes ticker's data
+    append(df=pd.DataFrame, name=str): void
+        Atomically appends rows to ticker's data
+    last_date(name=str): str
+        Returns last date of ticker's data
+    to_csv(name=str, csv_loc=str): void
+        Exports ticker's data as CSV
+    """
+
+    ext = ''
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, name):
+        """Returns location of ticker's file
+        """
+
+        return os.path.join(self.root, '{}.{}'.format(name, self.ext))
+
+    def exists(self, name):
+        """Checks if ticker's file exists
+        """
+
+        return os.path.exists(self.path(name))
+
+    def names(self):
+        """Returns tickers stored in root, sorted
+
+        Returns
+        -------
+        names: list[str]
+            Tickers with a file in root
+        """
+
+        suffix = '.{}'.format(self.ext)
+        return sorted(f[:-len(suffix)] for f in os.listdir(self.root) if f.endswith(suffix))
+
+    def read(self, name, columns=None):
+        """Reads ticker's data indexed by Date, optionally only given columns
+
+        Parameters
+        ----------
+        name: str
+            Ticker to be read
+        columns: list[str] (None)
+            Columns to be read, None reads all columns
+
+        Returns
+        -------
+        df: pd.DataFrame
+            Ticker's data indexed by Date (datetime64)
+        """
+
+        pass
+
+    def read_after(self, name, date):
+        """Reads ticker's rows dated after date
+
+        Parameters
+        ----------
+        name: str
+            Ticker to be read
+        date: str
+            Date as YYYY-MM-DD, rows up to and including it are skipped
+
+        Returns
+        -------
+        df: pd.DataFrame
+            Ticker's rows after date indexed by Date (datetime64)
+        """
+
+        df = self.read(name)
+        return df[df.index > pd.Timestamp(date)]
+
+    def write(self, df, name):
+        """Atomically writes ticker's data
+
+        Parameters
+        ----------
+        df: pd.DataFrame
+            Data indexed by Date
+        name: str
+            Ticker to be written
+        """
+
+        tmp_loc = '{}.tmp'.format(self.path(name))
+        try:
+            self._write(self._typed(df), tmp_loc)
+            os.replace(tmp_loc, self.path(name))
+        except Exception:
+            if os.path.exists(tmp_loc):
+                os.remove(tmp_loc)
+            raise
+
+    def append(self, df, name):
+        """Atomically appends rows to ticker's data
+
+        Parameters
+        ----------
+        df: pd.DataFrame
+            Rows indexed by Date, dated after ticker's last date
+        name: str
+            Ticker to be appended to
+        """
+
+        self.write(pd.concat([self.read(name), self._typed(df)]), name)
+
+    def last_date(self, name):
+        """Returns last date of ticker's data
+
+        Returns
+        -------
+        date: str
+            Last date as YYYY-MM-DD, None if there are no rows
+        """
+
+        index = self.read(name, columns=[]).index
+        return str(index[-1])[:10] if len(index) else None
+
+    def to_csv(self, name, csv_loc):
+        """Exports ticker's data as CSV
+
+        Parameters
+        ----------
+        name: str
+            Ticker to be exported
+        csv_loc: str
+            Location of CSV file to be created
+        """
+
+        self.read(name).to_csv(csv_loc)
+
+    def _typed(self, df):
+        """Returns df indexed by datetime64 Date
+        """
+
+        df = df.copy()
+        df.index = pd.to_datetime(df.index)
+        df.index.name = 'Date'
+        return df
+
+    def _write(self, df, file_loc):
+        pass
+
+
+class CSVStorage(Storage):
+    """
+    Derived class to represent a CSV Storage backend, compatible with the
+    original one CSV per ticker layout
+
+    ...
+
+    Attributes
+    ----------
+    root : str
+        Location of directory containing one file per ticker
+    ext : str
+        Extension of files ('csv')
+    """
+
+    ext = 'csv'
+
+    def read(self, name, columns=None):
+        """Reads ticker's data indexed by Date, optionally only given columns
+        """
+
+        usecols = None if columns is None else ['Date'] + list(columns)
+        return pd.read_csv(self.path(name), usecols=usecols, index_col='Date',
+                           parse_dates=['Date'])
+
+    def read_after(self, name, date, chunk=4096):
+        """Reads ticker's rows dated after date, by reading the file backwards
+        from its end until a row dated on or before date is found
+        """
+
+        with open(self.path(name), 'rb') as infile:
+            header = infile.readline()
+            start = infile.tell()
+            infile.seek(0, os.SEEK_END)
+            end = infile.tell()
+            pos = end
+            lines = []
+            while pos > start:
+                pos = max(start, pos - chunk)
+                chunk *= 2
+                infile.seek(pos)
+                lines = [l for l in infile.read(end - pos).split(b'\n') if l.strip()]
+                if(pos > start):
+                    lines = lines[1:]
+                if(len(lines) and lines[0].split(b',')[0].decode() <= date):
+                    break
+
+        date_key = date.encode()
+        rows = [l for l in lines if l.split(b',')[0] > date_key]
+        return pd.read_csv(io.BytesIO(header + b'\n'.join(rows)), index_col='Date',
+                           parse_dates=['Date'])
+
+    def append(self, df, name):
+        """Appends rows to ticker's data in place, existing rows are not read
+        """
+
+        append_csv(self._typed(df), self.path(name))
+
+    def last_date(self, name):
+        """Returns last date of ticker's data by seeking to the end of the file
+        """
+
+        return tail_date(self.path(name))
+
+    def _write(self, df, file_loc):
+        df.to_csv(file_loc)
+
+
+class ParquetStorage(Storage):
+    """
+    Derived class to represent a Parquet Storage backend
+
+    ...
+
+    Attributes
+    ----------
+    root : str
+        Location of directory containing one file per ticker
+    ext : str
+        Extension of files ('parquet')
+    """
+
+    ext = 'parquet'
+
+    def __init__(self, root):
+        if(pyarrow is None):
+            raise ImportError("pyarrow is required for {} storage".format(self.ext))
+        super().__init__(root)
+
+    def read(self, name, columns=None):
+        """Reads ticker's data indexed by Date, optionally only given columns
+        """
+
+        columns = None if columns is None else ['Date'] + list(columns)
+        return pd.read_parquet(self.path(name), columns=columns).set_index('Date')
+
+    def _write(self, df, file_loc):
+        df.reset_index().to_parquet(file_loc, index=False)
+
+
+class FeatherStorage(ParquetStorage):
+    """
+    Derived class to represent a Feather Storage backend
+
+    ...
+
+    Attributes
+    ----------
+    root : str
+        Location of directory containing one file per ticker
+    ext : str
+        Extension of files ('feather')
+    """
+
+    ext = 'feather'
+
+    def read(self, name, columns=None):
+        """Reads ticker's data indexed by Date, optionally only given columns
+        """
+
+        columns = None if columns is None else ['Date'] + list(columns)
+        return pd.read_feather(self.path(name), columns=columns).set_index('Date')
+
+    def _write(self, df, file_loc):
+        df.reset_index().to_feather(file_loc)
+
+
+STORAGES = {
+    'csv': CSVStorage,
+    'parquet': ParquetStorage,
+    'feather': FeatherStorage
+}
+
+
+def get_storage(fmt, root):
+    """Returns storage backend for a format
+
+    Parameters
+    ----------
+    fmt: str
+        Format of storage: 'csv', 'parquet' or 'feather'
+    root: str
+        Location of directory containing one file per ticker
+
+    Returns
+    -------
+    storage: Storage()
+        Storage backend
+    """
+
+    if(fmt not in STORAGES):
+        raise ValueError("Unknown storage format: {}, expected one of {}".format(
+            fmt, list(STORAGES.keys())))
+    return STORAGES[fmt](root)
+
+
+def split_loc(file_loc):
+    """Returns storage backend and ticker of an OHLC file location
+
+    Parameters
+    ----------
+    file_loc: str
+        Location of OHLC file, format is picked by extension
+
+    Returns
+    -------
+    storage: Storage()
+        Storage backend of file's directory
+    name: str
+        Ticker of file
+    """
+
+    root, file = os.path.split(file_loc)
+    name, ext = os.path.splitext(file)
+    return get_storage(ext.lstrip('.'), root), name
+
+
+def read_frame(file_loc, columns=None):
+    """Reads OHLC file, backend is picked by file extension
+
+    Parameters
+    ----------
+    file_loc: str
+        Location of OHLC file
+    columns: list[str] (None)
+        Columns to be read, None reads all columns
+
+    Returns
+    -------
+    df: pd.DataFrame
+        Data indexed by Date (datetime64)
+    """
+
+    storage, name = split_loc(file_loc)
+    return storage.read(name, columns)
+
+
+def write_frame(df, file_loc):
+    """Writes OHLC file, backend is picked by file extension
+
+    Parameters
+    ----------
+    df: pd.DataFrame
+        Data indexed by Date
+    file_loc: str
+        Location of OHLC file
+    """
+
+    storage, name = split_loc(file_loc)
+    storage.write(df, name)
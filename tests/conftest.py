@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def risk_cache(tmp_path, monkeypatch):
+    """Points process-wide RiskModelCache at a temporary directory
+    """
+
+    import riskcache
+    monkeypatch.setattr(riskcache, '_cache', riskcache.RiskModelCache(str(tmp_path / 'RiskModels')))
+    return riskcache._cache
@@ -0,0 +1,102 @@
+import os
+
+import pandas as pd
+import pytest
+
+import utils
+from manifest import Manifest
+from utils import append_csv
+
+
+def ohlc(start, rows):
+    close = [float(i) for i in range(rows)]
+    return pd.DataFrame({'Open': close, 'Close': close},
+                        index=pd.bdate_range(start, periods=rows, name='Date'))
+
+
+def setup_csv(tmp_path, rows=5):
+    ohlc_dir = str(tmp_path / 'NSE')
+    os.makedirs(ohlc_dir)
+    manifest = Manifest(ohlc_dir)
+    df = ohlc('2024-01-01', rows)
+    df.to_csv(manifest.file_loc('A'))
+    manifest.record('A', df)
+    return manifest, df
+
+
+class FailingFile:
+    """File whose writes stop halfway and raise, as a full disk would
+    """
+
+    def __init__(self, f):
+        self.f = f
+
+    def write(self, data):
+        self.f.write(data[:len(data)//2])
+        raise OSError('No space left on device')
+
+    def __getattr__(self, name):
+        return getattr(self.f, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return self.f.__exit__(*args)
+
+
+def test_append_keeps_header_column_order(tmp_path):
+    manifest, df = setup_csv(tmp_path)
+    new_rows = ohlc('2024-01-08', 2)[['Close', 'Open']]
+    append_csv(new_rows, manifest.file_loc('A'))
+
+    stored = pd.read_csv(manifest.file_loc('A'), index_col='Date', parse_dates=['Date'])
+    assert list(stored.columns) == ['Open', 'Close']
+    pd.testing.assert_frame_equal(stored, pd.concat([df, new_rows[['Open', 'Close']]]),
+                                  check_freq=False)
+
+
+def test_failed_append_is_truncated(tmp_path, monkeypatch):
+    manifest, df = setup_csv(tmp_path)
+    with open(manifest.file_loc('A'), 'rb') as infile:
+        before = infile.read()
+
+    monkeypatch.setattr(utils, 'open', lambda *args: FailingFile(open(*args)), raising=False)
+    with pytest.raises(OSError):
+        append_csv(ohlc('2024-01-08', 2), manifest.file_loc('A'))
+
+    with open(manifest.file_loc('A'), 'rb') as infile:
+        assert infile.read() == before
+
+
+def test_recover_drops_interrupted_append(tmp_path):
+    manifest, df = setup_csv(tmp_path)
+    entry = dict(manifest.entries['A'])
+    with open(manifest.file_loc('A'), 'ab') as outfile:
+        outfile.write(b'2024-01-08,5.0,5.0\n2024-01-09,6')
+
+    recovered = manifest.recover('A')
+    assert recovered['size'] == entry['size'] and recovered['last_date'] == entry['last_date']
+    assert manifest.get('A') is not None
+    stored = pd.read_csv(manifest.file_loc('A'), index_col='Date', parse_dates=['Date'])
+    pd.testing.assert_frame_equal(stored, df, check_freq=False)
+
+
+def test_recover_keeps_clean_file(tmp_path):
+    manifest, df = setup_csv(tmp_path)
+    with open(manifest.file_loc('A'), 'rb') as infile:
+        before = infile.read()
+
+    assert manifest.recover('A') == manifest.entries['A']
+    with open(manifest.file_loc('A'), 'rb') as infile:
+        assert infile.read() == before
+
+
+def test_recover_keeps_file_rewritten_by_other_writer(tmp_path):
+    manifest, df = setup_csv(tmp_path)
+    other = ohlc('2023-06-01', 40)
+    other.to_csv(manifest.file_loc('A'))
+
+    assert manifest.recover('A') is None
+    stored = pd.read_csv(manifest.file_loc('A'), index_col='Date', parse_dates=['Date'])
+    pd.testing.assert_frame_equal(stored, other, check_freq=False)
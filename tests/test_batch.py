@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from batch import BatchOptimizer, expand_grid
+
+
+class PanelProcessor:
+    """Serves close_matrix like IndexProcessor.process_close(), counting
+    rows read
+    """
+
+    def __init__(self, close):
+        self.close = close
+        self.reads = []
+
+    def process_close(self, time_period=250, dropna=True):
+        self.reads.append(time_period)
+        self.close_matrix = self.close.iloc[-time_period:]
+
+
+def make_close(rows=400, tickers=('A', 'B', 'C', 'D'), seed=0):
+    rng = np.random.RandomState(seed)
+    returns = 0.002 + 0.01*rng.randn(rows, len(tickers)) + 0.005*rng.randn(rows, 1)
+    return pd.DataFrame(100*np.exp(returns.cumsum(axis=0)),
+                        index=pd.bdate_range('2022-01-03', periods=rows, name='Date'),
+                        columns=list(tickers))
+
+
+def test_windows_are_sliced_from_longest_lookback(risk_cache):
+    close = make_close()
+    close.iloc[-100:, 3] = np.nan
+    processor = PanelProcessor(close)
+    batch = BatchOptimizer(processor, universes={'ab': ['A', 'B']}, cache=risk_cache)
+
+    grid = expand_grid(strategy=('eff', 'hrp'), lookback=(60, 300), universe=(None, 'ab'))
+    results = batch.run(grid, workers=1)
+
+    assert processor.reads == [300]
+    assert batch.window(300).shape == (300, 3)
+    assert list(batch.window(60, 'ab').columns) == ['A', 'B']
+    assert results['error'].isna().all()
+    assert set(results['ticker']) <= {'A', 'B', 'C'}
+    assert np.allclose(results.groupby(['strategy', 'lookback', 'universe'])['weight'].sum(),
+                       1, atol=1e-3)
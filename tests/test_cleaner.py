@@ -0,0 +1,39 @@
+import os
+
+import pandas as pd
+
+from cleaner import Nifty500Cleaner
+
+
+def write_raw(name, rows=5):
+    pd.DataFrame({'Close': [float(i) for i in range(rows)]},
+                 index=pd.bdate_range('2024-01-01', periods=rows, name='Date')).to_csv(
+        'data/raw/Nifty500/{}.csv'.format(name))
+
+
+def setup_cleaner(tmp_path, monkeypatch, tickers=('A', 'B')):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('data/raw/Nifty500')
+    for name in tickers:
+        write_raw(name)
+    cleaner = Nifty500Cleaner()
+    assert cleaner.clean_ohlc_data(workers=1)['cleaned'] == len(tickers)
+    return cleaner
+
+
+def test_deleted_raw_file_is_removed(tmp_path, monkeypatch):
+    cleaner = setup_cleaner(tmp_path, monkeypatch)
+    os.remove('data/raw/Nifty500/B.csv')
+
+    counts = cleaner.clean_ohlc_data(workers=1)
+    assert (counts['skipped'], counts['removed']) == (1, 1)
+    assert cleaner.clean_storage.names() == ['A']
+
+
+def test_empty_raw_directory_keeps_cleaned_files(tmp_path, monkeypatch):
+    cleaner = setup_cleaner(tmp_path, monkeypatch)
+    for name in ('A', 'B'):
+        os.remove('data/raw/Nifty500/{}.csv'.format(name))
+
+    assert cleaner.clean_ohlc_data(workers=1)['removed'] == 0
+    assert cleaner.clean_storage.names() == ['A', 'B']
@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             'dash_app'))
+from datastore import OHLCCache, SharedOHLC
+
+
+def test_pack_serves_same_columns_as_cache(tmp_path):
+    ohlc_dir = str(tmp_path / 'NSE')
+    os.makedirs(ohlc_dir)
+    pd.DataFrame({'Date': ['2024-01-01', '2024-01-02'], 'Symbol': ['A', 'A'],
+                  'Series': ['EQ', 'EQ'], 'Close': [1.5, 2.5], 'Volume': [100, 200]}).to_csv(
+        os.path.join(ohlc_dir, 'A.csv'), index=False)
+    pd.DataFrame({'Date': ['2024-01-01'], 'Close': [10.0], 'Trades': [7.0]}).to_csv(
+        os.path.join(ohlc_dir, 'B.csv'), index=False)
+
+    shared = SharedOHLC(ohlc_dir)
+    shared.prepare()
+    cache = OHLCCache(ohlc_dir)
+    for symbol in ('A', 'B'):
+        pd.testing.assert_frame_equal(shared.get(symbol), cache.get(symbol))
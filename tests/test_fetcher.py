@@ -0,0 +1,66 @@
+import os
+from datetime import date, timedelta
+
+import pandas as pd
+
+from fetcher import Nifty500Fetcher, last_bday
+
+
+def fake_history(fail=()):
+    """Returns history provider of business day closes, failing for tickers
+    in fail
+    """
+
+    def history(symbol, start, end):
+        if(symbol in fail):
+            raise RuntimeError('provider down')
+        dates = pd.bdate_range(start, end, name='Date')
+        return pd.DataFrame({'Open': 1.0, 'High': 1.0, 'Low': 1.0, 'Close': 1.0,
+                             'Volume': 1}, index=dates)
+
+    return history
+
+
+def setup_fetcher(tmp_path, monkeypatch, tickers=('A', 'B'), history=None):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('data/raw')
+    pd.DataFrame({'Symbol': list(tickers)}).to_csv('data/raw/nifty_500_list.csv')
+    return Nifty500Fetcher(history_provider=history or fake_history())
+
+
+def test_past_end_date_stays_outdated(tmp_path, monkeypatch):
+    fetcher = setup_fetcher(tmp_path, monkeypatch)
+    end = last_bday() - timedelta(days=7)
+    fetcher.fetch_data(start_date=end - timedelta(days=30), end_date=end, timeout=0)
+
+    outdated = fetcher.ohlc_updation_check()
+    assert sorted(outdated.keys()) == ['A', 'B']
+    assert fetcher.manifest.get('A').get('checked') is None
+
+
+def test_fetch_till_today_is_checked(tmp_path, monkeypatch):
+    fetcher = setup_fetcher(tmp_path, monkeypatch)
+    fetcher.fetch_data(start_date=date.today() - timedelta(days=30), end_date=date.today(),
+                       timeout=0)
+
+    assert fetcher.ohlc_updation_check() == {}
+    assert fetcher.manifest.get('A')['checked'] == date.today().isoformat()
+
+
+def test_resume_after_partial_failure(tmp_path, monkeypatch):
+    fetcher = setup_fetcher(tmp_path, monkeypatch, history=fake_history(fail=('B',)))
+    start, end = date(2024, 1, 1), date(2024, 1, 31)
+    fetcher.fetch_data(start_date=start, end_date=end, timeout=0)
+
+    journal = fetcher.journal('ohlc')
+    assert journal.entries['A']['status'] == 'done'
+    assert journal.entries['B']['status'] == 'failed'
+    assert not os.path.exists(fetcher.storage.path('B'))
+
+    calls = []
+    history = fake_history()
+    fetcher.history_provider = lambda **kwargs: calls.append(kwargs['symbol']) or history(**kwargs)
+    assert fetcher.resume('ohlc', timeout=0, backoff=0) == []
+    assert calls == ['B']
+    assert fetcher.storage.read('B').shape[0] == len(pd.bdate_range(start, end))
+    assert fetcher.journal('ohlc').entries['B']['status'] == 'done'
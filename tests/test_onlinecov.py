@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+from pypfopt import risk_models
+
+from onlinecov import OnlineCovariance
+
+
+def make_close(rows=200, tickers=('A', 'B', 'C', 'D'), seed=0):
+    rng = np.random.RandomState(seed)
+    returns = 0.01*rng.randn(rows, len(tickers)) + 0.005*rng.randn(rows, 1)
+    return pd.DataFrame(100*np.exp(returns.cumsum(axis=0)),
+                        index=pd.bdate_range('2024-01-01', periods=rows, name='Date'),
+                        columns=list(tickers))
+
+
+def test_sliding_window_matches_batch_ledoit_wolf():
+    close = make_close()
+    engine = OnlineCovariance.from_prices(close.iloc[:80], window=60)
+    assert engine.sync(close) == 120
+
+    prices = close.iloc[-61:]
+    expected = risk_models.CovarianceShrinkage(prices).ledoit_wolf()
+    np.testing.assert_allclose(engine.ledoit_wolf().values, expected.values, atol=1e-10)
+    np.testing.assert_allclose(engine.cov().values, risk_models.sample_cov(prices).values,
+                               atol=1e-10)
+    assert max(engine.check(close).values()) <= 1e-10
+
+
+def test_saved_state_continues_updates(tmp_path):
+    close = make_close()
+    engine = OnlineCovariance.from_prices(close.iloc[:80], window=60)
+    engine.save(str(tmp_path / 'cov.npz'))
+
+    loaded = OnlineCovariance.load(str(tmp_path / 'cov.npz'))
+    assert loaded.sync(close) == 120
+    assert max(loaded.check(close).values()) <= 1e-10
@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+from pypfopt.efficient_frontier import EfficientFrontier
+
+from optimizer import EffOptimizer
+
+
+class CloseProcessor:
+    def __init__(self, close):
+        self.close_matrix = close
+
+
+def make_close(rows=300, tickers=('A', 'B', 'C', 'D', 'E'), seed=0):
+    rng = np.random.RandomState(seed)
+    returns = 0.0005 + 0.01*rng.randn(rows, len(tickers)) + 0.005*rng.randn(rows, 1)
+    return pd.DataFrame(100*np.exp(returns.cumsum(axis=0)),
+                        index=pd.bdate_range('2022-01-03', periods=rows, name='Date'),
+                        columns=list(tickers))
+
+
+def test_frontier_matches_independent_solves(risk_cache):
+    optimizer = EffOptimizer(CloseProcessor(make_close()), risk_cache)
+    frontier, weights = optimizer.frontier(points=8, workers=1)
+
+    assert frontier['error'].isna().all()
+    assert list(weights.columns) == list(optimizer.mu.index)
+    assert np.allclose(weights.sum(axis=1), 1, atol=1e-4)
+    assert (np.diff(frontier['volatility'].astype('float64')) > -1e-6).all()
+
+    for target, volatility in zip(frontier['target_return'], frontier['volatility']):
+        ef = EfficientFrontier(optimizer.mu, optimizer.s)
+        ef.efficient_return(float(target))
+        assert abs(ef.portfolio_performance()[1] - volatility) < 1e-4
@@ -0,0 +1,70 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from panel import ClosePanel
+from storage import get_storage
+
+
+def write_close(root, name, dates, close):
+    """Writes close prices of ticker as OHLC CSV, bumping its mtime
+    """
+
+    file_loc = os.path.join(root, '{}.csv'.format(name))
+    mtime = os.stat(file_loc).st_mtime_ns + 10**9 if os.path.exists(file_loc) else None
+    pd.DataFrame({'Close': close}, index=pd.DatetimeIndex(dates, name='Date')).to_csv(file_loc)
+    if(mtime is not None):
+        os.utime(file_loc, ns=(mtime, mtime))
+
+
+def setup_panel(tmp_path):
+    root = str(tmp_path / 'NSE')
+    os.makedirs(root)
+    write_close(root, 'A', ['2024-01-01', '2024-01-02', '2024-01-03'], [1.0, 2.0, 3.0])
+    write_close(root, 'B', ['2024-01-01', '2024-01-02'], [10.0, 20.0])
+    panel = ClosePanel(str(tmp_path / 'NSE.panel'))
+    storage = get_storage('csv', root)
+    panel.update(storage)
+    return root, storage, panel
+
+
+def test_late_ticker_rows_are_written(tmp_path):
+    root, storage, panel = setup_panel(tmp_path)
+    assert np.isnan(panel.frame().loc['2024-01-03', 'B'])
+
+    write_close(root, 'B', ['2024-01-01', '2024-01-02', '2024-01-03'], [10.0, 20.0, 30.0])
+    assert panel.update(storage) == 0
+    assert panel.frame().loc['2024-01-03', 'B'] == 30.0
+    assert panel.frame()['A'].tolist() == [1.0, 2.0, 3.0]
+
+
+def test_new_dates_and_rewritten_history(tmp_path):
+    root, storage, panel = setup_panel(tmp_path)
+
+    write_close(root, 'A', ['2024-01-01', '2024-01-02', '2024-01-03', '2024-01-04'],
+                [1.5, 2.0, 3.0, 4.0])
+    assert panel.update(storage) == 1
+    frame = panel.frame()
+    assert list(frame.index.strftime('%Y-%m-%d')) == ['2024-01-01', '2024-01-02',
+                                                      '2024-01-03', '2024-01-04']
+    assert frame['A'].tolist() == [1.5, 2.0, 3.0, 4.0]
+    assert frame['B'].tolist()[:2] == [10.0, 20.0]
+
+
+def test_unchanged_files_are_not_read(tmp_path):
+    root, storage, panel = setup_panel(tmp_path)
+    assert panel.update(storage) == 0
+
+
+def test_deleted_and_new_tickers(tmp_path):
+    root, storage, panel = setup_panel(tmp_path)
+
+    os.remove(os.path.join(root, 'B.csv'))
+    write_close(root, 'C', ['2023-12-29', '2024-01-02'], [7.0, 8.0])
+    assert panel.update(storage) == 1
+    frame = panel.frame()
+    assert frame.columns.tolist() == ['A', 'C']
+    assert frame.loc['2023-12-29', 'C'] == 7.0
+    assert np.isnan(frame.loc['2023-12-29', 'A'])
+    assert 'B' not in panel.sources
@@ -0,0 +1,112 @@
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+import processor as processor_module
+from processor import IndexProcessor
+from indicators import compute_indicators
+from utils import append_csv
+
+
+def setup_index(tmp_path, tickers=('A', 'B', 'C'), rows=60):
+    """Writes cleaned OHLC of tickers and their metadata, metadata of B has
+    no Price
+    """
+
+    ohlc_dir = str(tmp_path / 'data' / 'cleaned' / 'OHLC')
+    meta_dir = str(tmp_path / 'data' / 'cleaned' / 'Metadata')
+    os.makedirs(ohlc_dir)
+    os.makedirs(meta_dir)
+
+    dates = pd.bdate_range('2024-01-01', periods=rows, name='Date')
+    records = []
+    for i, ticker in enumerate(tickers):
+        close = 100 + np.cumsum(np.random.randn(rows))
+        pd.DataFrame({'Open': close, 'High': close, 'Low': close, 'Close': close,
+                      'Volume': 1000}, index=dates).to_csv(
+            os.path.join(ohlc_dir, '{}.csv'.format(ticker)))
+        record = {'Ticker': ticker, 'Price': close[-1],
+                  'OHLC Data Location': os.path.join(ohlc_dir, '{}.csv'.format(ticker))}
+        if(ticker == 'B'):
+            del record['Price']
+        records.append(record)
+
+    metadata_loc = os.path.join(meta_dir, 'metadata.json')
+    with open(metadata_loc, 'w') as outfile:
+        json.dump(records, outfile)
+    return IndexProcessor(ohlc_dir, metadata_loc)
+
+
+def read_processed(processor):
+    with open(processor.proc_metadata_loc, 'r') as infile:
+        return {record['Ticker']: record for record in json.load(infile)}
+
+
+def test_stock_engine_isolates_bad_metadata(tmp_path):
+    processor = setup_index(tmp_path)
+    assert processor.process_metrics(engine='stock', workers=1) == ['B']
+
+    processed = read_processed(processor)
+    assert processed['A']['OHLC Data Available'] and processed['C']['OHLC Data Available']
+    assert processed['B']['OHLC Data Available'] is False
+    assert os.path.exists(processed['C']['OHLC Data Location'])
+
+
+def test_worker_pool_isolates_bad_metadata(tmp_path):
+    processor = setup_index(tmp_path)
+    assert processor.process_metrics(engine='stock', workers=2) == ['B']
+    assert read_processed(processor)['A']['OHLC Data Available']
+
+
+def test_panel_engine_isolates_bad_metadata(tmp_path):
+    processor = setup_index(tmp_path, tickers=('A', 'B', 'C', 'D'))
+    os.remove(os.path.join(processor.ohlc_location, 'D.csv'))
+    assert processor.process_metrics(engine='panel', chunk_size=2) == ['B']
+
+    processed = read_processed(processor)
+    assert list(processed.keys()) == ['A', 'B', 'C', 'D']
+    assert processed['A']['OHLC Data Available'] and processed['C']['OHLC Data Available']
+    assert processed['B']['OHLC Data Available'] is False
+    assert processed['D']['OHLC Data Available'] is False
+    assert '14MA' in pd.read_csv(processed['C']['OHLC Data Location']).columns
+
+
+def test_process_close_drops_partial_history(tmp_path):
+    processor = setup_index(tmp_path)
+    pd.read_csv(os.path.join(processor.ohlc_location, 'C.csv')).iloc[-30:].to_csv(
+        os.path.join(processor.ohlc_location, 'C.csv'), index=False)
+
+    processor.process_close(50)
+    assert list(processor.close_matrix.columns) == ['A', 'B']
+    assert processor.close_matrix.notna().all().all()
+
+    processor.process_close(50, dropna=False)
+    assert processor.close_matrix['C'].isna().sum() == 20
+
+
+def test_incremental_append_matches_full_recompute(tmp_path, monkeypatch):
+    processor = setup_index(tmp_path, tickers=('A',), rows=300)
+    assert processor.process_metrics(incremental=True) == []
+
+    clean_loc = os.path.join(processor.ohlc_location, 'A.csv')
+    cleaned = pd.read_csv(clean_loc, index_col='Date', parse_dates=['Date'])
+    close = cleaned['Close'].values[-1] + np.cumsum(np.random.randn(5))
+    append_csv(pd.DataFrame({'Open': close, 'High': close, 'Low': close, 'Close': close,
+                             'Volume': 1000},
+                            index=pd.bdate_range(cleaned.index[-1], periods=6, name='Date')[1:]),
+               clean_loc)
+
+    # Incremental run must not read the whole cleaned file
+    monkeypatch.setattr(processor_module, 'read_frame', None)
+    assert processor.process_metrics(incremental=True) == []
+
+    cleaned = pd.read_csv(clean_loc, index_col='Date', parse_dates=['Date'])
+    expected = compute_indicators(cleaned['Close'])
+    processed = pd.read_csv(read_processed(processor)['A']['OHLC Data Location'],
+                            index_col='Date', parse_dates=['Date'])
+    assert processed.shape[0] == 305
+    for key, value in expected.items():
+        assert np.allclose(processed[key].values, np.round(value.values, 2), atol=0.011,
+                           equal_nan=True), key
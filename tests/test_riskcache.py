@@ -0,0 +1,47 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from riskcache import RiskModelCache
+
+
+def make_close(rows=60, tickers=('A', 'B', 'C'), seed=0):
+    rng = np.random.RandomState(seed)
+    return pd.DataFrame(100*np.exp(0.01*rng.randn(rows, len(tickers)).cumsum(axis=0)),
+                        index=pd.bdate_range('2024-01-01', periods=rows, name='Date'),
+                        columns=list(tickers))
+
+
+def test_estimates_are_reused_from_disk(tmp_path):
+    close = make_close()
+    cov = RiskModelCache(str(tmp_path / 'cache')).get(close, 'sample_cov')
+
+    cache = RiskModelCache(str(tmp_path / 'cache'))
+    pd.testing.assert_frame_equal(cache.get(close, 'sample_cov'), cov)
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test_in_place_update_is_not_served_stale(tmp_path):
+    cache = RiskModelCache(str(tmp_path / 'cache'))
+    close = make_close()
+    before = cache.get(close, 'sample_cov')
+
+    close.values[-1] *= 1.5
+    after = cache.get(close, 'sample_cov')
+    assert cache.misses == 2
+    assert not np.allclose(before.values, after.values)
+
+
+def test_disk_is_capped_to_recently_used(tmp_path):
+    cache = RiskModelCache(str(tmp_path / 'cache'), max_entries=1, max_files=2)
+    closes = [make_close(seed=seed) for seed in range(3)]
+    cache.get(closes[0], 'sample_cov')
+    cache.get(closes[1], 'sample_cov')
+    os.utime(os.path.join(str(tmp_path / 'cache'), '{}.pkl'.format(
+        cache.key(closes[1], 'sample_cov', {}))), ns=(1, 1))
+    cache.get(closes[2], 'sample_cov')
+
+    files = sorted(os.listdir(str(tmp_path / 'cache')))
+    assert files == sorted('{}.pkl'.format(cache.key(close, 'sample_cov', {}))
+                           for close in (closes[0], closes[2]))
@@ -7,9 +7,12 @@ It contains following functions
     * read_json: Reads JSON file and returns it as list[dict]
     * write_json: Writes list[dict] as json
     * write_csv: Writes pandas DataFrame as CSV file
+    * append_csv: Appends pandas DataFrame rows to existing CSV file in place
 """
 
+import os
 import json
+
 import pandas as pd
 
 def find_in_json(json_data, key, value):
@@ -79,4 +82,35 @@ def write_csv(df, csv_loc):
         Location of CSV file to be created
     """
 
-    df.to_csv(csv_loc)
\ No newline at end of file
+    df.to_csv(csv_loc)
+
+def append_csv(df, csv_loc):
+    """Appends pandas DataFrame rows to existing CSV file in place
+    Rows are serialized before the file is touched and written at its end,
+    so the cost does not grow with the file. If writing fails the file is
+    truncated back to its original size, rows left by a crash mid-write are
+    dropped by Manifest.recover(). Columns are written in the order of the
+    file's header, existing rows are not read
+
+    Parameters
+    ----------
+    df: pd.DataFrame
+        Rows to be appended, indexed like the CSV's first column
+    csv_loc: str
+        Location of CSV file to be appended to
+    """
+
+    with open(csv_loc, 'rb+') as outfile:
+        header = outfile.readline().decode().rstrip('\r\n').split(',')
+        rows = df.reindex(columns=header[1:]).to_csv(header=False).encode()
+
+        size = outfile.seek(0, os.SEEK_END)
+        outfile.seek(size - 1)
+        if(outfile.read(1) != b'\n'):
+            rows = b'\n' + rows
+        try:
+            outfile.write(rows)
+            outfile.flush()
+        except BaseException:
+            outfile.truncate(size)
+            raise